@@ -27,21 +27,29 @@ EXCEL ::: RIA
 10)	 Inventarnotiz: wird das Feld jemals durch uns gefüllt
 """
 
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime
 from lxml import etree
 from mpapi.constants import get_credentials
 from mpapi.module import Module
 from MpApi.Record import Record  # should be MpApi.Record.Multimedia
 from MpApi.Utils.BaseApp import BaseApp, ConfigError
+from MpApi.Utils.exif import NotSupportedError, read_artist, read_artists
+from MpApi.Utils.Filename_Index import index_fn
+from MpApi.Utils.hashing import hash_files
+from MpApi.Utils.Journal import Journal
 from MpApi.Utils.logic import (
     extractIdentNr,
     extract_weitereNr,
     identNrParserError,
     is_suspicious,
+    parse_many,
     whole_for_parts,
 )  # has_parts,
 from MpApi.Utils.Ria import RIA
-from MpApi.Utils.Xls import Xls
+from MpApi.Utils.Snapshot import Snapshot
+from MpApi.Utils.Xls import BACKUPS, Xls
+from MpApi.Utils.walker import FileEntry, walk
 
 from openpyxl.styles import Font
 from pathlib import Path
@@ -49,12 +57,16 @@ from PIL import Image
 from PIL.ExifTags import Base as ExifBase
 
 import shutil
+import struct
+import threading
+from types import SimpleNamespace
 from typing import Optional
-from tqdm import tqdm
 
 # adding number of fields to prevent accidental overwriting of old versions
 excel_fn = Path("upload15.xlsx")
 bak_fn = Path("upload15.xlsx.bak")  # should go away
+journal_fn = Path("upload15.journal.jsonl")
+snapshot_fn = Path(".upload15.snapshot.sqlite")  # dot file, so scandir ignores it
 parser = etree.XMLParser(remove_blank_text=True)
 red = Font(color="FF0000")
 teal = Font(color="008080")
@@ -67,21 +79,79 @@ IGNORE_NAMES = (
     "prepare.xlsx",
     "prepare.log",
     "prepare.ini",
+    "prepare.prom",
+    "prepare.stats.json",
     str(excel_fn),
     str(bak_fn),
+    *(f"{bak_fn}.{n}" for n in range(1, BACKUPS)),
+    str(journal_fn),
+    str(excel_fn.with_suffix(".sqlite")),
+    str(excel_fn.with_suffix(".sqlite")) + "-shm",
+    str(excel_fn.with_suffix(".sqlite")) + "-wal",
+    str(excel_fn.with_suffix(".prom")),
+    str(excel_fn.with_suffix(".stats.json")),
     "thumbs.db",
 )
 IGNORE_SUFFIXES = (".py", ".ini", ".lnk", ".tmp")
+# known extensions that dont work with exif
+EXIF_IGNORE_SUFFIXES = (".jpg", ".exr", ".obj", ".pdf", ".xml", ".zip")
+# rows per batch in 'upload standardbild'
+STANDARDBILD_BATCH = 200
 
 
 class AssetUploader(BaseApp):
-    def __init__(self, *, limit: int = -1, offset: int = 3) -> None:
+    def __init__(
+        self,
+        *,
+        limit: int = -1,
+        offset: int = 3,
+        workers: int = 4,
+        bandwidth: float | None = None,
+        save_every: int = 100,
+        db: bool = False,
+        cache: bool = True,
+        clear_cache: bool = False,
+    ) -> None:
+        """
+        workers: maximum number of rows uploaded at the same time in go; 1 for one
+        after the other. The number of parallel attachment uploads adapts between 1
+        and workers to how well RIA copes (see RIA.throttle_uploads).
+        bandwidth (optional): upper limit for all uploads together in MB/s
+        save_every: in go, save the Excel file at most every n rows, less often if
+        saving is slow; in between, progress is recorded in a journal (see
+        Journal.py)
+        db: keep the rows in SQLite during the run and write the Excel file only at
+        the end (see Xls.use_store)
+        cache: use and fill the on-disk cache of RIA lookups (see IdentNr_Cache.py)
+        clear_cache: forget all cached lookups before we start
+        """
         self.limit = self._init_limit(limit)
         print(f"Using limit {self.limit}")
         self.offset = int(offset)  # set to 3 by default to start at 3 row
+        self.workers = int(workers)
+        self.save_every = int(save_every)
+        self.db = db
+        self.rows_done = 0
+        self.journal = Journal(path=journal_fn)
         user, pw, baseURL = get_credentials()
-        self.client = RIA(baseURL=baseURL, user=user, pw=pw)
+        self.client = RIA(
+            baseURL=baseURL,
+            user=user,
+            pw=pw,
+            cache=self._init_cache(
+                excel_fn=excel_fn, cache=cache, clear_cache=clear_cache
+            ),
+            workers=self.workers,
+        )
+        if self.workers > 1 or bandwidth:
+            self.client.throttle_uploads(
+                maximum=self.workers, rate=bandwidth * 1e6 if bandwidth else None
+            )
         self.objIds_cache: dict[str, str] = {}
+        self.artists: dict[Path, str | None] = {}
+        # one lock per object, so that parallel rows don't both set a Standardbild
+        self.standardbild_locks: dict[int, threading.Lock] = {}
+        self.standardbild_lock = threading.Lock()  # for the dict
         self.xls = Xls(path=excel_fn, description=self.desc())
 
     def desc(self) -> dict:
@@ -176,9 +246,23 @@ class AssetUploader(BaseApp):
                 "col": "N",  # 13
                 "width": 5,
             },
+            "hash": {
+                "label": "Prüfsumme",
+                "desc": "BLAKE2b des Inhalts; rot, wenn doppelt",
+                "col": "O",  # 14
+                "width": 34,
+            },
         }
         return desc
 
+    def export(self) -> None:
+        """
+        Write the rows from the SQLite store (see db) into the Excel file, e.g. after
+        a run that couldn't save the Excel file at the end.
+        """
+        self._init_wbws()
+        self.xls.export()
+
     def go(self) -> None:
         """
         Do the actual upload based on the preparations in the Excel file
@@ -191,38 +275,47 @@ class AssetUploader(BaseApp):
 
         Is it allowed to re-run go multiple time, e.g. to restart attachment? Yes!
 
+        With more than one worker, several rows are uploaded at the same time (see
+        _go_pipelined).
+
+        The Excel file is saved only every save_every rows (or less often, see
+        _checkpoint) and at the end. Every completed step is recorded immediately in
+        a journal, which is replayed at the beginning of the next run, if this one
+        dies before it could save.
+
         BTW: go is now called 'up' in command line interface.
         """
 
         self._check_go()  # raise on error
-
-        # breaks at limit, but doesn't save on its own
-        for cells, rno in self.xls.loop(
-            sheet=self.ws, offset=self.offset, limit=self.limit
-        ):
-            # relative path; assume dir hasn't changed since scandir run
-            print(f"{rno}: {cells['identNr'].value} up")
-            if cells["ref"].value == "None":
-                print(
-                    "   object reference unknown, not creating assets nor attachments"
-                )
-                continue
-
-            if cells["fullpath"].value is not None:
-                p = Path(cells["fullpath"].value)
-            else:
-                print("Fullpath is missing")
-                continue
-
-            match cells["attached"].value:
-                case "x":
-                    print("File already uploaded")
-                case "File not found":
-                    print("File already marked as missing")
-                case _:
+        self._replay_journal()
+        # content that has been attached already and content that is being uploaded
+        # right now (see _is_duplicate)
+        self.uploaded = self._known_hashes(attached=True)
+        self.claimed: dict[str, str] = {}
+        self.deferred: list[tuple[dict, int]] = []
+        try:
+            if self.workers > 1:
+                self._go_pipelined()
+                return
+            # breaks at limit, but doesn't save on its own
+            for cells, rno in self.xls.loop(
+                sheet=self.ws, offset=self.offset, limit=self.limit
+            ):
+                # relative path; assume dir hasn't changed since scandir run
+                print(f"{rno}: {cells['identNr'].value} up")
+                p = self._go_todo(cells, rno)
+                if p is not None:
                     self._go(cells=cells, rno=rno, p=p)
-            self.xls.save_bak_shutdown(rno=rno, bak=10)
-        # self.xls.save_if_change()
+                    self._row_done(cells)
+                    self._checkpoint()
+                self.xls.shutdown_if_requested()
+        finally:
+            # also on planned shutdown (sys.exit) and errors
+            self.xls.save_if_change()
+            if not self.xls.changed:
+                self.journal.clear()
+            self.xls.export_if_store()
+            self.client.stats.write(path=self.xls.path)
 
     def init(self) -> None:
         """
@@ -248,8 +341,8 @@ class AssetUploader(BaseApp):
 
         # we need a loop that doesn't break on limit
         c = 3  # row counter
-        for row in self.ws.iter_rows(min_row=3):  # start at 3rd row
-            if row[12].value == "x":
+        for cells, rno in self.xls.loop(sheet=self.ws):  # start at 3rd row
+            if cells["attached"].value == "x":
                 c += 1
         return c
 
@@ -262,6 +355,7 @@ class AssetUploader(BaseApp):
         for cells, rno in self.xls.loop(sheet=self.ws, limit=self.limit):
             self._photo(cells)
         self.xls.save()
+        self.xls.export_if_store()
 
     def scandir(self, *, Dir: Optional[Path] = None, offset: int = 0) -> None:
         """
@@ -274,6 +368,16 @@ class AssetUploader(BaseApp):
 
         add new files, manually delete rows from Excel and
         to update the table by re-running scandir.
+
+        Re-runs are incremental: a snapshot of the last scan (see Snapshot.py) tells
+        which files are new, changed or gone; unchanged files that are in the Excel
+        already are skipped. Rows of files that are gone are dropped, unless the file
+        has been attached already.
+
+        New and changed files are hashed (see hashing.py); files with the same
+        content as another one in the list are flagged (see _write_hash). Their
+        photographers are read from the Exif headers in advance (see
+        _prefetch_artists).
         """
         self.filemask: str  # make mypy happy
         self._check_scandir()
@@ -285,44 +389,63 @@ class AssetUploader(BaseApp):
         self.xls.save()
 
         print("Preparing file list...")
+        snapshot = Snapshot(path=snapshot_fn, filemask=self.filemask)
+        files = walk(
+            filemask=self.filemask,
+            ignore_names=IGNORE_NAMES,
+            ignore_suffixes=IGNORE_SUFFIXES,
+        )
+        changes = snapshot.diff(f for f in files if not f.name.startswith("debug"))
+        print(
+            f"   {len(changes.added)} new, {len(changes.changed)} changed, "
+            f"{len(changes.removed)} gone, {len(changes.unchanged)} unchanged files"
+        )
+        self._drop_gone(changes.removed, snapshot=snapshot)
+        todo = changes.added + changes.changed
+        if changes.unchanged:
+            # rows that have been deleted in Excel to re-index the file
+            known = self._known_fullpaths()
+            todo += [
+                f for f in changes.unchanged if str(f.path.absolute()) not in known
+            ]
         file_list = list()  # set not necessary because every file only one time
-        chunk_size = self.limit - offset
-        print(f"   chunk size: {chunk_size}")
-        with tqdm(total=chunk_size + len(attached_cache), unit=" files") as pbar:
-            for idx, p in enumerate(Path().glob(self.filemask), start=1):
-                # idx = counting files, no offset for headlines
-                if (
-                    p.name.startswith(".")
-                    or p.name.startswith("debug")
-                    or p.name.lower() in IGNORE_NAMES
-                ):
-                    # print("   exluding reason 1")
-                    continue
-                elif p.is_dir():
-                    # print("   exluding reason 2: dir")
-                    continue
-                # we dont need to ignore suffixes if we look for *.jpg etc.
-                elif self.filemask == "*" and p.suffix in IGNORE_SUFFIXES:
-                    continue
-                if str(p.absolute()) not in attached_cache:
-                    file_list.append(p)
-                    pbar.update()
-                if self.limit == idx:
-                    print("* Limit reached")
-                    break
-
+        entries = dict()  # path -> FileEntry for the snapshot
+        for f in todo:
+            if str(f.path.absolute()) in attached_cache:
+                snapshot.record(f)
+            else:
+                file_list.append(f.path)
+                entries[f.path] = f
+        file_list.sort()
+        if self.limit > -1:
+            file_list = file_list[: self.limit]
+
+        print(f"Hashing {len(file_list)} files...")
+        hashes = dict(hash_files(file_list))
+        self.known_hashes = self._known_hashes()
+
+        if self.use_fn_index:
+            self.client.prefetch_filenames(orgUnit=self.orgUnit)
+        if self.use_ident_index:
+            self.client.prefetch_identNrs(orgUnit=self.orgUnit)
+        self._prefetch_objIds(file_list)
+        self._prefetch_artists([entries[p] for p in file_list])
         print(f"Scanning sorted file list... {len(file_list)}")
-        for idx, p in enumerate(sorted(file_list), start=1):
+        for idx, p in enumerate(file_list, start=1):
             print(f"scandir: {p}")
             rno = self.xls.path_exists(path=p.name, cno=0, sheet=self.ws)
             # rno is the row number in Assets sheet
             # rno is None if file not in list
-            rno = self._file_to_list(path=p, rno=rno)
+            rno = self._file_to_list(path=p, rno=rno, content_hash=hashes[p])
+            snapshot.record(entries[p])
             self.xls.save_bak_shutdown(rno=idx, save=500, bak=1_000)
             if self.limit == idx:
                 print("* Limit reached")
                 break
         self.xls.save()
+        snapshot.commit()  # only now that the Excel file has been saved
+        snapshot.close()
+        self.xls.export_if_store()
 
     def set_standardbild(self) -> None:
         """
@@ -334,14 +457,20 @@ class AssetUploader(BaseApp):
             c["standardbild"].value = "x"
             # print(f"{rno} {c['standardbild'].value}")
         self.xls.save()
+        self.xls.export_if_store()
         # raise SyntaxError
 
     def standardbild(self) -> None:
         """
         Loop thru Excel and only set standardbild if requested
+
+        Rows are processed in batches of STANDARDBILD_BATCH: for each batch we ask RIA
+        once which objects don't have a Standardbild yet and only update those (see
+        RIA.mk_asset_standardbild_many).
         """
         print("Only setting Standardbild")
         self._check_scandir()
+        batch = list()
         for cell, rno in self.xls.loop(sheet=self.ws, limit=self.limit):
             # relative path; assume dir hasn't changed since scandir run
             # fn = cell["filename"].value
@@ -350,8 +479,14 @@ class AssetUploader(BaseApp):
             if cell["ref"].value is None:
                 print("   no object reference cannot set standardbild")
                 continue
-            self._set_Standardbild(cell)
-            self.xls.save_bak_shutdown(rno=rno, save=5, bak=10)
+            pair = self._standardbild_pair(cell)
+            if pair is not None:
+                batch.append((cell, pair))
+            if len(batch) >= STANDARDBILD_BATCH:
+                self._set_Standardbild_many(batch)
+                batch = list()
+        self._set_Standardbild_many(batch)
+        self.xls.export_if_store()
 
     def wipe(self) -> None:
         """
@@ -362,6 +497,8 @@ class AssetUploader(BaseApp):
         """
         self._init_wbws()
         self.xls.wipe(sheet=self.ws)
+        self.xls.export_if_store()
+        snapshot_fn.unlink(missing_ok=True)  # next scandir starts from scratch
 
     #
     # private
@@ -386,18 +523,15 @@ class AssetUploader(BaseApp):
             return False
 
     def _attached_cache(self) -> set:
-        rno = 3  # row counter;
         cache = set()
         # loop without limit
-        for row in self.ws.iter_rows(min_row=rno):  # start at 3rd row
-            cells = self.xls._rno2dict(rno, sheet=self.ws)
+        for cells, rno in self.xls.loop(sheet=self.ws):  # start at 3rd row
             fullpath = cells["fullpath"].value
             attached = cells["attached"].value
             # print(f"{rno} {cells}")
             if attached == "x":
                 cache.add(fullpath)
                 # print(f"attached cache: {fullpath} {attached}")
-            rno += 1
         print(f"Skipping files already uploaded ({len(cache)} files)")
         return cache
 
@@ -416,6 +550,8 @@ class AssetUploader(BaseApp):
         }
         self.xls.raise_if_conf_value_missing(required)
         self.move = self.xls.get_conf_true(cell="B4")
+        # we're about to create new assets, so a saved filename index gets outdated
+        index_fn.unlink(missing_ok=True)
 
     def _check_scandir(self) -> None:
         """
@@ -434,6 +570,8 @@ class AssetUploader(BaseApp):
         self.filemask = self.xls.get_conf_required(cell="B5", default="*")
         self.ignore_suspicious = self.xls.get_conf_true(cell="B7")
         self.parser = self.xls.get_conf_required(cell="B8")
+        self.use_fn_index = self.xls.get_conf_true(cell="B9")
+        self.use_ident_index = self.xls.get_conf_true(cell="B10")
         if self.parser == "":
             # why not None?
             raise ConfigError("Need identNr parser!")
@@ -455,6 +593,24 @@ class AssetUploader(BaseApp):
                 if wNr not in self.ident_cache:
                     self.ident_cache[wNr] = identNr
 
+    def _checkpoint(self, *, keep: set[str] | None = None) -> None:
+        """
+        Called after every row in go. Every save_every rows, if a save is due (see
+        Xls.save_due), make a backup, save the Excel file and clear the journal,
+        which is not needed anymore now, except for the rows in keep that are still
+        in progress.
+
+        Since saving gets slower as the sheet grows, saves become rarer so that they
+        don't take more than a small share of the run time.
+        """
+        self.rows_done += 1
+        if self.rows_done % self.save_every or not self.xls.save_due():
+            return
+        self.xls.backup()
+        self.xls.save_if_change()
+        if not self.xls.changed:
+            self.journal.clear(keep=keep)
+
     def _create_from_template(
         self,
         *,
@@ -526,9 +682,12 @@ class AssetUploader(BaseApp):
                 templateM=templateM,
                 creatorID=creatorID,
             )
+            # the cached answer for this filename is outdated now
+            self.client.invalidate_cache(kind="mulIds", key=Path(fn).name)
             self.xls.set_change()
             cells["asset_fn_exists"].value = new_asset_id
             cells["asset_fn_exists"].font = teal
+            self._journal(cells, "asset_fn_exists")
             print(f"   asset {new_asset_id} created")
 
     def _exif_creator(self, *, path: Path) -> Optional[str]:
@@ -541,12 +700,25 @@ class AssetUploader(BaseApp):
         A few file types are exempt from checking.
         """
 
-        # known extensions that dont work with exif
-        exclude_exts = (".jpg", ".exr", ".obj", ".pdf", ".xml", ".zip")
-        if path.suffix.lower() in exclude_exts:
+        if path.suffix.lower() in EXIF_IGNORE_SUFFIXES:
             print(f"\tExif: ignoring suffix {path.suffix}")
             return None
 
+        if path in self.artists:
+            artist = self.artists[path]
+            if artist is None:
+                print("\tExif:Didn't find photographer info")
+            return artist
+
+        try:
+            artist = read_artist(path)
+        except (NotSupportedError, OSError, struct.error):
+            pass  # let PIL try
+        else:
+            if artist is None:
+                print("\tExif:Didn't find photographer info")
+            return artist
+
         try:
             with Image.open(str(path)) as img:
                 img_data = img.getexif()
@@ -564,7 +736,26 @@ class AssetUploader(BaseApp):
         # else:
         #    return "; ".join(img_data[ExifBase.Artist.value])
 
-    def _file_to_list(self, *, path: Path, rno=None):
+    def _drop_gone(self, paths: list[str], *, snapshot: Snapshot) -> None:
+        """
+        For files that have disappeared since the last scandir: drop their rows
+        from the Excel, unless they have been attached already, and forget them.
+        """
+        fullpath_cno = self.xls.colmap()["fullpath"]
+        rnos = list()
+        for path in paths:
+            rno = self.xls.path_exists(
+                path=str(Path(path).absolute()), cno=fullpath_cno, sheet=self.ws
+            )
+            if rno is not None:
+                cells = self.xls._rno2dict(rno, sheet=self.ws)
+                if cells["attached"].value != "x":
+                    print(f"   gone: {path}")
+                    rnos.append(rno)
+            snapshot.forget(path)
+        self.xls.drop_rows(sheet=self.ws, rnos=rnos)
+
+    def _file_to_list(self, *, path: Path, rno=None, content_hash: str | None = None):
         """
         If rno is None, add a new file to the end of the Excel list; else update the row
         specified by rno.
@@ -573,8 +764,9 @@ class AssetUploader(BaseApp):
         """
         # print(f"file_to_list '{path}'")
         if rno is None:
-            rno = self.ws.max_row + 1  # max_row seems to be zero-based
+            rno = self.xls.max_row(sheet=self.ws) + 1  # max_row seems to be zero-based
         cells = self.xls._rno2dict(rno, sheet=self.ws)
+        self.xls.set_change()
         fullpath = path.absolute()  # .resolve() problems on UNC
         # only write in empty fields
         # relative path, but not if we use this recursively
@@ -588,6 +780,7 @@ class AssetUploader(BaseApp):
 
         if cells["fullpath"].value is None:
             cells["fullpath"].value = str(fullpath)
+        self._write_hash(cells, content_hash)
         # print (f"***{path}")
         self._write_asset_fn(cells, fullpath)
 
@@ -618,12 +811,209 @@ class AssetUploader(BaseApp):
                 self.xls.request_shutdown()
         else:
             cells["attached"].value = "File not found"
+            self.xls.set_change()
+            self._journal(cells, "attached")
             print(f"WARN: {p} doesn't exist (anymore)")
 
+    def _go_collect(self, pending: dict, *, wait_all: bool = False) -> None:
+        """
+        Wait for rows from _go_pipelined to finish (at least one or all) and write
+        their results into the Excel rows. Rows are written even if they failed,
+        since they might have created an asset already; the first error is raised
+        afterwards.
+        """
+        # rows that were cancelled on shutdown never started; wait would hang on them
+        for future in [future for future in pending if future.cancelled()]:
+            del pending[future]
+        if not pending:
+            return
+        done, _ = wait(
+            list(pending), return_when=ALL_COMPLETED if wait_all else FIRST_COMPLETED
+        )
+        error = None
+        for future in done:
+            cells, detached, rno = pending.pop(future)
+            if future.exception() is not None and error is None:
+                error = future.exception()
+            for key, cell in detached.items():
+                if cells[key].value != cell.value:
+                    cells[key].value = cell.value
+                if cell.font is not None:
+                    cells[key].font = cell.font
+            self._row_done(cells)
+            # rows in progress may have written to the journal already
+            self._checkpoint(
+                keep={detached["fullpath"].value for c, detached, r in pending.values()}
+            )
+        if error is not None:
+            raise error
+
+    def _go_pipelined(self) -> None:
+        """
+        Loop of go with up to self.workers rows in progress at the same time, so that
+        asset creation, attachment upload and Standardbild of different rows overlap.
+
+        Workers get a detached copy of the row's cells (value and font only) and run
+        _go on it; they never touch the workbook. The results are written back into
+        the Excel rows here in the main thread (see _go_collect).
+
+        Rows with the same content as a row in progress wait until that row is done
+        (see _is_duplicate); they are tried in rounds after the loop.
+
+        On KeyboardInterrupt we don't start new rows, but finish and write the rows
+        in progress before the planned shutdown.
+        """
+        self._prepare_template()  # once, before the workers need it
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="up")
+        pending: dict = {}  # future -> (cells, detached, rno)
+
+        def submit(cells: dict, rno: int) -> None:
+            p = self._go_todo(cells, rno)
+            if p is not None:
+                detached = {
+                    key: SimpleNamespace(value=cell.value, font=None)
+                    for key, cell in cells.items()
+                }
+                future = executor.submit(self._go, cells=detached, rno=rno, p=p)
+                pending[future] = (cells, detached, rno)
+            # bounded: dont read further ahead than necessary
+            while len(pending) >= 2 * self.workers:
+                self._go_collect(pending)
+
+        try:
+            for cells, rno in self.xls.loop(
+                sheet=self.ws, offset=self.offset, limit=self.limit
+            ):
+                print(f"{rno}: {cells['identNr'].value} up")
+                submit(cells, rno)
+                if self.xls.shutdown_requested:
+                    break
+            self._go_collect(pending, wait_all=True)
+            while self.deferred and not self.xls.shutdown_requested:
+                rows, self.deferred = self.deferred, []
+                for cells, rno in rows:
+                    print(f"{rno}: {cells['identNr'].value} up (waited)")
+                    submit(cells, rno)
+                self._go_collect(pending, wait_all=True)
+        except KeyboardInterrupt:
+            self.xls.request_shutdown()
+        finally:
+            # dont start new rows, but write those in progress, also on errors, so
+            # that the Excel file knows about the assets we've created
+            executor.shutdown(wait=True, cancel_futures=True)
+            self._go_collect(pending, wait_all=True)
+        self.xls.save_if_change()
+        self.xls.shutdown_if_requested()
+
+    def _go_todo(self, cells: dict, rno: int) -> Path | None:
+        """
+        Returns the path of the file to upload if there is something to do for this
+        row; None otherwise.
+        """
+        if cells["ref"].value == "None":
+            print("   object reference unknown, not creating assets nor attachments")
+            return None
+
+        if cells["fullpath"].value is None:
+            print("Fullpath is missing")
+            return None
+
+        match cells["attached"].value:
+            case "x":
+                print("File already uploaded")
+            case "File not found":
+                print("File already marked as missing")
+            case "Duplikat":
+                print("Same content uploaded from another file")
+            case _:
+                if self._is_duplicate(cells, rno):
+                    return None
+                return Path(cells["fullpath"].value)
+        return None
+
+    def _is_duplicate(self, cells: dict, rno: int) -> bool:
+        """
+        True if we don't upload this row now:
+        - the same content has been attached from another file, in this or an
+          earlier run; then the row is marked "Duplikat" and no asset is created.
+        - the same content is being uploaded from another file right now; then the
+          row waits in self.deferred until that upload is done (see _row_done),
+          since the upload may still fail.
+        Else the row claims its content until it's done.
+        """
+        content_hash = cells["hash"].value
+        if content_hash is None:
+            return False
+        fullpath = cells["fullpath"].value
+        first = self.uploaded.get(content_hash, fullpath)
+        if first != fullpath:
+            print(f"   same content as {first}, not uploading")
+            cells["attached"].value = "Duplikat"
+            self.xls.set_change()
+            self._journal(cells, "attached")
+            return True
+        claimant = self.claimed.setdefault(content_hash, fullpath)
+        if claimant != fullpath:
+            print(f"   same content as {claimant}, waiting for that upload")
+            self.deferred.append((cells, rno))
+            return True
+        return False
+
+    def _journal(self, cells: dict, col: str) -> None:
+        """
+        Record the new value of column col in the journal.
+        """
+        self.journal.append(
+            fullpath=cells["fullpath"].value, col=col, value=cells[col].value
+        )
+
+    def _known_hashes(self, *, attached: bool = False) -> dict[str, str]:
+        """
+        Returns {hash: fullpath} for the files in the Excel list (or only for those
+        that have been attached); the first row wins.
+        """
+        known: dict[str, str] = {}
+        for cells, rno in self.xls.loop(sheet=self.ws):
+            content_hash = cells["hash"].value
+            if content_hash is None:
+                continue
+            if attached and cells["attached"].value != "x":
+                continue
+            known.setdefault(content_hash, cells["fullpath"].value)
+        return known
+
+    def _known_fullpaths(self) -> set[str]:
+        """
+        Returns the full paths of all files in the Excel list.
+        """
+        return {cells["fullpath"].value for cells, rno in self.xls.loop(sheet=self.ws)}
+
+    def _replay_journal(self) -> None:
+        """
+        Write steps that are in the journal, but not in the Excel file (because the
+        last run died before it could save), into the Excel rows.
+        """
+        latest = self.journal.latest()
+        if not latest:
+            return
+        print(f"Replaying journal for {len(latest)} files")
+        # loop without limit
+        for cells, rno in self.xls.loop(sheet=self.ws):
+            values = latest.pop(cells["fullpath"].value, None)
+            if values is None:
+                continue
+            for col, value in values.items():
+                if cells[col].value != value:
+                    print(f"   {rno}: {col} {cells[col].value} -> {value}")
+                    cells[col].value = value
+                    self.xls.set_change()
+        for fullpath in latest:
+            print(f"WARNING: File from journal not in Excel: {fullpath}")
+        self.xls.save_if_change()
+        self.journal.clear()
+
     def _init_wbws(self):
         self.xls.raise_if_no_file()
-        # die if not writable so that user can close it before waste of time
-        self.xls.save()
         try:
             self.wb
         except:
@@ -632,6 +1022,11 @@ class AssetUploader(BaseApp):
             self.ws
         except:
             self.ws = self.wb["Assets"]
+            if self.db:
+                self.xls.use_store(sheet=self.ws)
+        # die if not writable so that user can close it before waste of time
+        # (with a store, this only commits)
+        self.xls.save()
 
     def _get_mulId(self, *, fullpath: Path) -> int | str:
         """
@@ -694,9 +1089,76 @@ class AssetUploader(BaseApp):
             "A8": "IdentParser",
             "B8": "EM",
             "C8": "Algorithmus um Ident.Nr aus Dateiname zu extrahieren.",
+            "A9": "Dateinamen-Index?",
+            "B9": "False",
+            "C9": """Wenn True lädt scandir einmal alle Dateinamen der Assets der orgUnit aus RIA, statt für jede Datei einzeln nachzufragen. Lohnt sich für viele Dateien.""",
+            "A10": "IdentNr-Index?",
+            "B10": "False",
+            "C10": """Wenn True lädt scandir einmal alle IdentNrn der Objekte der orgUnit aus RIA; Ganzes, Teile und Geschwister werden dann lokal nachgeschlagen.""",
         }
         self.xls.make_conf(conf)
 
+    def _prefetch_artists(self, files: list[FileEntry]) -> None:
+        """
+        Read the Artist tag of the files on a process pool, only the header (see
+        exif.py). Results go into self.artists for _exif_creator and into the cache,
+        keyed by the full path with size and mtime as scope, so that a re-run doesn't
+        read unchanged files again.
+        """
+        cache = self.client.cache
+        todo = list()
+        for f in files:
+            if f.path.suffix.lower() in EXIF_IGNORE_SUFFIXES:
+                continue
+            if cache is not None:
+                hit, artist = cache.get(
+                    kind="artist",
+                    key=str(f.path.absolute()),
+                    scope=f"{f.size}|{f.mtime_ns}",
+                )
+                if hit:
+                    self.artists[f.path] = artist
+                    continue
+            todo.append(f)
+        if not todo:
+            return
+        print(f"Reading photographers from {len(todo)} files")
+        items = list()
+        for f, (path, artist, supported) in zip(
+            todo, read_artists(f.path for f in todo)
+        ):
+            if not supported:
+                continue  # _exif_creator falls back to PIL
+            self.artists[path] = artist
+            items.append((str(path.absolute()), f"{f.size}|{f.mtime_ns}", artist))
+        if cache is not None:
+            cache.set_many(kind="artist", items=items)
+
+    def _prefetch_objIds(self, file_list: list[Path]) -> None:
+        """
+        Extract the identNrs (and their wholes) from the filenames in file_list and
+        look them up in a few batched queries. Results go into self.objIds_cache, so
+        that _get_objIds doesn't need a request per file.
+
+        Not for the iitm parser which gets its identNr from prepare.xlsx.
+        """
+        if self.parser == "iitm":
+            return
+        identNrs = set()
+        for p, identNr in parse_many(file_list, parser=self.parser):
+            if identNr is None or is_suspicious(identNr=identNr):
+                continue
+            identNrs.add(identNr)
+            identNrs.add(whole_for_parts(identNr))
+        new = [ident for ident in identNrs if ident not in self.objIds_cache]
+        if new:
+            print(f"Prefetching objIds for {len(new)} identNrs")
+            self.objIds_cache.update(
+                self.client.get_objIds_many(
+                    identNrs=sorted(new), strict=True, orgUnit=self.orgUnit
+                )
+            )
+
     def _prepare_template(self) -> Module:
         try:
             return self.templateM
@@ -728,6 +1190,7 @@ class AssetUploader(BaseApp):
             if self._attach_asset(path=fn, mulId=ID):
                 self.xls.set_change()
                 cells["attached"].value = "x"
+                self._journal(cells, "attached")
                 self._move(fn)
         else:
             print("   asset already attached")
@@ -748,10 +1211,73 @@ class AssetUploader(BaseApp):
             else:
                 print("Warning: dst exists already")
 
+    def _row_done(self, cells: dict) -> None:
+        """
+        Called when go is done with a row: the row's content is no longer claimed
+        and, if the row has been attached, counts as uploaded from now on (see
+        _is_duplicate).
+        """
+        content_hash = cells["hash"].value
+        if content_hash is None:
+            return
+        fullpath = cells["fullpath"].value
+        if self.claimed.get(content_hash) == fullpath:
+            del self.claimed[content_hash]
+        if cells["attached"].value == "x":
+            self.uploaded.setdefault(content_hash, fullpath)
+
     def _set_Standardbild(self, c) -> Optional[int]:
         """
         Set asset as standardbild for known object; only succeeds if object has no
-        Standardbild yet.
+        Standardbild yet. Rows of the same object take turns (see _go_pipelined),
+        since mk_asset_standardbild2 looks for a Standardbild before it sets one.
+        """
+        pair = self._standardbild_pair(c)
+        if pair is None:
+            return 0
+        objId, mulId = pair
+        print("   setting standardbild")
+        with self.standardbild_lock:
+            lock = self.standardbild_locks.setdefault(objId, threading.Lock())
+        with lock:
+            r = self.client.mk_asset_standardbild2(objId=objId, mulId=mulId)
+        if r is not None and r.status_code == 204:
+            self.xls.set_change()
+            # print(f"xxx {r.status_code}")
+            # print("   setting column N to done")
+            c["standardbild"].value = "done"
+            self._journal(c, "standardbild")
+        else:
+            print("   NOT setting column N to done")
+        return 1
+
+    def _set_Standardbild_many(self, batch: list[tuple[dict, tuple[int, int]]]) -> None:
+        """
+        Set Standardbild for a batch of rows at once; batch is a list of tuples
+        (cells, (objId, mulId)). Saves the Excel file afterwards.
+        """
+        if not batch:
+            return
+        print(f"   setting standardbild for {len(batch)} rows")
+        try:
+            results = self.client.mk_asset_standardbild_many(
+                pairs=[pair for c, pair in batch]
+            )
+        except KeyboardInterrupt:
+            self.xls.request_shutdown()
+            results = dict()
+        for c, pair in batch:
+            r = results.get(pair)
+            if r is not None and r.status_code == 204:
+                self.xls.set_change()
+                c["standardbild"].value = "done"
+        self.xls.save_if_change()
+        self.xls.shutdown_if_requested()
+
+    def _standardbild_pair(self, c) -> tuple[int, int] | None:
+        """
+        Returns (objId, mulId) if the row asks for a Standardbild that is not set yet;
+        None otherwise.
         """
         stdbild = c["standardbild"].value  # just a shortcut
         if c["asset_fn_exists"].value is None or c["asset_fn_exists"].value == "None":
@@ -769,17 +1295,8 @@ class AssetUploader(BaseApp):
                     except:
                         # if multiple mulIDs, take the first
                         mulId = int(assetID.split(";")[0])
-                    print("   setting standardbild")
-                    r = self.client.mk_asset_standardbild2(objId=objId, mulId=mulId)
-                    if r is not None and r.status_code == 204:
-                        self.xls.set_change()
-                        # print(f"xxx {r.status_code}")
-                        # print("   setting column N to done")
-                        c["standardbild"].value = "done"
-                    else:
-                        print("   NOT setting column N to done")
-                    return 1
-        return 0
+                    return objId, mulId
+        return None
 
     def _write_asset_fn(self, cells, fullpath):
         if cells["asset_fn_exists"].value is None:
@@ -793,6 +1310,23 @@ class AssetUploader(BaseApp):
                 # tested if asset is linked to any or correct object.
                 # We need the x here to fast-forward during continous mode
 
+    def _write_hash(self, cells: dict, content_hash: str | None) -> None:
+        """
+        Write the content hash; the file has been hashed because it's new or has
+        changed, so we overwrite. If another file in the list has the same content,
+        mark the hash red and say so in notes (unless there's a note already).
+        """
+        if content_hash is None:
+            return
+        cells["hash"].value = content_hash
+        fullpath = cells["fullpath"].value
+        first = self.known_hashes.setdefault(content_hash, fullpath)
+        if first != fullpath:
+            print(f"   same content as {first}")
+            cells["hash"].font = red
+            if cells["notes"].value is None:
+                cells["notes"].value = f"Duplikat von {first}"
+
     def _write_identNr(self, cells: dict, path: Path) -> None:
         wNr = cells["wNr"].value
         if cells["identNr"].value is None:
@@ -825,7 +1359,8 @@ class AssetUploader(BaseApp):
         We recently switched to to get_objIds_startswith internally. Now we have the
         problem that I B 100 a-k also finds I B 1009, so false siblings.
 
-        we want to use the new get_objIds_startswith
+        Now we use get_objIds_siblings which filters those out and answers from the
+        local identNr index, if that is switched on (conf B10).
 
         should return dict [identNr]: 12345; 1234
 
@@ -843,16 +1378,11 @@ class AssetUploader(BaseApp):
             ident_whole = whole_for_parts(identNr)
             # print(f"+++{identNr}")
 
-            # new version that adds a space after identNr
-            IDs = self.client.get_objIds_startswith(
+            # only identNrs that continue with a space after the whole
+            IDs2 = self.client.get_objIds_siblings(
                 orgUnit=self.orgUnit,
-                identNr=ident_whole,
+                identNr_whole=ident_whole,
             )
-            IDs2 = {}
-            for objId in IDs:
-                identNr = IDs[objId]
-                if identNr.startswith(f"{ident_whole} "):
-                    IDs2[objId] = identNr
 
             # format as string
             parts_str = ""
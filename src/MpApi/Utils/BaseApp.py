@@ -23,6 +23,7 @@ Let's avoid print messages from here! Not really, let's write the usual print me
 Let's typically log errors?
 """
 
+from MpApi.Utils.IdentNr_Cache import Ident_Cache, cache_fn
 from MpApi.Utils.logic import has_parts
 from MpApi.Utils.Xls import ConfigError
 from pathlib import Path
@@ -74,6 +75,23 @@ class BaseApp:
         )
         return objId_set
 
+    def _init_cache(
+        self, *, excel_fn: str | Path, cache: bool = True, clear_cache: bool = False
+    ) -> Ident_Cache | None:
+        """
+        Returns the on-disk cache of RIA lookups (see IdentNr_Cache.py) or None if the
+        app should neither use nor fill it. The cache lives next to the app's Excel
+        file (excel_fn). clear_cache forgets all cached lookups before we start.
+        """
+        if not cache:
+            print("Not using the cache of RIA lookups")
+            return None
+        ident_cache = Ident_Cache(path=Path(excel_fn).absolute().parent / cache_fn)
+        if clear_cache:
+            print(f"Clearing the cache of RIA lookups ({ident_cache.path})")
+            ident_cache.clear()
+        return ident_cache
+
     def _init_limit(self, limit: int = -1) -> int:
         limit = int(limit)
         if limit > -1 and limit < 3:
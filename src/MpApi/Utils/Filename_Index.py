@@ -0,0 +1,136 @@
+"""
+A local index of the filenames of all Multimedia records (of one orgUnit), so that
+scandir steps don't need to ask RIA once per file if an asset with that filename
+exists already.
+
+The index is built by paging through the Multimedia records once, asking only for
+__id, MulOriginalFileTxt and __orgUnit (see RIA.prefetch_filenames). It is saved as a
+JSON file, so that it can be re-used for a while:
+
+    {
+        "created": 1700000000.0,
+        "scope": "EMMusikethnologie",
+        "files": {"eins.jpg": [["6572162", "EMMusikethnologie"]]},
+        "stale": ["zwei.jpg"]
+    }
+
+The scope is the orgUnit the index was built for; None means all orgUnits. An index
+can only answer lookups that lie inside its scope. For all other lookups and for
+filenames that have been discarded (e.g. because we just uploaded a new asset with
+that name) lookup returns None and the caller has to ask RIA.
+
+Usage:
+    idx = Filename_Index(path=Path(".ria_fn_index.json"))
+    if not idx.load(scope="EMMusikethnologie"):
+        for mulId, fn, orgUnit in client.iter_filenames(orgUnit="EMMusikethnologie"):
+            idx.add(fn=fn, mulId=mulId, orgUnit=orgUnit)
+        idx.save()
+    mulIds = idx.lookup(fn="eins.jpg", orgUnit="EMMusikethnologie")  # set or None
+"""
+
+import json
+from pathlib import Path
+import threading
+import time
+
+# a dot file, so it gets ignored by the scandir steps
+index_fn = Path(".ria_fn_index.json")
+
+
+class Filename_Index:
+    def __init__(
+        self,
+        *,
+        path: str | Path = index_fn,
+        max_age: int = 24 * 3600,
+        scope: str | None = None,
+    ) -> None:
+        """
+        max_age: seconds after which a saved index is considered stale and not loaded
+        scope: orgUnit the index is built for; None for all orgUnits
+        """
+        self.path = Path(path)
+        self.max_age = max_age
+        self.scope = scope
+        self.created = time.time()
+        self.files: dict[str, list[tuple[str, str | None]]] = {}
+        self.stale: set[str] = set()
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.files)
+
+    def add(self, *, fn: str, mulId: str | int, orgUnit: str | None) -> None:
+        """
+        Add one Multimedia record to the index. Adding a discarded filename makes it
+        known again.
+        """
+        entry = (str(mulId), orgUnit)
+        with self.lock:
+            entries = self.files.setdefault(fn, [])
+            if entry not in entries:
+                entries.append(entry)
+            self.stale.discard(fn)
+
+    def covers(self, orgUnit: str | None) -> bool:
+        """
+        Can the index answer a lookup for this orgUnit?
+        """
+        return self.scope is None or self.scope == orgUnit
+
+    def discard(self, fn: str) -> None:
+        """
+        Forget what we know about a filename; lookups for it return None afterwards.
+        """
+        with self.lock:
+            self.files.pop(fn, None)
+            self.stale.add(fn)
+
+    def load(self, *, scope: str | None = None) -> bool:
+        """
+        Load the index from disk if the file exists, is not older than max_age and
+        covers the requested scope. Returns True on success.
+        """
+        if not self.path.exists():
+            return False
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if time.time() - data["created"] > self.max_age:
+            return False
+        if data["scope"] is not None and data["scope"] != scope:
+            return False
+        with self.lock:
+            self.scope = data["scope"]
+            self.created = data["created"]
+            self.files = {
+                fn: [tuple(entry) for entry in entries]
+                for fn, entries in data["files"].items()
+            }
+            self.stale = set(data.get("stale", []))
+        return True
+
+    def lookup(self, *, fn: str, orgUnit: str | None = None) -> set | None:
+        """
+        Return the mulIds of records with that filename as set (in the same format as
+        RIA.fn_to_mulId). If orgUnit is specified, only records from that orgUnit are
+        returned. Returns None if the index can't answer the question.
+        """
+        if not self.covers(orgUnit):
+            return None
+        with self.lock:
+            if fn in self.stale:
+                return None
+            entries = self.files.get(fn, [])
+        return {mulId for mulId, unit in entries if orgUnit is None or unit == orgUnit}
+
+    def save(self) -> None:
+        with self.lock:
+            data = {
+                "created": self.created,
+                "scope": self.scope,
+                "files": self.files,
+                "stale": sorted(self.stale),
+            }
+            text = json.dumps(data, ensure_ascii=False)
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(text)
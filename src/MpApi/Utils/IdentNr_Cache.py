@@ -4,69 +4,169 @@ Definitions
 - objNumber is a value from ObjObjectNumberVrt.
 - objId is the ID of an object.
 
-We want to cache objId to reduce number of HTTP requests to RIA.
+We want to cache lookups to reduce the number of HTTP requests to RIA. Since the cache
+is saved on disk (SQLite), a re-run after a crash or a restart of 'upload up' or
+'prepare checkria' can answer most lookups without asking RIA again.
 
-Every record can have only one objId, but it's conceivable that one identNr exists in multiple records.
-It's also possible that one object has multiple different identNr.
+Every record can have only one objId, but it's conceivable that one identNr exists in
+multiple records. It's also possible that one object has multiple different identNr.
+So we cache lists:
 
-cache = {
-    "identNr1": [123456, 123457]
-}
+    kind      key          scope                  value
+    objIds    "VII c 123"  "strict|EMMusikethno"  [123456, 123457]
+    mulIds    "eins.jpg"   "EMMusikethnologie"    ["6572162"]
 
-The question is if we also want to store the objNumber since we're not sure if objNumber is always equal
-to the identNr?
+The scope contains everything else the lookup depends on (e.g. orgUnit, strict).
 
-cache = {
-    "identNr1": {
-        "objId": [123456, 123457]
-        "objNumber": "objNumber1"
-}
-
-Do we need this for mulIds too?
+Entries expire after ttl seconds. Empty results ("None") are cached, too (negative
+caching), but expire after the shorter neg_ttl since a missing record might get
+created soon.
 
 Usage:
-    ident_cache_strict = Ident_Cache()
-    ident_cache_strict.get_strict(identNr="VII c 123 a")
-
-    ident_cache_lax = Ident_Cache()
-    beginswith_cache.get_begins_with(identNr="VII c 123 a")
-
+    cache = Ident_Cache(path=Path(".ria_cache.db"))
+    hit, value = cache.get(kind="objIds", key="VII c 123", scope="strict|None")
+    if not hit:
+        value = lookup_in_ria()
+        cache.set(kind="objIds", key="VII c 123", scope="strict|None", value=value)
+
+    cache.invalidate(kind="objIds", key="VII c 123")  # all scopes
+    cache.invalidate_prefixes(kind="startswith", identNr="VII c 123 a")
+    cache.clear()  # everything
 """
 
-from dataclass import dataclass, field
+import json
+from MpApi.Utils.IdentNr_Index import lax_form
+from pathlib import Path
+import sqlite3
+import threading
+import time
+from typing import Any, Iterable
 
+# a dot file, so it gets ignored by the scandir steps
+cache_fn = Path(".ria_cache.db")
 
-class Ident_Cache:
-    def __init__(self) -> None:
-        cache_strict = {}
-        cache_begins_with = {}
 
-    def get_strict(self, *, as_str: str) -> IdentNr:
-        if identNr in cache_strict:
-            return cache_strict[identNr]
-        else:
-            objIds = self.ria.get_strict(identNr=identNr)
-            identNr = IdentNr(as_str=identNr, objIds=objIds)
-            cache_strict[identNr] = identNr
-            return objIds
-
-    def get_begins_with(self, *, as_str: str) -> IdentNr:
-        if as_str in cache_strict_begins_with:
-            return cache_begins_with[as_str]
+class Ident_Cache:
+    def __init__(
+        self,
+        *,
+        path: str | Path = cache_fn,
+        ttl: int = 7 * 24 * 3600,
+        neg_ttl: int = 24 * 3600,
+    ) -> None:
+        """
+        ttl: seconds until a cached result expires
+        neg_ttl: seconds until a cached empty result expires
+        """
+        self.path = Path(path)
+        self.ttl = ttl
+        self.neg_ttl = neg_ttl
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        # cheap commits; we can afford to lose the last entries on a power failure
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cache (
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                scope TEXT NOT NULL,
+                value TEXT NOT NULL,
+                empty INTEGER NOT NULL,
+                created REAL NOT NULL,
+                PRIMARY KEY (kind, key, scope)
+            )"""
+        )
+        self.db.commit()
+
+    def clear(self) -> None:
+        """
+        Delete all entries from the cache.
+        """
+        with self.lock:
+            self.db.execute("DELETE FROM cache")
+            self.db.commit()
+
+    def close(self) -> None:
+        with self.lock:
+            self.db.close()
+
+    def get(self, *, kind: str, key: str, scope: str = "") -> tuple[bool, Any]:
+        """
+        Returns a tuple (hit, value). If there is no entry or the entry has expired,
+        hit is False and value None. Since None can be a legitimate value, always
+        check hit.
+        """
+        with self.lock:
+            row = self.db.execute(
+                "SELECT value, empty, created FROM cache WHERE kind=? AND key=? AND scope=?",
+                (kind, str(key), scope),
+            ).fetchone()
+        if row is None:
+            return False, None
+        value, empty, created = row
+        if empty:
+            ttl = self.neg_ttl
         else:
-            objIds = self.ria.get_strict(identNr=as_str)  # should return new identNr
-            identNr = IdentNr(as_str=identNr, objIds=objIds)  # objNumber
-            cache_begins_with[as_str] = identNr
-            return objIds
-
-
-@dataclass(slots=True)
-class IdentNr:
-    """
-    To cache identNr that were extracted from filenames and their corresponding objIds.
-    There can be multiple objIds for each identNr
-    """
-
-    as_str: str
-    objNumber: str
-    objIds: field(default_factory=list)
+            ttl = self.ttl
+        if time.time() - created > ttl:
+            return False, None
+        return True, json.loads(value)
+
+    def invalidate(self, *, kind: str, key: str | None = None) -> None:
+        """
+        Delete a single key (in all scopes) or, if key is None, all entries of a kind.
+        """
+        with self.lock:
+            if key is None:
+                self.db.execute("DELETE FROM cache WHERE kind=?", (kind,))
+            else:
+                self.db.execute(
+                    "DELETE FROM cache WHERE kind=? AND key=?", (kind, str(key))
+                )
+            self.db.commit()
+
+    def invalidate_prefixes(self, *, kind: str, identNr: str) -> None:
+        """
+        Delete the entries (in all scopes) whose key is a beginning of identNr, e.g.
+        "VII c 12", "VII c 123" and "vii c 123 A" for the new record "VII c 123 a".
+        Like RIA's startsWithField and equalsField, we ignore case and Sonderzeichen.
+        """
+        lax = lax_form(str(identNr))
+        with self.lock:
+            keys = [
+                (kind, key)
+                for (key,) in self.db.execute(
+                    "SELECT DISTINCT key FROM cache WHERE kind=?", (kind,)
+                )
+                if lax.startswith(lax_form(key))
+            ]
+            self.db.executemany("DELETE FROM cache WHERE kind=? AND key=?", keys)
+            self.db.commit()
+
+    def set(self, *, kind: str, key: str, value: Any, scope: str = "") -> None:
+        """
+        Save a value in the cache. Value has to be json serializable; sets should be
+        converted to lists before. None and empty containers count as negative result.
+        """
+        self.set_many(kind=kind, items=[(key, scope, value)])
+
+    def set_many(self, *, kind: str, items: Iterable[tuple[str, str, Any]]) -> None:
+        """
+        Like set, but for many (key, scope, value) tuples and with a single commit.
+        """
+        now = time.time()
+        rows = [
+            (kind, str(key), scope, json.dumps(value), int(_is_empty(value)), now)
+            for key, scope, value in items
+        ]
+        with self.lock:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+            self.db.commit()
+
+
+def _is_empty(value: Any) -> bool:
+    return value is None or (hasattr(value, "__len__") and len(value) == 0)
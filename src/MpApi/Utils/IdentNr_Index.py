@@ -0,0 +1,222 @@
+"""
+A local index of the identNrs (ObjObjectNumberVrt) of all Object records of an
+orgUnit, so that lookups for wholes, parts and siblings don't need a round trip to
+RIA each.
+
+The index is built once by paging through the Object records (see
+RIA.prefetch_identNrs) and kept in two sorted lists:
+- exact: the identNr as it is, for equalsExact-like lookups
+- lax: the identNr without case and Sonderzeichen, imitating RIA's equalsField and
+  startsWithField
+
+Lookups are binary searches (bisect) in these lists. A prefix search is a range scan
+from the first key that is >= the prefix to the last key that starts with it. All
+lookups return a dict {objId: identNr}.
+
+    idx = IdentNr_Index(scope="EMMusikethnologie")
+    idx.add(objId=12345, identNr="VII c 123 a", orgUnit="EMMusikethnologie")
+    idx.exact("VII c 123 a")        # {12345: "VII c 123 a"}
+    idx.lax("vii c 123 A")          # {12345: "VII c 123 a"}
+    idx.startswith("VII c 123")     # {12345: "VII c 123 a"}
+    idx.siblings("VII c 123")       # {12345: "VII c 123 a"}; not VII c 1234
+
+Like the Filename_Index, the index can only answer lookups inside its scope (orgUnit;
+None means all orgUnits) and lookups return None if the index can't answer them,
+e.g. after an identNr has been discarded because we just created a new record.
+
+The index can be saved to disk as JSON and is reused for max_age seconds.
+"""
+
+from bisect import bisect_left
+import json
+from pathlib import Path
+import re
+import threading
+import time
+
+# a dot file, so it gets ignored by the scandir steps
+index_fn = Path(".ria_ident_index.json")
+
+
+def lax_form(text: str) -> str:
+    """
+    Imitate the way RIA compares with equalsField: case and Sonderzeichen don't matter.
+        "VII a 123 >" -> "vii a 123"
+    """
+    return " ".join(re.findall(r"\w+", text.casefold()))
+
+
+class IdentNr_Index:
+    def __init__(
+        self,
+        *,
+        path: str | Path = index_fn,
+        max_age: int = 24 * 3600,
+        scope: str | None = None,
+    ) -> None:
+        """
+        max_age: seconds after which a saved index is considered stale and not loaded
+        scope: orgUnit the index is built for; None for all orgUnits
+        """
+        self.path = Path(path)
+        self.max_age = max_age
+        self.scope = scope
+        self.created = time.time()
+        self.records: list[tuple[int, str, str | None]] = []  # objId, identNr, orgUnit
+        self.stale: set[str] = set()  # lax forms
+        self.lock = threading.Lock()
+        self._exact: list[tuple[str, int]] | None = None  # sorted (identNr, record no)
+        self._lax: list[tuple[str, int]] | None = None  # sorted (lax, record no)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def add(self, *, objId: int, identNr: str, orgUnit: str | None) -> None:
+        with self.lock:
+            self.records.append((int(objId), identNr, orgUnit))
+            self.stale.discard(lax_form(identNr))
+            self._exact = None  # needs to be sorted again
+            self._lax = None
+
+    def covers(self, orgUnit: str | None) -> bool:
+        """
+        Can the index answer a lookup for this orgUnit?
+        """
+        return self.scope is None or self.scope == orgUnit
+
+    def discard(self, identNr: str) -> None:
+        """
+        We don't know anymore what's in RIA for this identNr, e.g. because we just
+        created a record with it. Lookups that could include it return None.
+        """
+        with self.lock:
+            self.stale.add(lax_form(identNr))
+
+    def exact(self, identNr: str, orgUnit: str | None = None) -> dict[int, str] | None:
+        """
+        Records with exactly this identNr (like equalsExact).
+        """
+        if not self._can_answer(identNr, orgUnit):
+            return None
+        exact, lax = self._sorted()
+        return self._results(self._range(exact, identNr.strip(), prefix=False), orgUnit)
+
+    def lax(self, identNr: str, orgUnit: str | None = None) -> dict[int, str] | None:
+        """
+        Records with this identNr, ignoring case and Sonderzeichen (like equalsField).
+        """
+        if not self._can_answer(identNr, orgUnit):
+            return None
+        exact, lax = self._sorted()
+        return self._results(self._range(lax, lax_form(identNr), prefix=False), orgUnit)
+
+    def load(self, *, scope: str | None = None) -> bool:
+        """
+        Load the index from disk if the file exists, is not older than max_age and
+        covers the requested scope. Returns True on success.
+        """
+        if not self.path.exists():
+            return False
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if time.time() - data["created"] > self.max_age:
+            return False
+        if data["scope"] is not None and data["scope"] != scope:
+            return False
+        with self.lock:
+            self.scope = data["scope"]
+            self.created = data["created"]
+            self.records = [tuple(record) for record in data["records"]]
+            self.stale = set(data.get("stale", []))
+            self._exact = None
+            self._lax = None
+        return True
+
+    def save(self) -> None:
+        with self.lock:
+            data = {
+                "created": self.created,
+                "scope": self.scope,
+                "records": self.records,
+                "stale": sorted(self.stale),
+            }
+            text = json.dumps(data, ensure_ascii=False)
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def siblings(
+        self, identNr_whole: str, orgUnit: str | None = None
+    ) -> dict[int, str] | None:
+        """
+        Records whose identNr begins with the whole followed by a space, i.e. the
+        parts of VII c 123 are VII c 123 a and VII c 123 b-c, but not VII c 1234.
+        Case sensitive like the identNr itself.
+        """
+        prefix = f"{identNr_whole.strip()} "
+        if not self._can_answer(prefix, orgUnit, prefix=True):
+            return None
+        exact, lax = self._sorted()
+        return self._results(self._range(exact, prefix, prefix=True), orgUnit)
+
+    def startswith(
+        self, identNr: str, orgUnit: str | None = None
+    ) -> dict[int, str] | None:
+        """
+        Records whose identNr begins with this string, ignoring case and
+        Sonderzeichen (like startsWithField). Returns a dict {objId: identNr}.
+        """
+        if not self._can_answer(identNr, orgUnit, prefix=True):
+            return None
+        exact, lax = self._sorted()
+        return self._results(self._range(lax, lax_form(identNr), prefix=True), orgUnit)
+
+    #
+    # private
+    #
+
+    def _can_answer(
+        self, identNr: str, orgUnit: str | None, *, prefix: bool = False
+    ) -> bool:
+        if not self.covers(orgUnit):
+            return False
+        key = lax_form(identNr)
+        with self.lock:
+            if prefix:
+                return not any(stale.startswith(key) for stale in self.stale)
+            return key not in self.stale
+
+    def _results(self, record_nos, orgUnit: str | None) -> dict[int, str]:
+        results = {}
+        for no in record_nos:
+            objId, identNr, unit = self.records[no]
+            if orgUnit is None or unit == orgUnit:
+                results[objId] = identNr
+        return results
+
+    def _range(self, keys: list[tuple[str, int]], key: str, *, prefix: bool):
+        """
+        Yield record numbers for all keys that are equal to key or, if prefix is True,
+        begin with key.
+        """
+        for i in range(bisect_left(keys, (key, -1)), len(keys)):
+            k, no = keys[i]
+            if k == key or (prefix and k.startswith(key)):
+                yield no
+            else:
+                break
+
+    def _sorted(self) -> tuple[list, list]:
+        """
+        Sort the keys on first use after a change.
+        """
+        with self.lock:
+            if self._exact is None or self._lax is None:
+                self._exact = sorted(
+                    (identNr, no)
+                    for no, (objId, identNr, unit) in enumerate(self.records)
+                )
+                self._lax = sorted(
+                    (lax_form(identNr), no)
+                    for no, (objId, identNr, unit) in enumerate(self.records)
+                )
+            return self._exact, self._lax
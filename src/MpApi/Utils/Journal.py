@@ -0,0 +1,90 @@
+"""
+Write-ahead journal for the progress of 'upload up'
+
+Saving the Excel file means rewriting the whole workbook, which gets slow for big
+upload lists. So we save only every n rows and, in the meantime, record every
+completed step in an append-only journal as soon as it is done, one JSON object per
+line:
+
+    {"fullpath": "C:\\...\\VII c 123 a.tif", "col": "asset_fn_exists", "value": 1234}
+    {"fullpath": "C:\\...\\VII c 123 a.tif", "col": "attached", "value": "x"}
+
+If the process dies between two saves, the next run replays the journal into the
+Excel rows (matched by fullpath), so no work is lost; in particular, assets are not
+created a second time. After a successful save the journal is cleared.
+
+    journal = Journal(path=Path("upload15.journal.jsonl"))
+    journal.append(fullpath=fn, col="attached", value="x")
+    for fullpath, values in journal.latest().items():
+        ...
+    journal.clear()
+"""
+
+import json
+import os
+from pathlib import Path
+import threading
+from typing import Any
+
+
+class Journal:
+    def __init__(self, *, path: str | Path) -> None:
+        self.path = Path(path)
+        self.lock = threading.Lock()
+
+    def append(self, *, fullpath: str, col: str, value: Any) -> None:
+        """
+        Record that column col of the row for fullpath has a new value. The line is
+        on disk when append returns.
+        """
+        line = json.dumps({"fullpath": fullpath, "col": col, "value": value})
+        with self.lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def clear(self, *, keep: set[str] | None = None) -> None:
+        """
+        Forget the journal after the Excel file has been saved. Entries for the
+        fullpaths in keep (e.g. rows still in progress) are kept.
+        """
+        with self.lock:
+            if not keep:
+                self.path.unlink(missing_ok=True)
+                return
+            entries = [e for e in self._entries() if e["fullpath"] in keep]
+            with open(self.path, "w", encoding="utf-8") as f:
+                for entry in entries:
+                    f.write(json.dumps(entry) + "\n")
+
+    def entries(self) -> list[dict]:
+        with self.lock:
+            return self._entries()
+
+    def latest(self) -> dict[str, dict[str, Any]]:
+        """
+        Returns the last value of every column per fullpath:
+            {fullpath: {"asset_fn_exists": 1234, "attached": "x"}}
+        """
+        latest: dict[str, dict[str, Any]] = {}
+        for entry in self.entries():
+            latest.setdefault(entry["fullpath"], {})[entry["col"]] = entry["value"]
+        return latest
+
+    #
+    # private
+    #
+
+    def _entries(self) -> list[dict]:
+        if not self.path.exists():
+            return []
+        entries = []
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # last line incomplete if we died while writing it
+                    print(f"WARNING: ignoring broken line in journal: {line!r}")
+        return entries
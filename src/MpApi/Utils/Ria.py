@@ -29,33 +29,123 @@ Reusable methods that interface with the low-level mpapi client
         search is limited to that orgUnit
     objIds = self.objId_for_ident(identNr="VII f 123")
 
+    results = self.identNrs_exist_many(idents=["VII f 123", "VII f 124"])
+        one query per chunk of identNrs instead of one query per identNr; returns
+        a dict {identNr: [objId, ...]}
+
+    self.prefetch_filenames(orgUnit="EMMusikethnologie")
+        pages through all Multimedia records of that orgUnit once and builds a local
+        filename index; afterwards fn_to_mulId answers from that index
+
+    self.prefetch_identNrs(orgUnit="EMMusikethnologie")
+        same for the identNrs of all objects of that orgUnit; afterwards identNr
+        lookups (exact, lax, startswith, siblings) are answered from that index
+
+    for objId, fields in self.search_stream(query=q, mtype="Object"):
+        parses the response incrementally instead of making one big Module; fields
+        is a dict with the field values of the record (see stream.py)
+
+    for objId, fields in self.paginate(mtype="Object", query=make_query):
+        same, but gets the results in pages instead of all at once (limit=-1);
+        make_query(limit, offset) returns the Search, paginate pages it by __id
+
 (4) Change RIA
     objId = self.create_from_template(tid=1234, ttype="Object", ident="VII c 123")
+
+    r = self.upload_attachment(file="big.tif", ID=1234)
+        streams the file from disk and tries again with backoff if the transfer fails
+
+    self.throttle_uploads(maximum=8, rate=5e6)
+        parallel uploads adapt to latency and errors, and together send at most 5 MB/s
 """
 
+from concurrent.futures import ThreadPoolExecutor
 import copy
 from lxml import etree  # type: ignore
 from mpapi.constants import NSMAP, get_credentials
 from mpapi.client import MpApi
 from mpapi.module import Module
 from mpapi.search import Search
+from MpApi.Utils.Filename_Index import Filename_Index
 from MpApi.Utils.identNr import IdentNrFactory
+from MpApi.Utils.IdentNr_Cache import Ident_Cache
+from MpApi.Utils.IdentNr_Index import IdentNr_Index, lax_form
+from MpApi.Utils.Stats import RequestStats
+from MpApi.Utils.stream import AttachmentBody, iter_items
+from MpApi.Utils.throttle import AIMD, ThrottledFile, TokenBucket
 from pathlib import Path
+import re
 import requests
-from typing import Optional
+import time
+from typing import Any, Callable, Iterable, Iterator, Optional
 
 Response = requests.models.Response
 
 DEBUG = True
 
+# client methods that we count and time (see Stats.py)
+INSTRUMENTED = (
+    "createItem",
+    "createItem3",
+    "getItem2",
+    "saveAttachment",
+    "search2",
+    "updateAttachment",
+    "updateItem2",
+    "updateItem4",
+    "updateRepeatableGroup",
+)
+
+# number of OR-combined identNr criteria per search; keeps the query well below the
+# size RIA is willing to accept
+IDENT_CHUNK_SIZE = 50
+
+# namespace of search requests
+SNS = "http://www.zetcom.com/ria/ws/module/search"
+
+# number of times upload_attachment tries again after a failed transfer
+UPLOAD_RETRIES = 3
+
 parser = etree.XMLParser(remove_blank_text=True)
 
 
 class RIA:
-    def __init__(self, *, baseURL: str, user: str, pw: str):
+    def __init__(
+        self,
+        *,
+        baseURL: str,
+        user: str,
+        pw: str,
+        cache: Ident_Cache | None = None,
+        workers: int = 4,
+    ):
+        """
+        cache (optional): a persistent Ident_Cache that answers repeated lookups
+        (get_objIds, fn_to_mulId, get_objIds_startswith, get_photographerID) without
+        a new request to RIA.
+
+        workers (optional): maximum number of requests run_many sends in parallel.
+
+        Requests are counted and timed in self.stats; use
+        self.stats.write(path=excel_fn) at the end of a run to save a summary.
+        """
         self.mpapi = MpApi(baseURL=baseURL, user=user, pw=pw)
+        self.stats = RequestStats()
+        self.stats.instrument(self.mpapi, INSTRUMENTED)
+        if hasattr(self.mpapi, "session"):
+            self.stats.hook(self.mpapi.session)
+        self._post_search = self.stats.wrap("search_stream", self._post_search)
+        self._put_attachment = self.stats.wrap("upload_stream", self._put_attachment)
         self.fac = IdentNrFactory()
         self.photographer_cache: dict[str, list | None] = {}
+        self.cache = cache
+        self.workers = int(workers)
+        self.executor: ThreadPoolExecutor | None = None  # made on first use
+        self.executor_workers = 0
+        self.fn_index: Filename_Index | None = None  # see prefetch_filenames
+        self.ident_index: IdentNr_Index | None = None  # see prefetch_identNrs
+        self.upload_slots: AIMD | None = None  # see throttle_uploads
+        self.bandwidth: TokenBucket | None = None
 
     def create_asset_from_template(self, *, templateM) -> int:
         """
@@ -162,11 +252,56 @@ class RIA:
         orgUnit are returned.
         """
         # ident = identNr.strip()  # really do this?
-        objIdL = self.identNr_exists(nr=identNr, orgUnit=orgUnit, strict=strict)
+        scope = f"{strict}|{orgUnit}"
+        hit, objIdL = self._cache_get(kind="objIds", key=identNr, scope=scope)
+        if not hit:
+            objIdL = self.identNr_exists(nr=identNr, orgUnit=orgUnit, strict=strict)
+            self._cache_set(kind="objIds", key=identNr, scope=scope, value=objIdL)
         if not objIdL:
             return "None"
         return self.rm_junk("; ".join(str(objId) for objId in objIdL))
 
+    def get_objIds_many(
+        self,
+        *,
+        identNrs: Iterable[str],
+        strict: bool = True,
+        orgUnit: str | None = None,
+    ) -> dict[str, str]:
+        """
+        Batch version of get_objIds. Returns a dictionary with the identNr as key and
+        the same string get_objIds would return as value, i.e. a semicolon separated
+        list of objIds or "None".
+
+            objIds = c.get_objIds_many(identNrs=["VII c 123", "VII c 124"])
+            objIds["VII c 123"] # "12345" or "12345; 12346" or "None"
+        """
+        if strict is True:
+            mode = "strict"
+        else:
+            mode = "startswith"
+        scope = f"{strict}|{orgUnit}"
+        results = {}
+        missing = list()
+        for ident in identNrs:
+            hit, objIdL = self._cache_get(kind="objIds", key=ident, scope=scope)
+            if hit:
+                results[ident] = objIdL
+            else:
+                missing.append(ident)
+        if missing:
+            new = self.identNrs_exist_many(idents=missing, orgUnit=orgUnit, mode=mode)
+            for ident, objIdL in new.items():
+                self._cache_set(kind="objIds", key=ident, scope=scope, value=objIdL)
+            results |= new
+        objIds = {}
+        for ident, objIdL in results.items():
+            if not objIdL:
+                objIds[ident] = "None"
+            else:
+                objIds[ident] = self.rm_junk("; ".join(str(objId) for objId in objIdL))
+        return objIds
+
     def get_objIds2(
         self, *, identNr: str, strict: bool = True, orgUnit: str | None = None
     ) -> set:
@@ -220,40 +355,67 @@ class RIA:
 
         WIP: not successfully tested
         """
-        q = Search(module="Object", limit=-1, offset=0)
-        if orgUnit is not None:
-            q.AND()
-        q.addCriterion(
-            field="ObjObjectNumberVrt",
-            operator="startsWithField",
-            value=identNr,
+        if self.ident_index is not None:
+            objIds = self.ident_index.startswith(identNr, orgUnit)
+            if objIds is not None:
+                return objIds
+        hit, objIds = self._cache_get(
+            kind="startswith", key=identNr, scope=str(orgUnit)
         )
-        if orgUnit is not None:
-            q.addCriterion(operator="equalsField", field="__orgUnit", value=orgUnit)
-        q.addField(field="ObjObjectNumberTxt")
-        q.addField(field="ObjObjectNumberVrt")  # dont know what's the difference
-        q.validate(mode="search")  # raises if not valid
-        m = self.mpapi.search2(query=q)
-        objIds = {}
-        objIdL = m.get_ids(mtype="Object")
-        for objId in objIdL:
-            objId = int(objId)
-            objNumberL = m.xpath(
-                f"""/m:application/m:modules/m:module[
-                    @name = 'Object'
-                ]/m:moduleItem[
-                    @id = '{objId}']/m:virtualField[
-                        @name = 'ObjObjectNumberVrt'
-                    ]/m:value"""
+        if hit:
+            # json keys are always str
+            return {int(objId): objIds[objId] for objId in objIds}
+
+        def query(limit: int, offset: int) -> Search:
+            q = Search(module="Object", limit=limit, offset=offset)
+            if orgUnit is not None:
+                q.AND()
+            q.addCriterion(
+                field="ObjObjectNumberVrt",
+                operator="startsWithField",
+                value=identNr,
             )
-            if len(objNumberL) > 1:
-                raise ValueError("1+ identNrs per record.")
-                # If we find cases with multiple objNumbers per record we will need to
-                # save lists as values...
-            if objNumberL:  # if any results
-                objIds[objId] = objNumberL[0].text
+            if orgUnit is not None:
+                q.addCriterion(operator="equalsField", field="__orgUnit", value=orgUnit)
+            q.addField(field="ObjObjectNumberTxt")
+            q.addField(field="ObjObjectNumberVrt")  # dont know what's the difference
+            return q
+
+        # large results for short identNrs, so we get them in pages
+        objIds = {}
+        for objId, fields in self.paginate(mtype="Object", query=query):
+            if fields.get("ObjObjectNumberVrt") is not None:
+                objIds[objId] = fields["ObjObjectNumberVrt"]
+        self._cache_set(
+            kind="startswith", key=identNr, scope=str(orgUnit), value=objIds
+        )
         return objIds
 
+    def get_objIds_siblings(
+        self, *, identNr_whole: str, orgUnit: str | None = None
+    ) -> dict[int, str]:
+        """
+        Returns the records whose identNr begins with the whole followed by a space,
+        i.e. the parts of a whole: VII c 123 a and VII c 123 b-c for VII c 123, but
+        not VII c 1234.
+
+            dict = {
+                12345: "VII c 123 a",
+            }
+
+        Uses the identNr index if we have one (see prefetch_identNrs).
+        """
+        if self.ident_index is not None:
+            objIds = self.ident_index.siblings(identNr_whole, orgUnit)
+            if objIds is not None:
+                return objIds
+        IDs = self.get_objIds_startswith(identNr=identNr_whole, orgUnit=orgUnit)
+        return {
+            objId: identNr
+            for objId, identNr in IDs.items()
+            if identNr.startswith(f"{identNr_whole} ")
+        }
+
     def get_objIds_strict(self, *, identNr: str, orgUnit: str | None = None) -> dict:
         """
         Another version of the get_objIds that uses Zetcom's new exact search which
@@ -271,6 +433,10 @@ class RIA:
 
         Now we need a version of dict.values that lists all distinct identNr
         """
+        if self.ident_index is not None:
+            objIds = self.ident_index.exact(identNr, orgUnit)
+            if objIds is not None:
+                return objIds
         q = Search(module="Object", limit=-1, offset=0)
         if orgUnit is not None:
             q.AND()
@@ -319,7 +485,10 @@ class RIA:
             # print (f"   photographer cache {self.photographer_cache[name]}")
             return self.photographer_cache[name]
         else:
-            IDs = self._get_photographerID(name=name)
+            hit, IDs = self._cache_get(kind="photographer", key=name)
+            if not hit:
+                IDs = self._get_photographerID(name=name)
+                self._cache_set(kind="photographer", key=name, value=IDs)
             self.photographer_cache[name] = IDs
             # print (f"   new photographer {IDs}")
             return IDs
@@ -363,6 +532,13 @@ class RIA:
             for objId in r:
                 do_something()
         """
+        if self.ident_index is not None:
+            if strict is True:
+                objIds = self.ident_index.lax(nr, orgUnit)
+            else:
+                objIds = self.ident_index.startswith(nr, orgUnit)
+            if objIds is not None:
+                return list(objIds)
 
         if strict is True:
             op = "equalsField"
@@ -398,6 +574,14 @@ class RIA:
 
         Who wants such a complicated return value?
         """
+        if self.ident_index is not None:
+            if strict is True:
+                objIds = self.ident_index.lax(nr, orgUnit)
+            else:
+                objIds = self.ident_index.startswith(nr, orgUnit)
+            if objIds is not None:
+                return list(objIds.items())
+
         if strict is True:
             op = "equalsField"
         else:
@@ -438,6 +622,10 @@ class RIA:
 
         orgUnit is optional.
         """
+        if self.ident_index is not None:
+            objIds = self.ident_index.exact(ident, orgUnit)
+            if objIds is not None:
+                return set(objIds)
         q = Search(module="Object", limit=-1, offset=0)
         if orgUnit is not None:
             q.AND()
@@ -457,6 +645,92 @@ class RIA:
             results.add(objId)
         return results
 
+    def identNrs_exist_many(
+        self,
+        *,
+        idents: Iterable[str],
+        orgUnit: Optional[str] = None,
+        mode: str = "strict",
+    ) -> dict[str, list[int]]:
+        """
+        Batch version of identNr_exists/identNr_exists3/get_objIds_strict. Looks up
+        many identNrs with few queries: identNrs are OR-combined in chunks of
+        IDENT_CHUNK_SIZE and the results are mapped back to the identNr they belong to
+        using ObjObjectNumberVrt.
+
+        mode
+        - strict: equalsField, like identNr_exists(strict=True)
+        - exact: equalsExact, like identNr_exists3 or get_objIds_strict
+        - startswith: startsWithField, like identNr_exists(strict=False)
+
+        Returns a dictionary with every distinct identNr as key and a possibly empty
+        list of objIds as value:
+            {
+                "VII c 123": [12345],
+                "VII c 124": [],
+            }
+
+        Since RIA ignores Sonderzeichen for equalsField and startsWithField, we compare
+        in strict and startswith mode in the same lax way (see lax_form).
+        """
+        match mode:
+            case "strict":
+                op = "equalsField"
+            case "exact":
+                op = "equalsExact"
+            case "startswith":
+                op = "startsWithField"
+            case _:
+                raise ValueError(f"Unknown mode '{mode}'")
+
+        # distinct identNrs in original order
+        identL = list(dict.fromkeys(ident for ident in idents if ident is not None))
+        results: dict[str, list[int]] = {ident: [] for ident in identL}
+        if self.ident_index is not None:
+            # answer what we can from the local index and only ask RIA for the rest
+            lookup = {
+                "strict": self.ident_index.lax,
+                "exact": self.ident_index.exact,
+                "startswith": self.ident_index.startswith,
+            }[mode]
+            missing = list()
+            for ident in identL:
+                objIds = lookup(ident, orgUnit)
+                if objIds is None:
+                    missing.append(ident)
+                else:
+                    results[ident] = list(objIds)
+            identL = missing
+        for start in range(0, len(identL), IDENT_CHUNK_SIZE):
+            chunk = identL[start : start + IDENT_CHUNK_SIZE]
+            q = Search(module="Object", limit=-1, offset=0)
+            if orgUnit is not None:
+                q.AND()
+                q.addCriterion(operator="equalsField", field="__orgUnit", value=orgUnit)
+            if len(chunk) > 1:
+                q.OR()
+            for ident in chunk:
+                q.addCriterion(
+                    field="ObjObjectNumberVrt", operator=op, value=str(ident)
+                )
+            q.addField(field="ObjObjectNumberVrt")
+            q.validate(mode="search")  # raises if not valid
+            m = self.mpapi.search2(query=q)
+            for itemN in m.iter(module="Object"):
+                objId = int(itemN.xpath("@id")[0])
+                objNumberL = itemN.xpath(
+                    "m:virtualField[@name = 'ObjObjectNumberVrt']/m:value",
+                    namespaces=NSMAP,
+                )
+                if not objNumberL or objNumberL[0].text is None:
+                    continue
+                objNumber = self.rm_junk(objNumberL[0].text).strip()
+                for ident in chunk:
+                    if self._ident_matches(ident, objNumber, mode):
+                        if objId not in results[ident]:
+                            results[ident].append(objId)
+        return results
+
     # a simple lookup
     def fn_to_mulId(self, *, fn: str, orgUnit=None) -> set:
         """
@@ -472,6 +746,13 @@ class RIA:
         # print (f"----------{orgUnit}")
         if fn is None:
             raise SyntaxError("ERROR: fn can't be None")
+        if self.fn_index is not None:
+            mulIds = self.fn_index.lookup(fn=fn, orgUnit=orgUnit)
+            if mulIds is not None:
+                return mulIds
+        hit, mulIds = self._cache_get(kind="mulIds", key=fn, scope=str(orgUnit))
+        if hit:
+            return set(mulIds)
         q = Search(module="Multimedia")
         if orgUnit is not None:
             q.AND()
@@ -487,8 +768,41 @@ class RIA:
 
         for itemN in m.iter(module="Multimedia"):
             positiveIDs.add(itemN.get("id"))
+        self._cache_set(
+            kind="mulIds", key=fn, scope=str(orgUnit), value=sorted(positiveIDs)
+        )
         return positiveIDs
 
+    def iter_filenames(self, *, orgUnit: str | None = None, page_size: int = 1000):
+        """
+        Page thru all Multimedia records (of an orgUnit) and yield a tuple
+        (mulId, filename, orgUnit) for each. We only ask for the three fields we need,
+        so that a page remains small.
+        """
+        for mulId, fields in self._iter_pages(
+            mtype="Multimedia",
+            fields=["MulOriginalFileTxt"],
+            orgUnit=orgUnit,
+            page_size=page_size,
+        ):
+            if fields.get("MulOriginalFileTxt") is not None:
+                yield str(mulId), fields["MulOriginalFileTxt"], fields.get("__orgUnit")
+
+    def iter_identNrs(self, *, orgUnit: str | None = None, page_size: int = 1000):
+        """
+        Page thru all Object records (of an orgUnit) and yield a tuple
+        (objId, identNr, orgUnit) for each identNr (ObjObjectNumberVrt).
+        """
+        for objId, fields in self._iter_pages(
+            mtype="Object",
+            fields=["ObjObjectNumberVrt"],
+            orgUnit=orgUnit,
+            page_size=page_size,
+        ):
+            identNr = fields.get("ObjObjectNumberVrt")
+            if identNr is not None:
+                yield objId, self.rm_junk(identNr).strip(), fields.get("__orgUnit")
+
     def get_template(self, *, mtype: str, ID: int) -> Module:
         """
         Returns a Module object in upload form.
@@ -507,6 +821,99 @@ class RIA:
         #    m.toFile(path=f"DDtemplate-{mtype}{ID}.xml")
         return m
 
+    def invalidate_cache(self, *, kind: str, key: str | None = None) -> None:
+        """
+        Forget cached lookups, e.g. after we created a new record in RIA. Kinds are
+        objIds, mulIds, startswith and photographer. Without key, all entries of that
+        kind are forgotten. This includes the local indexes (see prefetch_filenames
+        and prefetch_identNrs).
+
+        For objIds and startswith, key is the identNr of the new record: we forget
+        every lookup that could find it now, i.e. the keys that are a (lax)
+        beginning of it.
+        """
+        if kind == "photographer":
+            if key is None:
+                self.photographer_cache.clear()
+            else:
+                self.photographer_cache.pop(key, None)
+        if kind in ("objIds", "startswith") and self.ident_index is not None:
+            # the index forgets single identNrs; prefix lookups that could include
+            # them go to RIA again
+            if key is not None:
+                self.ident_index.discard(key)
+            elif kind == "objIds":
+                self.ident_index = None
+        if kind == "mulIds" and self.fn_index is not None:
+            if key is None:
+                self.fn_index = None
+            else:
+                self.fn_index.discard(key)
+        if self.cache is not None:
+            if kind in ("objIds", "startswith") and key is not None:
+                self.cache.invalidate_prefixes(kind=kind, identNr=key)
+            else:
+                self.cache.invalidate(kind=kind, key=key)
+
+    def prefetch_filenames(
+        self,
+        *,
+        orgUnit: str | None = None,
+        path: str | Path | None = None,
+        max_age: int = 24 * 3600,
+    ) -> Filename_Index:
+        """
+        Load or build a local index of the filenames of all Multimedia records (of an
+        orgUnit). Afterwards fn_to_mulId answers lookups inside the orgUnit from that
+        index instead of sending one request per filename.
+
+        The index is saved to disk (path) and re-used for max_age seconds.
+        """
+        if path is None:
+            idx = Filename_Index(max_age=max_age, scope=orgUnit)
+        else:
+            idx = Filename_Index(path=path, max_age=max_age, scope=orgUnit)
+        if idx.load(scope=orgUnit):
+            print(f"* Using filename index '{idx.path}' ({len(idx)} filenames)")
+        else:
+            print(f"* Building filename index for orgUnit {orgUnit}...")
+            for mulId, fn, unit in self.iter_filenames(orgUnit=orgUnit):
+                idx.add(fn=fn, mulId=mulId, orgUnit=unit)
+            idx.save()
+            print(f"   {len(idx)} filenames indexed")
+        self.fn_index = idx
+        return idx
+
+    def prefetch_identNrs(
+        self,
+        *,
+        orgUnit: str | None = None,
+        path: str | Path | None = None,
+        max_age: int = 24 * 3600,
+    ) -> IdentNr_Index:
+        """
+        Load or build a local index of the identNrs of all objects (of an orgUnit).
+        Afterwards identNr lookups inside the orgUnit (identNr_exists*,
+        get_objIds_startswith, get_objIds_siblings, get_objIds_strict) are answered
+        from the index instead of RIA.
+
+        The index is saved to disk (path) and re-used for max_age seconds.
+        """
+        if path is None:
+            idx = IdentNr_Index(max_age=max_age, scope=orgUnit)
+        else:
+            idx = IdentNr_Index(path=path, max_age=max_age, scope=orgUnit)
+        if idx.load(scope=orgUnit):
+            print(f"* Using identNr index '{idx.path}' ({len(idx)} identNrs)")
+        else:
+            print(f"* Building identNr index for orgUnit {orgUnit}...")
+            for objId, identNr, unit in self.iter_identNrs(orgUnit=orgUnit):
+                idx.add(objId=objId, identNr=identNr, orgUnit=unit)
+            idx.save()
+            print(f"   {len(idx)} identNrs indexed")
+        self.ident_index = idx
+        return idx
+
     def rm_junk(self, text: str):
         """
         rm the <html> garbage from Zetcom's dreaded bug
@@ -546,34 +953,9 @@ class RIA:
                 @name='ObjMultimediaRef'
             ]"""
         )[0]
-        mRefItemN = objMultimediaRefN.xpath(
-            f"""m:moduleReferenceItem[
-                @moduleItemId = '{mulId}'
-            ]""",
-            namespaces=NSMAP,
-        )[0]
-        xml = """
-            <dataField dataType="Boolean" name="ThumbnailBoo">
-                <value>true</value>
-            </dataField>"""
-        frag = etree.XML(xml, parser=parser)
-        mRefItemN.append(frag)
-
-        mref_str = etree.tostring(
-            objMultimediaRefN, pretty_print=True, encoding="unicode"
+        xml = self._standardbild_xml(
+            objId=objId, objMultimediaRefN=objMultimediaRefN, mulId=mulId
         )
-        # print(mref_str)
-
-        xml = f"""
-            <application xmlns="http://www.zetcom.com/ria/ws/module">
-              <modules>
-                <module name="Object">
-                  <moduleItem id="{objId}">
-                    {mref_str}
-                  </moduleItem>
-                </module>
-              </modules>
-            </application>"""
 
         # is there already a Standardbild?
         resL = objMultimediaRefN.xpath(
@@ -666,10 +1048,232 @@ class RIA:
                 etree.tostring(objMultimediaRefN, pretty_print=True, encoding="unicode")
             )
 
-    def upload_attachment(self, *, file: str | Path, ID: int):
+    def mk_asset_standardbild_many(
+        self, *, pairs: Iterable[tuple[int, int]]
+    ) -> dict[tuple[int, int], Response | None]:
+        """
+        Batch version of mk_asset_standardbild2 for many (objId, mulId) pairs.
+
+        Instead of getting every object record in full, we ask for ObjMultimediaRef of
+        IDENT_CHUNK_SIZE objects at a time, decide locally which objects don't have a
+        Standardbild yet and only send the updateRepeatableGroup requests that are
+        needed; these run in parallel (see run_many).
+
+        Like mk_asset_standardbild2, we don't touch objects that already have a
+        Standardbild. If several pairs refer to the same object, only the first one
+        becomes Standardbild.
+
+        Returns a dict with a Response for every pair we sent an update for and None
+        for the others.
+        """
+        pairL = list(dict.fromkeys((int(objId), int(mulId)) for objId, mulId in pairs))
+        results: dict[tuple[int, int], Response | None] = {pair: None for pair in pairL}
+        refs = self._multimedia_refs(objIds={objId for objId, mulId in pairL})
+        todo = dict()  # objId -> mulId
+        for objId, mulId in pairL:
+            objMultimediaRefN = refs.get(objId)
+            if objMultimediaRefN is None:
+                print(f"WARNING: object {objId} not found or without assets")
+                continue
+            if objId in todo:
+                continue
+            if objMultimediaRefN.xpath(
+                "m:moduleReferenceItem/m:dataField[@name = 'ThumbnailBoo']",
+                namespaces=NSMAP,
+            ):
+                print(f"Standardbild already exists for object {objId}")
+                continue
+            if not objMultimediaRefN.xpath(
+                f"m:moduleReferenceItem[@moduleItemId = '{mulId}']", namespaces=NSMAP
+            ):
+                print(f"WARNING: object {objId} doesn't reference asset {mulId}")
+                continue
+            todo[objId] = mulId
+
+        jobs = [
+            {
+                "module": "Object",
+                "id": objId,
+                "referenceId": mulId,
+                "repeatableGroup": "ObjMultimediaRef",
+                "xml": self._standardbild_xml(
+                    objId=objId, objMultimediaRefN=refs[objId], mulId=mulId
+                ),
+            }
+            for objId, mulId in todo.items()
+        ]
+        responses = self.run_many(self.mpapi.updateRepeatableGroup, jobs)
+        for job, r in zip(jobs, responses):
+            results[(job["id"], job["referenceId"])] = r
+        return results
+
+    def paginate(
+        self,
+        *,
+        mtype: str,
+        query: Callable[[int, int], Search],
+        page_size: int = 1000,
+        prefetch: bool = True,
+    ) -> Iterator[tuple[int, dict]]:
+        """
+        Instead of asking RIA for all results at once (limit=-1), get them in pages of
+        page_size records and yield (ID, fields) for every record (see stream.py).
+
+        query is a function that makes the search, given limit and offset:
+
+            def query(limit: int, offset: int) -> Search:
+                q = Search(module="Object", limit=limit, offset=offset)
+                q.addCriterion(...)
+                return q
+
+            for objId, fields in c.paginate(mtype="Object", query=query):
+                ...
+
+        We don't page by offset, but by __id (keyset): every page is sorted by __id
+        and only has records with a higher __id than the last page (see _page_query),
+        so offset is always 0. Records that are created or deleted in the meantime
+        don't shift the pages and we don't miss or repeat any.
+
+        RIA may send fewer records than we asked for (if it caps limit below
+        page_size), so a short page isn't necessarily the last one. We're done when a
+        page has all the remaining records (totalSize).
+
+        With prefetch (default), the next page is requested in the background while
+        the caller is still working on the current one.
+        """
+        if page_size < 1:
+            raise ValueError(f"ERROR: page_size has to be positive: {page_size}")
+
+        def fetch(after: int | None) -> tuple[list[tuple[int, dict]], int]:
+            q = query(page_size, 0)
+            q.validate(mode="search")  # raises if not valid
+            info: dict = {}
+            page = list(
+                self.search_stream(
+                    query=self._page_query(q, after=after), mtype=mtype, info=info
+                )
+            )
+            total = info.get("totalSize")
+            if total is None:  # can't tell, so a full page means there may be more
+                total = len(page) + 1 if len(page) == page_size else len(page)
+            return page, total
+
+        pool = None
+        if prefetch:
+            pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ria-page")
+        try:
+            page, total = fetch(None)
+            while page and len(page) < total:
+                after = max(ID for ID, fields in page)
+                if pool is not None:
+                    next_page = pool.submit(fetch, after)
+                yield from page
+                if pool is not None:
+                    page, total = next_page.result()
+                else:
+                    page, total = fetch(after)
+                if page and min(ID for ID, fields in page) <= after:
+                    raise ValueError(f"ERROR: RIA ignored __id > {after} in paginate")
+            yield from page
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+
+    def run_many(
+        self, func: Callable, jobs: Iterable[dict], *, workers: int | None = None
+    ) -> list[Any]:
+        """
+        Run a lookup or update for many jobs in parallel, e.g.
+            jobs = [{"fn": "eins.jpg", "orgUnit": None}, {"fn": "zwei.jpg", ...}]
+            mulIds = c.run_many(c.fn_to_mulId, jobs)
+
+        Each job is a dict with the keyword arguments for func. At most self.workers
+        (or workers) jobs run at the same time. Results are returned as a list in the
+        same order as the jobs. If a job raises, the exception is raised here after
+        pending jobs have been cancelled.
+        """
+        jobL = list(jobs)
+        if workers is None:
+            workers = self.workers
+        if workers < 2 or len(jobL) < 2:
+            return [func(**job) for job in jobL]
+        if self.executor is None or self.executor_workers != workers:
+            if self.executor is not None:
+                self.executor.shutdown(wait=True)
+            self.executor = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="ria"
+            )
+            self.executor_workers = workers
+        futures = [self.executor.submit(func, **job) for job in jobL]
+        try:
+            return [future.result() for future in futures]
+        except BaseException:
+            # incl. KeyboardInterrupt; dont start what hasn't started yet
+            for future in futures:
+                future.cancel()
+            raise
+
+    def search_stream(
+        self, *, query: Search | bytes, mtype: str, info: dict | None = None
+    ) -> Iterator[tuple[int, dict]]:
+        """
+        Like mpapi's search2, but we don't make a Module from the response. Instead we
+        parse the response as it comes in and yield a tuple (ID, fields) for every
+        record of module mtype, so that memory use stays flat for large results.
+
+            for objId, fields in c.search_stream(query=q, mtype="Object"):
+                print(fields["ObjObjectNumberVrt"])
+
+        See stream.py for the content of fields and info. query can also be the
+        search as xml.
+        """
+        r = self._post_search(query=query, mtype=mtype)
+        try:
+            yield from iter_items(r.raw, mtype=mtype, info=info)
+        finally:
+            r.close()
+
+    def search_to_file(self, *, query: Search, mtype: str, path: str | Path) -> Path:
+        """
+        Save the response for a search to disk as it comes in, without parsing it.
+        Parse it later with stream.iter_items.
+        """
+        p = Path(path)
+        r = self._post_search(query=query, mtype=mtype)
+        try:
+            with open(p, "wb") as f:
+                for chunk in r.iter_content(chunk_size=1024 * 1024):
+                    f.write(chunk)
+        finally:
+            r.close()
+        return p
+
+    def throttle_uploads(self, *, maximum: int, rate: float | None = None) -> None:
+        """
+        Adapt the number of parallel uploads (upload_attachment) between 1 and
+        maximum to how RIA copes (see throttle.AIMD). If rate is given, uploads
+        together don't send more than rate bytes per second.
+        """
+        self.upload_slots = AIMD(maximum=maximum)
+        self.bandwidth = TokenBucket(rate=rate) if rate else None
+
+    def upload_attachment(
+        self,
+        *,
+        file: str | Path,
+        ID: int,
+        retries: int = UPLOAD_RETRIES,
+        backoff: float = 2,
+    ) -> Response:
         """
         Save attachment to asset/Multmedia record identified by id.
 
+        The file is streamed from disk in small chunks, so memory use doesn't depend
+        on the size of the file (big TIFFs!). If the transfer fails (connection
+        error, timeout, HTTP 5xx or 429), we wait and try again up to retries times;
+        the wait doubles every time, starting with backoff seconds. RIA can't resume
+        an interrupted upload, so each try sends the whole file again.
+
         * New: returns reponse object
         * We could debate how much error checking should happen where. Let's say there
           there should be none in the actual api. Then we could ask if it should happen
@@ -682,12 +1286,233 @@ class RIA:
         if p.is_dir():
             raise TypeError(f"ERROR: Path '{file}' is a dir")
 
-        return self.mpapi.updateAttachment(module="Multimedia", path=str(file), id=ID)
+        size = p.stat().st_size
+        for attempt in range(retries + 1):
+            start = time.perf_counter()
+            try:
+                if self.upload_slots is None:
+                    r = self._put_attachment(path=p, ID=ID, size=size)
+                else:
+                    with self.upload_slots.slot():
+                        r = self._put_attachment(path=p, ID=ID, size=size)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self._upload_done(start=start, size=size, error=True)
+                if attempt == retries:
+                    raise
+                print(f"   upload failed: {e}")
+            else:
+                failed = r.status_code >= 500 or r.status_code == 429
+                self._upload_done(start=start, size=size, error=failed)
+                if not failed or attempt == retries:
+                    seconds = max(time.perf_counter() - start, 0.001)
+                    print(
+                        f"   {size / 1e6:.1f} MB in {seconds:.1f}s "
+                        f"({size / 1e6 / seconds:.2f} MB/s)"
+                    )
+                    return r
+                print(f"   upload failed: HTTP {r.status_code}")
+            wait = min(backoff * 2**attempt, 300)
+            print(f"   retrying in {wait:.0f}s ({attempt + 1}/{retries})")
+            time.sleep(wait)
 
     #
     # more private
     #
 
+    def _cache_get(self, *, kind: str, key: str, scope: str = "") -> tuple:
+        """
+        Ask the persistent cache, if we have one. Returns (hit, value).
+        """
+        if self.cache is None:
+            return False, None
+        return self.cache.get(kind=kind, key=key, scope=scope)
+
+    def _cache_set(self, *, kind: str, key: str, value, scope: str = "") -> None:
+        if self.cache is not None:
+            self.cache.set(kind=kind, key=key, scope=scope, value=value)
+
+    def _ident_matches(self, ident: str, objNumber: str, mode: str) -> bool:
+        """
+        Decide locally if a objNumber (from ObjObjectNumberVrt) is a hit for the
+        identNr ident in the given mode (see identNrs_exist_many).
+        """
+        ident = str(ident)  # identNrs from Excel can be numbers
+        if mode == "exact":
+            return objNumber == ident.strip()
+        elif mode == "startswith":
+            return lax_form(objNumber).startswith(lax_form(ident))
+        else:
+            return lax_form(objNumber) == lax_form(ident)
+
+    def _iter_pages(
+        self,
+        *,
+        mtype: str,
+        fields: list[str],
+        orgUnit: str | None = None,
+        page_size: int = 1000,
+    ) -> Iterator[tuple[int, dict]]:
+        """
+        Page thru all records of a module (of an orgUnit) and yield (ID, fields).
+        Besides __id and __orgUnit we only ask for the fields listed, so that a page
+        remains small.
+        """
+
+        def query(limit: int, offset: int) -> Search:
+            q = Search(module=mtype, limit=limit, offset=offset)
+            if orgUnit is not None:
+                q.addCriterion(operator="equalsField", field="__orgUnit", value=orgUnit)
+            else:
+                # we need at least one criterion
+                q.addCriterion(operator="greater", field="__id", value="0")
+            q.addField(field="__id")
+            q.addField(field="__orgUnit")
+            for field in fields:
+                q.addField(field=field)
+            return q
+
+        return self.paginate(mtype=mtype, query=query, page_size=page_size)
+
+    def _multimedia_refs(self, *, objIds: Iterable[int]) -> dict[int, Any]:
+        """
+        Get ObjMultimediaRef for many objects with one projected search per
+        IDENT_CHUNK_SIZE objIds. Returns a dict {objId: moduleReference element}; objects
+        without assets are missing.
+        """
+        objIdL = sorted(set(objIds))
+        refs = dict()
+        for start in range(0, len(objIdL), IDENT_CHUNK_SIZE):
+            chunk = objIdL[start : start + IDENT_CHUNK_SIZE]
+            q = Search(module="Object", limit=-1, offset=0)
+            if len(chunk) > 1:
+                q.OR()
+            for objId in chunk:
+                q.addCriterion(operator="equalsField", field="__id", value=str(objId))
+            q.addField(field="ObjMultimediaRef")
+            q.validate(mode="search")
+            m = self.mpapi.search2(query=q)
+            for itemN in m.iter(module="Object"):
+                refL = itemN.xpath(
+                    "m:moduleReference[@name = 'ObjMultimediaRef']", namespaces=NSMAP
+                )
+                if refL:
+                    refs[int(itemN.get("id"))] = refL[0]
+        return refs
+
+    def _page_query(self, query: Search, *, after: int | None) -> bytes:
+        """
+        Turn a search into one page for paginate: sorted by __id and, if after is
+        given, only records with a higher __id. Offset is set to 0.
+        """
+        xml = query.toString()
+        if isinstance(xml, str):
+            xml = xml.encode("utf-8")
+        searchN = etree.fromstring(xml, parser).find(f".//{{{SNS}}}search")
+        searchN.set("offset", "0")
+        if after is not None:
+            expertN = searchN.find(f"{{{SNS}}}expert")
+            if expertN is None:
+                expertN = etree.SubElement(searchN, f"{{{SNS}}}expert")
+            criteriaL = list(expertN)
+            if len(criteriaL) == 1 and etree.QName(criteriaL[0]).localname == "and":
+                andN = criteriaL[0]
+            else:
+                andN = etree.SubElement(expertN, f"{{{SNS}}}and")
+                for criterionN in criteriaL:
+                    andN.append(criterionN)
+            etree.SubElement(
+                andN, f"{{{SNS}}}greater", fieldPath="__id", operand=str(after)
+            )
+        for sortN in searchN.findall(f"{{{SNS}}}sort"):
+            searchN.remove(sortN)
+        sortN = etree.Element(f"{{{SNS}}}sort")
+        etree.SubElement(
+            sortN, f"{{{SNS}}}field", fieldPath="__id", direction="Ascending"
+        )
+        # sort comes after select, before expert
+        selectN = searchN.find(f"{{{SNS}}}select")
+        if selectN is not None:
+            selectN.addnext(sortN)
+        else:
+            searchN.insert(0, sortN)
+        return etree.tostring(searchN.getroottree(), encoding="UTF-8")
+
+    def _post_search(self, *, query: Search | bytes, mtype: str) -> Response:
+        """
+        Send a search request with a streaming response. The response body is only
+        read when the caller iterates over it. query is a Search or its xml.
+        """
+        url = f"{self.mpapi.appURL}/module/{mtype}/search"
+        if isinstance(query, bytes):
+            data = query
+        else:
+            data = query.toString()
+        r = self.mpapi.session.post(url, data=data, stream=True)
+        r.raise_for_status()
+        r.raw.decode_content = True  # decompress gzip etc. on the fly
+        return r
+
+    def _put_attachment(self, *, path: Path, ID: int, size: int) -> Response:
+        """
+        Upload a file as attachment without reading it into memory. We send the same
+        xml as mpapi's updateAttachment, but requests reads it in chunks from an
+        AttachmentBody that encodes the file while it is sent.
+        """
+        url = f"{self.mpapi.appURL}/module/Multimedia/{ID}/attachment"
+        with open(path, "rb") as f:
+            body = AttachmentBody(f, ID=ID, name=path.name, size=size)
+            headers = {
+                "Content-Type": "application/xml",
+                "Content-Length": str(len(body)),
+            }
+            if self.bandwidth is None:
+                return self.mpapi.session.put(url, data=body, headers=headers)
+            throttled = ThrottledFile(body, bucket=self.bandwidth, size=len(body))
+            return self.mpapi.session.put(url, data=throttled, headers=headers)
+
+    def _upload_done(self, *, start: float, size: int, error: bool) -> None:
+        """
+        Tell the AIMD controller how long an upload took, in seconds per MB (at least
+        one MB, so that small files don't look slow).
+        """
+        if self.upload_slots is not None:
+            seconds = time.perf_counter() - start
+            self.upload_slots.record(seconds=seconds / max(size / 1e6, 1), error=error)
+
+    def _standardbild_xml(self, *, objId: int, objMultimediaRefN, mulId: int) -> str:
+        """
+        Mark the reference to mulId as Standardbild (ThumbnailBoo) in
+        objMultimediaRefN (changed in place) and return the xml for
+        updateRepeatableGroup. RIA wants all items of the reference, not only the
+        changed one.
+        """
+        mRefItemN = objMultimediaRefN.xpath(
+            f"""m:moduleReferenceItem[
+                @moduleItemId = '{mulId}'
+            ]""",
+            namespaces=NSMAP,
+        )[0]
+        xml = """
+            <dataField dataType="Boolean" name="ThumbnailBoo">
+                <value>true</value>
+            </dataField>"""
+        frag = etree.XML(xml, parser=parser)
+        mRefItemN.append(frag)
+
+        mref_str = etree.tostring(
+            objMultimediaRefN, pretty_print=True, encoding="unicode"
+        )
+        return f"""
+            <application xmlns="http://www.zetcom.com/ria/ws/module">
+              <modules>
+                <module name="Object">
+                  <moduleItem id="{objId}">
+                    {mref_str}
+                  </moduleItem>
+                </module>
+              </modules>
+            </application>"""
+
     def _get_photographerID(self, *, name) -> Optional[list[int]]:
         """
         Returns a list of IDs as str or None if photographer was not found.
@@ -833,5 +1658,28 @@ def record_exists3(*, ident: str, conf: dict) -> int:
         return 0
 
 
+def records_exist3(*, idents: Iterable[str], conf: dict) -> dict[str, int]:
+    """
+    Batch version of record_exists3: for many identNrs, return a dictionary with the
+    number of matching records (exact search) per identNr, e.g. {"III C 123": 1}.
+
+    Like record_exists3, we look in conf["org_unit"] and in EMAmArchaologie if
+    conf has an org_unit.
+    """
+    if "org_unit" in conf:
+        orgUnits = [conf["org_unit"], "EMAmArchaologie"]
+    else:
+        orgUnits = [None]
+    idents = list(idents)  # we go thru them once per orgUnit
+    objIds: dict[str, set[int]] = {}
+    for orgUnit in orgUnits:
+        results = conf["RIA"].identNrs_exist_many(
+            idents=idents, orgUnit=orgUnit, mode="exact"
+        )
+        for ident, objIdL in results.items():
+            objIds.setdefault(ident, set()).update(objIdL)
+    return {ident: len(objIds[ident]) for ident in objIds}
+
+
 if __name__ == "__main__":
     pass
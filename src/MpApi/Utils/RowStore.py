@@ -0,0 +1,312 @@
+"""
+SQLite backend for the data rows of an Xls sheet
+
+For runs with 100k+ files, openpyxl is the bottleneck: every save rewrites the whole
+workbook and every cell access goes thru openpyxl's cell objects. A RowStore keeps
+the data rows (row 3 and following) of one sheet in a SQLite table instead, with one
+column per label of the app's description (desc()). The Excel file remains the view
+for humans: it is exported from the store on demand and at the end of a run and
+imported again if somebody has edited it in the meantime.
+
+    store = RowStore(path=Path("upload15.sqlite"), description=desc, title="Assets")
+    store.import_sheet(ws)           # Excel -> SQLite
+    for cells, rno in store.loop():  # cells["attached"].value, like Xls.loop
+        cells["attached"].value = "x"
+    store.commit()                   # instead of saving the workbook
+    store.export_sheet(ws)           # SQLite -> Excel; save the workbook afterwards
+
+Usually it's not used directly, but thru Xls.use_store.
+
+Besides the values, the font colour of a cell is kept (in a table of its own), since
+the apps mark problems in red etc. Other formatting is not stored.
+"""
+
+from openpyxl.styles import Font
+from openpyxl.utils import column_index_from_string
+from openpyxl.worksheet.worksheet import Worksheet
+from pathlib import Path
+import sqlite3
+import threading
+from typing import Any, Iterator
+
+
+class StoreCell:
+    """
+    Stands in for an openpyxl cell: reading and writing value goes to the store.
+    Of the font only the colour is saved; font is None if the cell has none.
+    """
+
+    __slots__ = ("store", "rno", "label", "_value", "_font")
+
+    def __init__(
+        self,
+        store: "RowStore",
+        rno: int,
+        label: str,
+        value: Any,
+        font: Font | None = None,
+    ) -> None:
+        self.store = store
+        self.rno = rno
+        self.label = label
+        self._value = value
+        self._font = font
+
+    @property
+    def font(self) -> Font | None:
+        return self._font
+
+    @font.setter
+    def font(self, font: Font | None) -> None:
+        self._font = font
+        self.store.set_font(rno=self.rno, label=self.label, font=font)
+
+    @property
+    def value(self) -> Any:
+        return self._value
+
+    @value.setter
+    def value(self, value: Any) -> None:
+        self._value = value
+        self.store.set(rno=self.rno, label=self.label, value=value)
+
+
+class RowStore:
+    def __init__(
+        self, *, path: str | Path, description: dict, title: str = "Assets"
+    ) -> None:
+        self.path = Path(path)
+        self.description = description
+        self.title = title
+        self.labels = list(description)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        self.db.execute("CREATE TABLE IF NOT EXISTS rows (rno INTEGER PRIMARY KEY)")
+        self.db.execute(
+            """CREATE TABLE IF NOT EXISTS fonts (
+                rno INTEGER, label TEXT, color TEXT, PRIMARY KEY (rno, label)
+            )"""
+        )
+        known = {row[1] for row in self.db.execute("PRAGMA table_info(rows)")}
+        for label in self.labels:
+            if label not in known:  # description has grown
+                self.db.execute(f'ALTER TABLE rows ADD COLUMN "{label}"')
+        self.db.commit()
+
+    def cells(self, rno: int) -> dict[str, StoreCell]:
+        """
+        Returns the cells of row rno as dict {label: StoreCell}, like Xls._rno2dict.
+        The row is only created when a value is written.
+        """
+        with self.lock:
+            row = self.db.execute(
+                f"SELECT {self._columns()} FROM rows WHERE rno = ?", (rno,)
+            ).fetchone()
+            colors = self.db.execute(
+                "SELECT rno, label, color FROM fonts WHERE rno = ?", (rno,)
+            ).fetchall()
+        if row is None:
+            row = (None,) * len(self.labels)
+        return self._cells(rno, row, self._fonts(colors))
+
+    def close(self) -> None:
+        with self.lock:
+            self.db.commit()
+            self.db.close()
+
+    def commit(self) -> None:
+        with self.lock:
+            self.db.commit()
+
+    def delete(self, rno: int) -> None:
+        """
+        Delete row rno; the rows below move up by one, like in Excel.
+        """
+        with self.lock:
+            for table in ("rows", "fonts"):
+                self.db.execute(f"DELETE FROM {table} WHERE rno = ?", (rno,))
+                # in two steps to avoid clashes with the primary key on the way
+                self.db.execute(
+                    f"UPDATE {table} SET rno = -(rno - 1) WHERE rno > ?", (rno,)
+                )
+                self.db.execute(f"UPDATE {table} SET rno = -rno WHERE rno < 0")
+
+    def export_sheet(self, sheet: Worksheet) -> None:
+        """
+        Write the rows from the store into the sheet, replacing all data rows there.
+        The header rows remain. Cells get their font colour back.
+        """
+        if sheet.max_row > 2:
+            sheet.delete_rows(3, amount=sheet.max_row - 2)
+        cols = [
+            column_index_from_string(self.description[label]["col"])
+            for label in self.labels
+        ]
+        with self.lock:
+            rows = self.db.execute(
+                f"SELECT rno, {self._columns()} FROM rows ORDER BY rno"
+            ).fetchall()
+            colors = self.db.execute("SELECT rno, label, color FROM fonts").fetchall()
+        for rno, *values in rows:
+            for col, value in zip(cols, values):
+                if value is not None:
+                    sheet.cell(row=rno, column=col, value=value)
+        cols_by_label = dict(zip(self.labels, cols))
+        for (rno, label), font in self._fonts(colors).items():
+            if label in cols_by_label:
+                sheet.cell(row=rno, column=cols_by_label[label]).font = font
+
+    def find(self, *, label: str, value: str) -> int | None:
+        """
+        Returns the first row number where label has value or None.
+        """
+        with self.lock:
+            self.db.execute(
+                f'CREATE INDEX IF NOT EXISTS "idx_{label}" ON rows ("{label}")'
+            )
+            row = self.db.execute(
+                f'SELECT min(rno) FROM rows WHERE "{label}" = ?', (value,)
+            ).fetchone()
+        return row[0]
+
+    def get_meta(self, *, key: str) -> str | None:
+        with self.lock:
+            row = self.db.execute(
+                "SELECT value FROM meta WHERE key = ?", (key,)
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def import_sheet(self, sheet: Worksheet) -> int:
+        """
+        Replace the rows in the store with the data rows of the sheet (values and
+        font colours). Returns the number of rows.
+        """
+        idxs = [
+            column_index_from_string(self.description[label]["col"]) - 1
+            for label in self.labels
+        ]
+        rows = []
+        colors = []
+        for rno, row in enumerate(sheet.iter_rows(min_row=3), start=3):
+            cells = [row[idx] if idx < len(row) else None for idx in idxs]
+            values = [None if cell is None else cell.value for cell in cells]
+            if any(value is not None for value in values):
+                rows.append((rno, *values))
+            for label, cell in zip(self.labels, cells):
+                color = None if cell is None else self._color(cell.font)
+                if color is not None:
+                    colors.append((rno, label, color))
+        placeholders = ", ".join("?" * (len(self.labels) + 1))
+        with self.lock:
+            self.db.execute("DELETE FROM rows")
+            self.db.execute("DELETE FROM fonts")
+            self.db.executemany(
+                f"INSERT INTO rows (rno, {self._columns()}) VALUES ({placeholders})",
+                rows,
+            )
+            self.db.executemany(
+                "INSERT INTO fonts (rno, label, color) VALUES (?, ?, ?)", colors
+            )
+            self.db.commit()
+        return len(rows)
+
+    def loop(self, *, offset: int = 3, limit: int = -1) -> Iterator:
+        """
+        Like Xls.loop: yields (cells, rno) for every row from offset on.
+        """
+        with self.lock:
+            rows = self.db.execute(
+                f"SELECT rno, {self._columns()} FROM rows WHERE rno >= ? ORDER BY rno",
+                (offset,),
+            ).fetchall()
+            colors = self.db.execute(
+                "SELECT rno, label, color FROM fonts WHERE rno >= ?", (offset,)
+            ).fetchall()
+        fonts = self._fonts(colors)
+        for rno, *values in rows:
+            yield self._cells(rno, values, fonts), rno
+            if limit == rno:
+                print("* Limit reached")
+                break
+
+    def max_row(self) -> int:
+        with self.lock:
+            row = self.db.execute("SELECT max(rno) FROM rows").fetchone()
+        return 2 if row[0] is None else row[0]
+
+    def set(self, *, rno: int, label: str, value: Any) -> None:
+        """
+        Write one value; becomes permanent with the next commit.
+        """
+        with self.lock:
+            self.db.execute("INSERT OR IGNORE INTO rows (rno) VALUES (?)", (rno,))
+            self.db.execute(
+                f'UPDATE rows SET "{label}" = ? WHERE rno = ?', (value, rno)
+            )
+
+    def set_font(self, *, rno: int, label: str, font: Font | None) -> None:
+        """
+        Keep the colour of font (or forget it if there is none); becomes permanent
+        with the next commit.
+        """
+        color = self._color(font)
+        with self.lock:
+            if color is None:
+                self.db.execute(
+                    "DELETE FROM fonts WHERE rno = ? AND label = ?", (rno, label)
+                )
+            else:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO fonts (rno, label, color) VALUES (?, ?, ?)",
+                    (rno, label, color),
+                )
+
+    def set_meta(self, *, key: str, value: str) -> None:
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value)
+            )
+            self.db.commit()
+
+    def wipe(self) -> None:
+        with self.lock:
+            self.db.execute("DELETE FROM rows")
+            self.db.execute("DELETE FROM fonts")
+            self.db.commit()
+
+    #
+    # private
+    #
+
+    def _cells(
+        self, rno: int, values, fonts: dict[tuple[int, str], Font]
+    ) -> dict[str, StoreCell]:
+        return {
+            label: StoreCell(self, rno, label, value, fonts.get((rno, label)))
+            for label, value in zip(self.labels, values)
+        }
+
+    def _color(self, font: Font | None) -> str | None:
+        """
+        Returns the rgb colour of font or None, also for theme colours.
+        """
+        if font is None or font.color is None or font.color.type != "rgb":
+            return None
+        return font.color.rgb
+
+    def _fonts(self, colors: list[tuple]) -> dict[tuple[int, str], Font]:
+        """
+        Makes {(rno, label): Font} from rows (rno, label, color) of table fonts.
+        """
+        fonts: dict[str, Font] = {}
+        return {
+            (rno, label): fonts.setdefault(color, Font(color=color))
+            for rno, label, color in colors
+        }
+
+    def _columns(self) -> str:
+        return ", ".join(f'"{label}"' for label in self.labels)
@@ -0,0 +1,139 @@
+"""
+Snapshot of the files found by the last scandir, for incremental rescans
+
+A rescan with scandir used to look at every file again, although usually only a
+handful have changed. A Snapshot remembers (path, size, mtime, inode) for every file
+that has been scanned below a root directory, so that the next run can tell which
+files are new, which have changed and which are gone, and handle only those:
+
+    snap = Snapshot(path=Path(".upload15.snapshot.sqlite"), filemask="*")
+    changes = snap.diff(walk(filemask="*"))
+    for f in changes.added + changes.changed:
+        ...
+        snap.record(f)
+    for path in changes.removed:
+        ...
+        snap.forget(path)
+    snap.commit()  # after the Excel file has been saved
+
+Records become permanent only with commit. If we die before, the next run simply
+sees the files again.
+
+The snapshot is a SQLite database and can hold several roots; it belongs to the
+filemask it was made with. If the filemask changes, the snapshot of that root is
+discarded. Delete the file to force a full rescan.
+
+The inode is not available on Windows (see FileEntry.inode); there we compare only
+size and mtime.
+"""
+
+from dataclasses import dataclass, field
+from MpApi.Utils.walker import FileEntry
+from pathlib import Path
+import sqlite3
+from typing import Iterable
+
+
+@dataclass
+class Changes:
+    added: list[FileEntry] = field(default_factory=list)
+    changed: list[FileEntry] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)  # paths as recorded
+    unchanged: list[FileEntry] = field(default_factory=list)
+
+
+class Snapshot:
+    def __init__(
+        self, *, path: str | Path, root: str | Path = Path(), filemask: str = "*"
+    ) -> None:
+        self.path = Path(path)
+        self.root = str(Path(root).absolute())
+        self.db = sqlite3.connect(self.path)
+        self.db.execute(
+            """CREATE TABLE IF NOT EXISTS files (
+                root TEXT, path TEXT, size INTEGER, mtime_ns INTEGER, inode INTEGER,
+                PRIMARY KEY (root, path)
+            )"""
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS roots (root TEXT PRIMARY KEY, filemask TEXT)"
+        )
+        row = self.db.execute(
+            "SELECT filemask FROM roots WHERE root = ?", (self.root,)
+        ).fetchone()
+        if row is not None and row[0] != filemask:
+            print(f"   filemask changed ({row[0]} -> {filemask}); full rescan")
+            self.clear()
+        self.db.execute(
+            "INSERT OR REPLACE INTO roots (root, filemask) VALUES (?, ?)",
+            (self.root, filemask),
+        )
+        self.db.commit()
+
+    def __len__(self) -> int:
+        row = self.db.execute(
+            "SELECT count(*) FROM files WHERE root = ?", (self.root,)
+        ).fetchone()
+        return row[0]
+
+    def clear(self) -> None:
+        """
+        Forget all files of this root, e.g. after the Excel sheet has been wiped.
+        """
+        self.db.execute("DELETE FROM files WHERE root = ?", (self.root,))
+        self.db.commit()
+
+    def close(self) -> None:
+        self.db.close()
+
+    def commit(self) -> None:
+        self.db.commit()
+
+    def diff(self, entries: Iterable[FileEntry]) -> Changes:
+        """
+        Compare the files found now (e.g. by walk) with the snapshot. A file has
+        changed if its size, mtime or inode differ. Files in the snapshot that
+        were not found are removed.
+        """
+        known = {
+            path: (size, mtime_ns, inode)
+            for path, size, mtime_ns, inode in self.db.execute(
+                "SELECT path, size, mtime_ns, inode FROM files WHERE root = ?",
+                (self.root,),
+            )
+        }
+        changes = Changes()
+        for f in entries:
+            before = known.pop(str(f.path), None)
+            if before is None:
+                changes.added.append(f)
+            elif self._changed(f, before):
+                changes.changed.append(f)
+            else:
+                changes.unchanged.append(f)
+        changes.removed = sorted(known)
+        return changes
+
+    def forget(self, path: str | Path) -> None:
+        self.db.execute(
+            "DELETE FROM files WHERE root = ? AND path = ?", (self.root, str(path))
+        )
+
+    def record(self, f: FileEntry) -> None:
+        """
+        Remember f as scanned; permanent with the next commit.
+        """
+        self.db.execute(
+            "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+            (self.root, str(f.path), f.size, f.mtime_ns, f.inode),
+        )
+
+    #
+    # private
+    #
+
+    def _changed(self, f: FileEntry, before: tuple[int, int, int]) -> bool:
+        size, mtime_ns, inode = before
+        if f.size != size or f.mtime_ns != mtime_ns:
+            return True
+        return bool(inode and f.inode and inode != f.inode)
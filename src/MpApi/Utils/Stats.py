@@ -0,0 +1,259 @@
+"""
+Instrumentation for the requests we send to RIA
+
+Where does an 'upload up' run spend its hours? RequestStats counts, per client method
+(search2, createItem3, updateAttachment, ...), the number of calls, errors, the bytes
+sent and received and the time each call took.
+
+    stats = RequestStats()
+    stats.instrument(client.mpapi, ["search2", "getItem2"])  # wraps the methods
+    stats.hook(client.mpapi.session)  # counts bytes of every response
+    ...
+    stats.write(path=Path("upload.xlsx"))  # upload.stats.json and upload.prom
+
+Bytes are attributed to the method that is running in the same thread when the
+response comes in. For streamed responses we only know the size if the server sends
+a Content-Length header.
+
+During long runs, a throughput line is printed every report_interval seconds.
+
+The summary is written as JSON and in Prometheus' text format, so that it can be
+picked up by node_exporter's textfile collector.
+"""
+
+import json
+import math
+from pathlib import Path
+import threading
+import time
+from typing import Any, Callable, Iterable
+
+# upper bounds of the latency histogram buckets in seconds
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+class RequestStats:
+    def __init__(self, *, report_interval: int = 300) -> None:
+        """
+        report_interval: seconds between throughput lines; 0 switches them off
+        """
+        self.report_interval = report_interval
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.started = time.time()
+        self.last_report = self.started
+        self.methods: dict[str, dict] = {}
+
+    def hook(self, session) -> None:
+        """
+        Register a response hook on a requests session to count bytes.
+        """
+        session.hooks["response"].append(self._on_response)
+
+    def instrument(self, obj: Any, names: Iterable[str]) -> None:
+        """
+        Replace the methods listed in names on obj (an instance) with wrappers that
+        record calls, errors and latency.
+        """
+        for name in names:
+            method = getattr(obj, name, None)
+            if method is None:
+                continue
+            setattr(obj, name, self.wrap(name, method))
+
+    def record(
+        self,
+        name: str,
+        *,
+        seconds: float = 0,
+        sent: int = 0,
+        received: int = 0,
+        error: bool = False,
+        call: bool = True,
+    ) -> None:
+        with self.lock:
+            entry = self._entry(name)
+            if call:
+                entry["calls"] += 1
+                entry["latency"].append(seconds)
+            if error:
+                entry["errors"] += 1
+            entry["bytes_sent"] += sent
+            entry["bytes_received"] += received
+
+    def report_if_due(self) -> None:
+        """
+        Print a throughput line if report_interval seconds have passed since the last
+        one.
+        """
+        if not self.report_interval:
+            return
+        now = time.time()
+        with self.lock:
+            if now - self.last_report < self.report_interval:
+                return
+            self.last_report = now
+        print(self.throughput())
+
+    def summary(self) -> dict:
+        """
+        Returns a dict with one entry per method:
+            {"search2": {"calls": 12, "errors": 0, "bytes_sent": 1234,
+            "bytes_received": 56789, "seconds": 3.2, "p50": 0.21, "p90": 0.4,
+            "p99": 0.9, "max": 1.1}, ...}
+        """
+        summary = {}
+        with self.lock:
+            for name, entry in sorted(self.methods.items()):
+                latency = sorted(entry["latency"])
+                summary[name] = {
+                    "calls": entry["calls"],
+                    "errors": entry["errors"],
+                    "bytes_sent": entry["bytes_sent"],
+                    "bytes_received": entry["bytes_received"],
+                    "seconds": round(sum(latency), 3),
+                    "p50": _percentile(latency, 50),
+                    "p90": _percentile(latency, 90),
+                    "p99": _percentile(latency, 99),
+                    "max": round(latency[-1], 3) if latency else 0,
+                }
+        return summary
+
+    def throughput(self) -> str:
+        elapsed = max(time.time() - self.started, 0.001)
+        with self.lock:
+            calls = sum(entry["calls"] for entry in self.methods.values())
+            errors = sum(entry["errors"] for entry in self.methods.values())
+            sent = sum(entry["bytes_sent"] for entry in self.methods.values())
+            received = sum(entry["bytes_received"] for entry in self.methods.values())
+        return (
+            f"[stats] {calls} requests ({errors} errors) in {elapsed:.0f}s: "
+            f"{calls / elapsed:.2f} req/s, sent {sent / 1e6:.1f} MB "
+            f"({sent / 1e6 / elapsed:.2f} MB/s), received {received / 1e6:.1f} MB"
+        )
+
+    def to_prometheus(self, *, prefix: str = "mpapi") -> str:
+        """
+        Summary in Prometheus' text exposition format.
+        """
+        lines = []
+        with self.lock:
+            methods = {
+                name: entry | {"latency": list(entry["latency"])}
+                for name, entry in self.methods.items()
+            }
+        for metric, key, kind in (
+            ("requests_total", "calls", "counter"),
+            ("errors_total", "errors", "counter"),
+            ("sent_bytes_total", "bytes_sent", "counter"),
+            ("received_bytes_total", "bytes_received", "counter"),
+        ):
+            lines.append(f"# TYPE {prefix}_{metric} {kind}")
+            for name, entry in sorted(methods.items()):
+                lines.append(f'{prefix}_{metric}{{method="{name}"}} {entry[key]}')
+        lines.append(f"# TYPE {prefix}_request_duration_seconds histogram")
+        for name, entry in sorted(methods.items()):
+            latency = entry["latency"]
+            for bound in BUCKETS:
+                count = sum(1 for seconds in latency if seconds <= bound)
+                lines.append(
+                    f"{prefix}_request_duration_seconds_bucket"
+                    f'{{method="{name}",le="{bound}"}} {count}'
+                )
+            lines.append(
+                f"{prefix}_request_duration_seconds_bucket"
+                f'{{method="{name}",le="+Inf"}} {len(latency)}'
+            )
+            lines.append(
+                f'{prefix}_request_duration_seconds_sum{{method="{name}"}} '
+                f"{sum(latency):.3f}"
+            )
+            lines.append(
+                f'{prefix}_request_duration_seconds_count{{method="{name}"}} '
+                f"{len(latency)}"
+            )
+        return "\n".join(lines) + "\n"
+
+    def wrap(self, name: str, method: Callable) -> Callable:
+        def wrapper(*args, **kwargs):
+            outer = getattr(self.local, "method", None)
+            self.local.method = name
+            start = time.perf_counter()
+            error = False
+            try:
+                return method(*args, **kwargs)
+            except Exception:
+                error = True
+                raise
+            finally:
+                self.local.method = outer
+                self.record(name, seconds=time.perf_counter() - start, error=error)
+                self.report_if_due()
+
+        wrapper.__wrapped__ = method  # type: ignore
+        return wrapper
+
+    def write(self, *, path: str | Path) -> tuple[Path, Path]:
+        """
+        Write the summary next to path (usually the Excel file) as path.stats.json
+        and path.prom. Returns both paths.
+        """
+        p = Path(path)
+        json_fn = p.with_suffix(".stats.json")
+        prom_fn = p.with_suffix(".prom")
+        data = {
+            "started": self.started,
+            "elapsed": round(time.time() - self.started, 3),
+            "methods": self.summary(),
+        }
+        with open(json_fn, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        with open(prom_fn, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        print(self.throughput())
+        print(f"* Request stats written to '{json_fn}'")
+        return json_fn, prom_fn
+
+    #
+    # private
+    #
+
+    def _entry(self, name: str) -> dict:
+        if name not in self.methods:
+            self.methods[name] = {
+                "calls": 0,
+                "errors": 0,
+                "bytes_sent": 0,
+                "bytes_received": 0,
+                "latency": [],
+            }
+        return self.methods[name]
+
+    def _on_response(self, r, *args, **kwargs):
+        """
+        Response hook for requests. Doesn't change the response.
+        """
+        name = getattr(self.local, "method", None) or "other"
+        body = r.request.body
+        if body is None or not hasattr(body, "__len__"):
+            # e.g. a file object; we dont know the size without reading it
+            sent = int(r.request.headers.get("Content-Length", 0))
+        else:
+            sent = len(body)
+        if kwargs.get("stream"):
+            # reading the content here would defeat streaming
+            received = int(r.headers.get("Content-Length", 0))
+        else:
+            received = len(r.content)
+        self.record(name, sent=sent, received=received, call=False)
+        return r
+
+
+def _percentile(values: list[float], percent: int) -> float:
+    """
+    Nearest-rank percentile of a sorted list.
+    """
+    if not values:
+        return 0
+    rank = max(math.ceil(percent / 100 * len(values)), 1)
+    return round(values[rank - 1], 3)
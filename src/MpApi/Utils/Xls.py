@@ -7,21 +7,58 @@ USAGE
     xls.save()
     xls.backup()
     wb = xls.get_or_create_wb()
+
+Saving is atomic: the workbook is written to a temp file that replaces the Excel file
+only when it's complete, so a crash or Ctrl-C during save doesn't leave a broken
+file. Backups rotate (.bak, .bak.1, ...) and are made only if the file has changed
+since the last backup. For long loops, save_due tells when the next save is due, so
+that saving takes a bounded share of the run time even as the sheet grows:
+    if xls.save_due():
+        xls.backup()
+        xls.save()
+
+For big runs, the data rows of one sheet can be kept in SQLite instead (see
+RowStore.py). Then loop, path_exists and save work on the database and the Excel
+file is only written on export:
+    xls.use_store(sheet=ws)
+    for cells, rno in xls.loop(sheet=ws):
+        ...
+    xls.save()    # commits
+    xls.export()  # writes Excel file
+
+For big reports that are only written once, there is a streaming mode that keeps
+memory constant (openpyxl's write_only workbooks). Rows can only be appended and the
+file can only be saved once:
+    xls = Xls(path="report.xlsx", description=desc, write_only=True)
+    ws = xls.get_or_create_sheet(title="Report")
+    xls.write_header(sheet=ws)
+    for p in ...:
+        xls.append(sheet=ws, values={"filename": p.name, "size": size})
+    xls.save()
 """
 
+from collections.abc import Mapping
 from openpyxl import Workbook, load_workbook  # worksheet
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font
+from openpyxl.utils import column_index_from_string, get_column_letter
 from openpyxl.worksheet.worksheet import Worksheet
+from MpApi.Utils.RowStore import RowStore
+import os
 from pathlib import Path
 import shutil
 import sys
+import time
 from tqdm import tqdm
-from typing import Any, Iterator
+from typing import Any, Iterable, Iterator
 
 red = Font(color="FF0000")
 teal = Font(color="008080")
 blue = Font(color="0000FF")
 
+BACKUPS = 3  # number of backup files kept (.bak, .bak.1, .bak.2)
+SAVE_OVERHEAD = 0.05  # share of the run time we are willing to spend saving
+
 
 class ConfigError(Exception):
     pass
@@ -31,26 +68,144 @@ class NoContentError(Exception):
     pass
 
 
+class ColumnIndex:
+    """
+    The values of one column of a sheet and the rows they are in, for lookups by
+    value (see Xls.path_exists). Rows that have been written since they were
+    indexed are dirty; they are read again before the next lookup.
+    """
+
+    __slots__ = ("rows", "values", "dirty")
+
+    def __init__(self) -> None:
+        self.rows: dict[str, set[int]] = {}  # value -> row numbers
+        self.values: dict[int, str] = {}  # row number -> value
+        self.dirty: set[int] = set()
+
+    def get(self, value: str) -> int | None:
+        """
+        Returns the first row with value or None.
+        """
+        rows = self.rows.get(value)
+        return min(rows) if rows else None
+
+    def set(self, rno: int, value: Any) -> None:
+        """
+        Update the index for row rno, which has value now; only strings are indexed.
+        """
+        old = self.values.pop(rno, None)
+        if old is not None:
+            self.rows[old].discard(rno)
+            if not self.rows[old]:
+                del self.rows[old]
+        if isinstance(value, str):
+            self.values[rno] = value
+            self.rows.setdefault(value, set()).add(rno)
+
+
+class RowView(Mapping):
+    """
+    The cells of one row by label, i.e. cells["filename"].value, like the dict from
+    Xls._rno2dict, but without looking up every cell by its coordinate. Made by
+    Xls.loop from the tuple of cells that iter_rows returns.
+    """
+
+    __slots__ = ("row", "colmap", "rno", "sheet")
+
+    def __init__(
+        self, row: tuple, colmap: dict[str, int], rno: int, sheet: Worksheet
+    ) -> None:
+        self.row = row
+        self.colmap = colmap  # label -> column index (0-based)
+        self.rno = rno
+        self.sheet = sheet
+
+    def __getitem__(self, label: str):
+        idx = self.colmap[label]
+        if idx < len(self.row):
+            return self.row[idx]
+        # column is right of everything that has been written so far
+        return self.sheet.cell(row=self.rno, column=idx + 1)
+
+    def __iter__(self):
+        return iter(self.colmap)
+
+    def __len__(self) -> int:
+        return len(self.colmap)
+
+
 class Xls:
-    def __init__(self, path: str | Path, description: dict[str, str]) -> None:
+    def __init__(
+        self, path: str | Path, description: dict[str, str], write_only: bool = False
+    ) -> None:
         """
         currently there can be only one description.
+
+        write_only: start a new streaming workbook (see append); an existing file at
+        path is not loaded, but overwritten on save.
         """
         self.path = Path(path)
         self.backup_fn = Path(str(self.path) + ".bak")  # ugly
+        self.backup_stat: tuple[int, int] | None = None  # see backup
+        self.last_save = time.monotonic()
+        self.save_seconds = 0.0  # duration of the last save
+        self.write_only = write_only
+        self.closed = False  # write_only workbook has been saved
+        if write_only:
+            self.wb = Workbook(write_only=True)
         self.wb = self.get_or_create_wb()
         self.shutdown_requested = False
         self.changed = False  # keep a state to know if saving is necessary
         self.description = description
+        # (sheet title, cno) -> ColumnIndex; see path_exists
+        self.indexes: dict[tuple[str, int], ColumnIndex] = {}
+        self.store: RowStore | None = None  # see use_store
+        self._colmap: dict[str, int] | None = None  # see colmap
+
+    def append(self, *, sheet: Worksheet, values: dict[str, Any]) -> None:
+        """
+        Append one row to sheet. Expects {label: value}, labels as in the description;
+        missing labels remain empty. Works in the normal and in the write_only mode;
+        in the latter the row is flushed to a temp file right away.
+        """
+        colmap = self.colmap()
+        row: list[Any] = [None] * (max(colmap[label] for label in values) + 1)
+        for label, value in values.items():
+            row[colmap[label]] = value
+        sheet.append(row)
+        if not self.write_only and self._indexed(sheet):
+            self.row_changed(sheet=sheet, rno=sheet.max_row)
+        self.changed = True
 
     def backup(self) -> bool:
         """
-        Write a new backup file of the Excel file.
+        Write a new backup file of the Excel file, unless the file has not changed
+        since the last backup. Older backups are renamed to .bak.1, .bak.2 etc.; only
+        BACKUPS files are kept. Returns True if a backup was made.
+
+        Since save replaces the Excel file instead of writing into it, the backup can
+        be a hard link to the current file, which costs nothing. If the file system
+        doesn't support hard links, we copy.
         """
+        if not self.path.exists():
+            return False
+        st = self.path.stat()
+        stat = (st.st_size, st.st_mtime_ns)
+        if stat == self.backup_stat:
+            return False
         try:
-            shutil.copy(self.path, self.backup_fn)
+            for n in range(BACKUPS - 1, 0, -1):
+                older = self._backup_path(n - 1)
+                if older.exists():
+                    os.replace(older, self._backup_path(n))
+            try:
+                os.link(self.path, self.backup_fn)
+            except OSError:
+                shutil.copy2(self.path, self.backup_fn)
         except KeyboardInterrupt:
             self.request_shutdown()
+            return False
+        self.backup_stat = stat
         return True
 
     def backup_if_change(self) -> bool:
@@ -63,6 +218,41 @@ class Xls:
         """
         self.changed = True
 
+    def colmap(self) -> dict[str, int]:
+        """
+        Returns {label: column index} (0-based) for the description; computed once.
+        """
+        if self._colmap is None:
+            self._colmap = {
+                label: column_index_from_string(self.description[label]["col"]) - 1
+                for label in self.description
+            }
+        return self._colmap
+
+    def drop_rows(self, *, sheet: Worksheet, rnos: Iterable[int]) -> None:
+        """
+        Delete the rows rnos from sheet (or the store); the rows below move up.
+        Neighbouring rows are deleted in one go.
+        """
+        rnos = sorted(set(rnos), reverse=True)
+        if not rnos:
+            return
+        print(f"Dropping {len(rnos)} rows")
+        if self._uses_store(sheet):
+            for rno in rnos:
+                self.store.delete(rno)  # type: ignore
+        else:
+            # runs of neighbouring rows, from the bottom up
+            start = end = rnos[0]
+            for rno in rnos[1:] + [0]:
+                if rno == start - 1:
+                    start = rno
+                    continue
+                sheet.delete_rows(start, amount=end - start + 1)
+                start = end = rno
+        self.indexes.clear()
+        self.changed = True
+
     def drop_row_if_file_gone(self, *, col: str = "A", sheet: Worksheet) -> None:
         """
         Loop thru Excel sheet "Assets" and check if the files still exist. We use
@@ -82,9 +272,26 @@ class Xls:
                     if not Path(filename).exists():
                         print(f"Deleting Excel row {c} file gone '{filename}'")
                         sheet.delete_rows(c)
+                        self.indexes.clear()  # rows have moved
                 c += 1
         print("   done")
 
+    def export(self) -> None:
+        """
+        Write the rows from the store into the Excel file and save it.
+        """
+        if self.store is None:
+            raise ConfigError("ERROR: No store to export from")
+        print(f"   exporting {self.store.path} to {self.path}")
+        self.store.commit()
+        self.store.export_sheet(self.wb[self.store.title])
+        self._save_atomic()
+        self.store.set_meta(key="xlsx_mtime", value=str(self.path.stat().st_mtime))
+
+    def export_if_store(self) -> None:
+        if self.store is not None:
+            self.export()
+
     def file_exists(self) -> bool:
         """
         Returns True if Excel Excel file (at self.path) exists at specified location.
@@ -147,6 +354,9 @@ class Xls:
         try:
             ws = self.wb[title]  # sheet exists already
         except:  # new sheet
+            if self.write_only:
+                self.changed = True
+                return self.wb.create_sheet(title)
             ws = self.wb.active
             if ws.title == "Sheet":
                 ws.title = title
@@ -195,17 +405,23 @@ class Xls:
         """
         Loop thru the rows of specified sheet.
 
-        Returns a dict of cells in dict as well as the current row number (rno):
+        Returns the cells by label (a RowView) as well as the current row number (rno):
         for c,rno in self.loop(sheet=ws, limit=self.limit):
             print (f"row number {rno} {c['filename']}")
 
         For this to work, we need a description (self.description).
         """
+        if self._uses_store(sheet):
+            yield from self.store.loop(offset=offset, limit=limit)  # type: ignore
+            return
+        colmap = self.colmap()
+        indexed = self._indexed(sheet)
         for rno, row in enumerate(
             sheet.iter_rows(min_row=offset), start=offset
         ):  # start at 3rd row
-            cells = self._rno2dict(rno, sheet)
-            yield cells, rno
+            if indexed:
+                self.row_changed(sheet=sheet, rno=rno)
+            yield RowView(row, colmap, rno, sheet), rno
             if limit == rno:
                 print("* Limit reached")
                 break
@@ -258,6 +474,14 @@ class Xls:
                 cell.font = blue
         self.changed = True
 
+    def max_row(self, *, sheet: Worksheet) -> int:
+        """
+        Number of the last row, also if the rows are kept in the store.
+        """
+        if self._uses_store(sheet):
+            return self.store.max_row()  # type: ignore
+        return sheet.max_row
+
     def path_exists(
         self,
         *,
@@ -278,16 +502,45 @@ class Xls:
         where multiple dirs may contain files with the same name.
 
         Now we use a cno (no 8) column as int.
-        """
 
-        for idx, row in enumerate(sheet.iter_rows(min_row=3), start=3):
-            # start at 3rd row
-            fn = row[cno].value
-            # print (f"_path_in_list: {fn=}{name=}")
-            if fn == str(path):
+        Lookups use an index per column (see ColumnIndex) which is built on first
+        use. Rows handed out by loop and _rno2dict (and appended by append) may be
+        written to; they are read again before the next lookup. Rows written in
+        other ways have to be reported with row_changed. If rows are deleted or
+        moved, the index has to be dropped (see wipe).
+        """
+        if self._uses_store(sheet):
+            col = get_column_letter(cno + 1)
+            for label in self.description:
+                if self.description[label]["col"] == col:
+                    idx = self.store.find(label=label, value=str(path))  # type: ignore
+                    break
+            else:
+                raise ConfigError(f"ERROR: No column {col} in description")
+            if idx is not None:
                 print(f"WARN: Known full path '{path}' (not adding to list)")
-                return idx
-        return None
+            return idx
+        index = self._column_index(cno=cno, sheet=sheet)
+        idx = index.get(str(path))
+        while idx is not None:
+            value = sheet.cell(row=idx, column=cno + 1).value
+            if value == str(path):
+                break
+            # row has been changed without row_changed
+            index.set(idx, value)
+            idx = index.get(str(path))
+        if idx is not None:
+            print(f"WARN: Known full path '{path}' (not adding to list)")
+        return idx
+
+    def row_changed(self, *, sheet: Worksheet, rno: int) -> None:
+        """
+        Tell path_exists that row rno has been written (or appended) directly in the
+        sheet, e.g. with sheet[f"A{rno}"] = value.
+        """
+        for (title, cno), index in self.indexes.items():
+            if title == sheet.title:
+                index.dirty.add(rno)
 
     def raise_if_conf_value_missing(self, required: dict) -> None:
         base_msg = "ERROR: Missing configuration value: "
@@ -360,14 +613,26 @@ class Xls:
     def save(self) -> bool:
         """
         Made this only to have same print msgs all the time
+
+        If we use a store, we only commit; the Excel file is written by export.
+
+        A write_only workbook can be saved only once; later calls do nothing.
         """
+        if self.store is not None:
+            print(f"   saving {self.store.path}")
+            self.store.commit()
+            self.changed = False
+            return True
+        if self.write_only and self.closed:
+            return False
         print(f"   saving {self.path}")
         try:
-            self.wb.save(filename=self.path)
+            self._save_atomic()
         except KeyboardInterrupt:
             self.request_shutdown()
         else:
             self.changed = False
+            self.closed = self.write_only
         return True
 
     def save_bak_shutdown(
@@ -383,6 +648,18 @@ class Xls:
         if rno is not None and rno % save == 0:
             self.save_if_change()
 
+    def save_due(self) -> bool:
+        """
+        Returns True if enough time has passed since the last save to save again.
+        The interval grows with the time the last save took, so that saving takes
+        at most SAVE_OVERHEAD (5%) of the run time. With a store, saving is only a
+        commit and always due.
+        """
+        if self.store is not None:
+            return True
+        interval = self.save_seconds * (1 - SAVE_OVERHEAD) / SAVE_OVERHEAD
+        return time.monotonic() - self.last_save >= interval
+
     def save_if_change(self) -> bool:
         """
         Version of save that saves only if changes were registered in variable
@@ -397,6 +674,8 @@ class Xls:
         self.save()
         self.changed = False
         if self.shutdown_requested:
+            if self.store is not None:
+                self.export()
             print("Planned shutdown.")
             sys.exit(0)
 
@@ -411,17 +690,45 @@ class Xls:
         """
         if self.shutdown_requested:
             self.save()
+            if self.store is not None:
+                self.export()
             print("Planned shutdown.")
             sys.exit(0)
 
+    def use_store(
+        self, *, sheet: Worksheet, path: str | Path | None = None
+    ) -> RowStore:
+        """
+        Keep the data rows of sheet in a SQLite database (by default next to the Excel
+        file). The rows are imported from the Excel file if the store is new or the
+        Excel file has been changed since the last export (e.g. by a human).
+        """
+        if path is None:
+            path = self.path.with_suffix(".sqlite")
+        self.store = RowStore(
+            path=path, description=self.description, title=sheet.title
+        )
+        synced = self.store.get_meta(key="xlsx_mtime")
+        if self.path.exists() and (
+            synced is None or float(synced) < self.path.stat().st_mtime
+        ):
+            print(f"   importing {self.path} into {self.store.path}")
+            count = self.store.import_sheet(sheet)
+            print(f"   {count} rows")
+            self.store.set_meta(key="xlsx_mtime", value=str(self.path.stat().st_mtime))
+        return self.store
+
     def wipe(self, *, sheet: Worksheet) -> None:
-        """Delete everything but the header. Slow."""
-        rno = 3
-        with tqdm(total=sheet.max_row - 2) as pbar:
-            while rno <= sheet.max_row:
-                # print(f"wiping row {rno}")
-                pbar.update()
-                sheet.delete_rows(rno)
+        """
+        Delete everything but the header (the first two rows). All data rows are
+        deleted in one go; column widths and the header's formatting remain.
+        """
+        if sheet.max_row > 2:
+            print(f"Wiping {sheet.max_row - 2} rows")
+            sheet.delete_rows(3, amount=sheet.max_row - 2)
+        if self._uses_store(sheet):
+            self.store.wipe()  # type: ignore
+        self.indexes.clear()
         self.changed = True
         self.save()
 
@@ -439,7 +746,12 @@ class Xls:
                 "width": 20,
             },
         }
+
+        In the write_only mode, the header has to be written before the first row.
         """
+        if self.write_only:
+            self._write_header_write_only(sheet=sheet)
+            return
 
         for short in self.description:
             col = self.description[short]["col"]  # single letter
@@ -457,13 +769,100 @@ class Xls:
     # private
     #
 
+    def _backup_path(self, n: int) -> Path:
+        """
+        Returns the path of the nth backup; 0 is the newest.
+        """
+        if n == 0:
+            return self.backup_fn
+        return Path(f"{self.backup_fn}.{n}")
+
+    def _column_index(self, *, cno: int, sheet: Worksheet) -> ColumnIndex:
+        """
+        Returns the index for column cno of the sheet. It is built on first use;
+        afterwards only the dirty rows are read again.
+        """
+        index = self.indexes.get((sheet.title, cno))
+        if index is None:
+            index = ColumnIndex()
+            for rno, (value,) in enumerate(
+                sheet.iter_rows(
+                    min_row=3, min_col=cno + 1, max_col=cno + 1, values_only=True
+                ),
+                start=3,
+            ):
+                index.set(rno, value)
+            self.indexes[(sheet.title, cno)] = index
+        elif index.dirty:
+            for rno in index.dirty:
+                index.set(rno, sheet.cell(row=rno, column=cno + 1).value)
+            index.dirty.clear()
+        return index
+
+    def _indexed(self, sheet: Worksheet) -> bool:
+        """
+        True if path_exists has an index for a column of sheet.
+        """
+        return any(title == sheet.title for title, cno in self.indexes)
+
     def _rno2dict(self, rno: int, sheet: Worksheet) -> dict[str, Any]:
         """
         We read  the provide a dict with labels as keys based on table description
         (self.description).
         """
-        cells = dict()
-        for label in self.description:
-            col = self.description[label]["col"]
-            cells[label] = sheet[f"{col}{rno}"]
-        return cells
+        if self._uses_store(sheet):
+            return self.store.cells(rno)  # type: ignore
+        self.row_changed(sheet=sheet, rno=rno)
+        return {
+            label: sheet.cell(row=rno, column=idx + 1)
+            for label, idx in self.colmap().items()
+        }
+
+    def _save_atomic(self) -> None:
+        """
+        Write the workbook to a temp file, flush it to disk and replace the Excel
+        file with it. If we die on the way, the old file remains intact. Records how
+        long it took (see save_due).
+        """
+        start = time.perf_counter()
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        try:
+            self.wb.save(filename=tmp)
+            with open(tmp, "r+b") as f:
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+        finally:
+            self.last_save = time.monotonic()
+            self.save_seconds = time.perf_counter() - start
+
+    def _uses_store(self, sheet: Worksheet) -> bool:
+        return self.store is not None and sheet.title == self.store.title
+
+    def _write_header_write_only(self, *, sheet: Worksheet) -> None:
+        """
+        write_header for a write_only sheet: no random access, so we append the two
+        header rows with styled cells. The second row is left out if the description
+        has no desc at all.
+        """
+        colmap = self.colmap()
+        size = max(colmap.values()) + 1
+        labels: list[Any] = [None] * size
+        descs: list[Any] = [None] * size
+        for short in self.description:
+            idx = colmap[short]
+            cell = WriteOnlyCell(sheet, value=self.description[short]["label"])
+            cell.font = Font(bold=True)
+            labels[idx] = cell
+            if "desc" in self.description[short]:
+                cell = WriteOnlyCell(sheet, value=self.description[short]["desc"])
+                cell.font = Font(size=9, italic=True)
+                descs[idx] = cell
+            if "width" in self.description[short]:
+                col = self.description[short]["col"]
+                sheet.column_dimensions[col].width = self.description[short]["width"]
+        sheet.append(labels)
+        if any(cell is not None for cell in descs):
+            sheet.append(descs)
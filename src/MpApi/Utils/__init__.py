@@ -13,6 +13,7 @@ from MpApi.Utils.becky.becky import becky_main
 from MpApi.Utils.becky.utalib import uta_main
 from MpApi.Utils.identNr import IdentNrFactory
 from MpApi.Utils.count import counter
+from MpApi.Utils.fake_ria import FakeRIA
 from MpApi.Utils.mover import Mover
 from MpApi.Utils.prepareUpload import PrepareUpload
 from MpApi.Utils.reportX import ReportX
@@ -144,6 +145,57 @@ def count():
     counter(src_dir=src_dir, filemask=args.filemask, show_size=args.size)
 
 
+def fake_ria():
+    parser = argparse.ArgumentParser(
+        description="local stand-in for RIA's REST API for offline tests and benchmarks"
+    )
+    parser.add_argument("--host", help="interface to listen on", default="localhost")
+    parser.add_argument(
+        "-p", "--port", help="port to listen on", type=int, default=8080
+    )
+    parser.add_argument(
+        "-d", "--data", help="JSON file with records to load at start (optional)"
+    )
+    parser.add_argument(
+        "-l",
+        "--latency",
+        help="delay every request by so many seconds",
+        type=float,
+        default=0,
+    )
+    parser.add_argument(
+        "-e",
+        "--error-rate",
+        help="share of requests (0..1) that fail with 503",
+        type=float,
+        default=0,
+    )
+    parser.add_argument(
+        "-s", "--seed", help="random seed for error injection", type=int
+    )
+    parser.add_argument(
+        "-m",
+        "--max-limit",
+        help="return at most so many records per search, whatever its limit",
+        type=int,
+    )
+    args = parser.parse_args()
+    server = FakeRIA(
+        host=args.host,
+        port=args.port,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        seed=args.seed,
+        max_limit=args.max_limit,
+    )
+    if args.data is not None:
+        server.load(args.data)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
 def mk_grp():
     parser = argparse.ArgumentParser(
         description="Create (make) a ObjectGroup in RIA based on an *.xlsx with objIds"
@@ -188,13 +240,23 @@ def move():
         choices=["init", "move", "scandir", "wipe"],
     )
     parser.add_argument("-l", "--limit", help="stop after number of files", default=-1)
+    parser.add_argument(
+        "--no-cache",
+        help="don't use or fill the cache of RIA lookups (.ria_cache.db)",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--clear-cache",
+        help="forget cached RIA lookups before starting",
+        action="store_true",
+    )
     parser.add_argument(
         "-v", "--version", help="display version information", action="store_true"
     )
 
     args = parser.parse_args()
 
-    m = Mover(limit=args.limit)
+    m = Mover(limit=args.limit, cache=not args.no_cache, clear_cache=args.clear_cache)
     match args.first:
         case "init":
             m.init()
@@ -217,6 +279,16 @@ def prepareUpload():
         choices=["checkria", "createobjects", "init", "scandir"],
     )
     parser.add_argument("-l", "--limit", help="stop after number of items", default=-1)
+    parser.add_argument(
+        "--no-cache",
+        help="don't use or fill the cache of RIA lookups (.ria_cache.db)",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--clear-cache",
+        help="forget cached RIA lookups before starting",
+        action="store_true",
+    )
     parser.add_argument(
         "-v", "--version", help="display version information", action="store_true"
     )
@@ -228,6 +300,8 @@ def prepareUpload():
 
     p = PrepareUpload(
         limit=args.limit,
+        cache=not args.no_cache,
+        clear_cache=args.clear_cache,
     )
     match args.phase:
         case "init":
@@ -258,11 +332,17 @@ def reportX():
         help="Stop the scan after specified number of files",
         default=-1,
     )
+    parser.add_argument(
+        "-p",
+        "--parser",
+        help="identNr parser (AKu, EM or old)",
+        default="EM",
+    )
     parser.add_argument(
         "-v", "--version", help="display version information", action="store_true"
     )
     args = parser.parse_args()
-    r = ReportX(limit=args.limit)
+    r = ReportX(limit=args.limit, parser=args.parser)
     r.write_report("reportx.xlsx")
 
 
@@ -353,6 +433,7 @@ def upload():
     """
     CLI USAGE:
     upload cont    # continous upload
+    upload export  # write rows from SQLite store (--db) into Excel file
     upload init    # writes empty excel file at conf.xlsx; existing files not overwritten
                    # and scans current directory preparing for upload
     upload photo   # lookup photographerIDs
@@ -370,22 +451,80 @@ def upload():
     parser.add_argument(
         "cmd",
         help="use one of the following commands",
-        choices=("cont", "init", "photo", "scandir", "standardbild", "up", "wipe"),
+        choices=(
+            "cont",
+            "export",
+            "init",
+            "photo",
+            "scandir",
+            "standardbild",
+            "up",
+            "wipe",
+        ),
+    )
+    parser.add_argument(
+        "--db",
+        help="keep rows in SQLite during the run; Excel file is written at the end",
+        action="store_true",
     )
     parser.add_argument(
         "-l", "--limit", help="break the go after number of items", default=-1
     )
+    parser.add_argument(
+        "--no-cache",
+        help="don't use or fill the cache of RIA lookups (.ria_cache.db)",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--clear-cache",
+        help="forget cached RIA lookups before starting",
+        action="store_true",
+    )
     parser.add_argument(
         "-v", "--version", help="display version info and exit", action="store_true"
     )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        help="number of files uploaded at the same time; 1 for one after the other",
+        default=4,
+        type=int,
+    )
+    parser.add_argument(
+        "-b",
+        "--bandwidth",
+        help="upper limit for uploads in MB/s, e.g. during office hours",
+        type=float,
+    )
+    parser.add_argument(
+        "-s",
+        "--save-every",
+        help="save Excel file at most every n rows; progress in between is kept in a journal",
+        default=100,
+        type=int,
+    )
 
     args = parser.parse_args()
 
-    u = AssetUploader(limit=args.limit)
+    u = AssetUploader(
+        limit=args.limit,
+        workers=args.workers,
+        bandwidth=args.bandwidth,
+        save_every=args.save_every,
+        db=args.db,
+        cache=not args.no_cache,
+        clear_cache=args.clear_cache,
+    )
     match args.cmd:
         case "cont":
             c = 1
-            u = AssetUploader()
+            u = AssetUploader(
+                workers=args.workers,
+                bandwidth=args.bandwidth,
+                save_every=args.save_every,
+                db=args.db,
+                cache=not args.no_cache,
+            )
             ioffset = u.initial_offset()
             print(f"   initial offset: {ioffset}")
             csize = 5000
@@ -393,11 +532,21 @@ def upload():
                 limit = c * csize + ioffset
                 offset = (c - 1) * csize + ioffset
                 print(f"Setting {offset=} and {limit=} ")
-                u = AssetUploader(limit=limit, offset=offset)
+                u = AssetUploader(
+                    limit=limit,
+                    offset=offset,
+                    workers=args.workers,
+                    bandwidth=args.bandwidth,
+                    save_every=args.save_every,
+                    db=args.db,
+                    cache=not args.no_cache,
+                )
                 # u.xls.backup_excel()
                 u.scandir(offset=offset)
                 u.go()
                 c += 1
+        case "export":
+            u.export()
         case "photo":
             u.photo()
         case "init":
@@ -2,14 +2,16 @@
 attach2 - this will become a tool to identify and fix for missing attachments
 """
 
+import json
 from mpapi.client import MpApi
-from mpapi.module import Module
 from mpapi.search import Search
 from mpapi.constants import get_credentials, NSMAP
 from MpApi.Record import Record  # tested?
 from MpApi.Utils.Ria import RIA
 from MpApi.Utils.Xls import Xls
+from MpApi.Utils.walker import walk
 from pathlib import Path
+from typing import Iterable
 
 
 class Attacher2:
@@ -69,26 +71,32 @@ class Attacher2:
         self.xls.raise_if_file()
 
         print("Getting data from RIA from ...")
-        xfilter = (
-            "/m:application/m:modules/m:module/m:moduleItem[@hasAttachments='false']"
-        )
-        results_fn = "debug_response.xml"
+        results_fn = Path("debug_response.json")
 
         print(self.cache)
         if self.cache:
             print(f"   cached response '{results_fn}'")
-            m = Module(file=results_fn)
+            with open(results_fn, "r", encoding="utf-8") as f:
+                items = json.load(f)
         else:
             print("   fresh query")
             q = self._get_query()
             q.validate(mode="search")
             print("Query validates, about to start search...")
             q.toFile(path="debug_query.xml")
-            m = self.client.search2(query=q)
-            new = m.filter2(xpath=xfilter)
-            new.toFile(path=results_fn)
+            # the response can be huge, so we get it in pages and keep only the
+            # assets without attachment
+            items = [
+                (mulId, fields)
+                for mulId, fields in self.client2.paginate(
+                    mtype="Multimedia", query=self._get_query
+                )
+                if fields.get("@hasAttachments") == "false"
+            ]
+            with open(results_fn, "w", encoding="utf-8") as f:
+                json.dump(items, f, ensure_ascii=False)
             print(f"Response written to disk '{results_fn}'")
-        self._write_xlsx(new)
+        self._write_xlsx(items)
 
     def scandir(self) -> None:
         start_dir = Path(r"M:\MuseumPlus\Produktiv\Multimedia\EM\PLM-Dubletten\AmArch")
@@ -99,13 +107,13 @@ class Attacher2:
         filenames_from_excel = self._get_filenames_from_excel()
 
         c = 3
-        for p in start_dir.glob("**/*"):
-            if p.is_file:
-                name = p.name
-                if name in filenames_from_excel:
-                    print(f"{c}:'{name}' on disk AND in excel list")
-                    self._add_file_excel(p)
-                print(f"files+dirs {c}", end="\r", flush=True)
+        for f in walk(start_dir, filemask="**/*"):
+            p = f.path
+            name = p.name
+            if name in filenames_from_excel:
+                print(f"{c}:'{name}' on disk AND in excel list")
+                self._add_file_excel(p)
+            print(f"files {c}", end="\r", flush=True)
             if c % 100_000 == 0:
                 self.xls.save()
             c += 1
@@ -187,13 +195,16 @@ class Attacher2:
         print(f"Filenames in Excel {filenames_from_excel}")
         return filenames_from_excel
 
-    def _get_query(self) -> Search:
-        q = Search(module="Multimedia")
+    def _get_query(self, limit: int = -1, offset: int = 0) -> Search:
+        q = Search(module="Multimedia", limit=limit, offset=offset)
         q.AND()
         q.addCriterion(
             operator="equalsField", field="__orgUnit", value="EMAmArchaologie"
         )
         q.addCriterion(operator="contains", field="MulOriginalFileTxt", value="pdf")
+        q.addField(field="__id")
+        q.addField(field="MulOriginalFileTxt")
+        q.addField(field="MulOriginalFileLocationClb")
         return q
 
     def _upload_attachment(self, path: str, mulId: int) -> None:
@@ -221,31 +232,28 @@ class Attacher2:
         else:
             raise Exception(f"multimedia ID not found online {mulid}")
 
-    def _write_xlsx(self, data: Module) -> None:
-        wb = self.xls.get_or_create_wb()
-        self.ws = self.xls.get_or_create_sheet(title="Missing Attachments")
-        self.xls.write_header(sheet=self.ws)
-        rno = 3
-        for moduleItemN in data.xpath("/m:application/m:modules/m:module/m:moduleItem"):
-            mulId = moduleItemN.xpath("@id")[0]
-            filename = moduleItemN.xpath(
-                "m:dataField[@name='MulOriginalFileTxt']/m:value/text()",
-                namespaces=NSMAP,
-            )[0]
-            try:
-                location = moduleItemN.xpath(
-                    "m:dataField[@name='MulOriginalFileLocationClb']/m:value/text()",
-                    namespaces=NSMAP,
-                )[0]
-            except:
-                location = None
-            # print(f"{mulId} {filename} {location}")
-            self.ws[f"A{rno}"] = mulId
-            self.ws[f"B{rno}"] = filename
-            if location is not None:
-                self.ws[f"C{rno}"] = location
-            rno += 1
-        self.xls.save()
+    def _write_xlsx(self, items: Iterable[tuple[int, dict]]) -> None:
+        """
+        Expects (mulId, fields) tuples as they come from stream.iter_items.
+
+        The list is written in write_only mode, so rows go to disk as they come and
+        memory stays constant. Afterwards we load the new file as usual.
+        """
+        xls = Xls(path=self.xls.path, description=self.desc(), write_only=True)
+        ws = xls.get_or_create_sheet(title="Missing Attachments")
+        xls.write_header(sheet=ws)
+        for mulId, fields in items:
+            xls.append(
+                sheet=ws,
+                values={
+                    "mulId": str(mulId),
+                    "filename": fields["MulOriginalFileTxt"],
+                    "location": fields.get("MulOriginalFileLocationClb"),
+                },
+            )
+        xls.save()
+        self.xls = Xls(path=self.xls.path, description=self.desc())
+        self.ws = self.xls.get_sheet(title="Missing Attachments")
 
 
 if __name__ == "__main__":
@@ -30,7 +30,13 @@ from mpapi.constants import get_credentials
 from mpapi.module import Module
 from mpapi.search import Search
 
-from MpApi.Utils.Ria import RIA, init_ria, record_exists, record_exists3
+from MpApi.Utils.Ria import (
+    RIA,
+    init_ria,
+    record_exists,
+    record_exists3,
+    records_exist3,
+)
 from MpApi.Utils.becky.set_fields_Object import (
     set_ident,
     set_ident_sort,
@@ -79,6 +85,9 @@ def becky_main(
     init_log(act=act, conf=conf, conf_fn=conf_fn, limit=limit, offset=offset)
     print(f">> Getting template from RIA Object {conf['template_id']}")
     conf["templateM"] = conf["RIA"].get_template(ID=conf["template_id"], mtype="Object")
+    conf["exists_cache"] = _prefetch_exists(
+        sheet=ws, conf=conf, limit=limit, offset=offset
+    )
 
     for idx, row in enumerate(ws.iter_rows(min_row=conf["excel_row_offset"]), start=2):
         dd(f"{idx=} {offset=}")
@@ -183,19 +192,23 @@ def log_print_info(msg: str) -> None:
 
 
 def per_row(*, idx: int, row: Cell, conf: dict, act: bool) -> None:
-    ident = row[0].value  # from Excel as str
+    ident = row[0].value  # from Excel, usually as str
 
     if ident is None:
         logging.warning(f"IdentNr is None {idx}; not processing this line")
         return
-    font_color = row[0].font.color
-    if font_color and font_color.rgb == "FFFF0000":  # includes the alpha channel
+    ident = str(ident).strip()  # numbers come as int
+    if _is_red(row[0]):
         global no_records_created
         print(f"***[{no_records_created}]{idx}: {ident}")
         # record_exists2 is Hendryk's algorithm that uses schemata and fortlaufende Nummer
         # if m := record_exists2(ident=ident, conf=conf):
         # record_exists3 omits Bereich and simply uses IdentNr and exact match.
-        if m := record_exists3(ident=ident, conf=conf):
+        # Usually, the answer has already been prefetched in a batch.
+        m = conf.get("exists_cache", {}).get(ident)
+        if m is None:
+            m = record_exists3(ident=ident, conf=conf)
+        if m:
             # Wollen wir hier Fehler loggen um Nachzuvollziehen, wo die Infos aus Excel
             # nicht eingetragen wurden? Nein. Nur loggen, wenn etwas in RIA verändert wird
             print(f"INFO Record '{ident}' exists already")
@@ -203,6 +216,8 @@ def per_row(*, idx: int, row: Cell, conf: dict, act: bool) -> None:
             if not act:
                 logging.info(f"Would create {idx}: {ident}")
             create_record(row=row, conf=conf, act=act)
+            # prefetched answer is outdated now that a record might have been created
+            conf.get("exists_cache", {}).pop(ident, None)
             if m > 1:
                 logging.warning(
                     f"Multiple identNr: More than one IdentNr exists already with this number {ident}"
@@ -214,6 +229,35 @@ def per_row(*, idx: int, row: Cell, conf: dict, act: bool) -> None:
 #
 
 
+def _is_red(cell: Cell) -> bool:
+    font_color = cell.font.color
+    # includes the alpha channel
+    return bool(font_color and font_color.rgb == "FFFF0000")
+
+
+def _prefetch_exists(
+    *, sheet: worksheet, conf: dict, limit: int = -1, offset: int = 2
+) -> dict[str, int]:
+    """
+    Collect the identNrs that per_row will check (red ones) and look them up in RIA
+    in a few batched queries instead of one query per row.
+
+    Returns a dictionary with the number of existing records per identNr.
+    """
+    idents = list()
+    for idx, row in enumerate(
+        sheet.iter_rows(min_row=conf["excel_row_offset"]), start=2
+    ):
+        if idx < offset:
+            continue
+        if row[0].value is not None and _is_red(row[0]):
+            idents.append(str(row[0].value).strip())
+        if limit == idx:
+            break
+    print(f">> Prefetching {len(idents)} identNrs from RIA")
+    return records_exist3(idents=idents, conf=conf)
+
+
 def _load_conf(conf_fn: str) -> dict:
     print(f">> Reading configuration '{conf_fn}'")
     with open(Path(conf_fn), "rb") as toml_file:
@@ -91,22 +91,24 @@ def query_archives(*, ident: str, client: RIA) -> list:
         return list()
     else:
         archive_ident = ident.strip()
-        q = Search(module="Object", limit=-1, offset=0)
-        q.AND()
-        q.addCriterion(
-            operator="equalsField",  # notEqualsTerm
-            field="__orgUnit",  # __orgUnit is not allowed in Zetcom's own search.xsd
-            value="EMArchiv",
-        )
-        q.addCriterion(
-            field="ObjObjectNumberVrt",
-            operator="equalsField",
-            value=archive_ident,
-        )
-        q.addField(field="__id")
-        q.validate(mode="search")  # raises if not valid
-        m = client.mpapi.search2(query=q)
-        return m.get_ids(mtype="Object")
+
+        def query(limit: int, offset: int) -> Search:
+            q = Search(module="Object", limit=limit, offset=offset)
+            q.AND()
+            q.addCriterion(
+                operator="equalsField",  # notEqualsTerm
+                field="__orgUnit",  # __orgUnit is not allowed in Zetcom's own search.xsd
+                value="EMArchiv",
+            )
+            q.addCriterion(
+                field="ObjObjectNumberVrt",
+                operator="equalsField",
+                value=archive_ident,
+            )
+            q.addField(field="__id")
+            return q
+
+        return [str(ID) for ID, fields in client.paginate(mtype="Object", query=query)]
 
 
 def query_persons(*, name: str, date: str, client: RIA) -> list:
@@ -117,23 +119,24 @@ def query_persons(*, name: str, date: str, client: RIA) -> list:
     ones that match the date.
     """
     print(f"***{name}***{date=}")
-    q = Search(module="Person", limit=-1, offset=0)
-    q.AND()
-    q.addCriterion(
-        field="PerNennformTxt",
-        operator="equalsField",
-        value=name,
-    )
-    q.addCriterion(
-        field="PerDateGrp.DatingNewTxt",
-        operator="equalsField",
-        value=date,
-    )
-    q.addField(field="__id")
-    q.validate(mode="search")  # raises if not valid
-    m = client.mpapi.search2(query=q)
-    # print(m)
-    return m.get_ids(mtype="Person")
+
+    def query(limit: int, offset: int) -> Search:
+        q = Search(module="Person", limit=limit, offset=offset)
+        q.AND()
+        q.addCriterion(
+            field="PerNennformTxt",
+            operator="equalsField",
+            value=name,
+        )
+        q.addCriterion(
+            field="PerDateGrp.DatingNewTxt",
+            operator="equalsField",
+            value=date,
+        )
+        q.addField(field="__id")
+        return q
+
+    return [str(ID) for ID, fields in client.paginate(mtype="Person", query=query)]
 
 
 def update_archive(*, conf: dict, sheet: worksheet, limit: int) -> None:
@@ -210,22 +213,31 @@ def _archive_per_cell(cell: str, *, data: dict, client: RIA) -> None:
 
 
 def _lookup_pk_ids(*, person_data: dict, conf: dict, limit: int) -> dict:
+    """
+    Look up the names without ids in RIA. We send the queries in parallel, a batch at a
+    time, and save the cache after every batch.
+    """
     client = init_ria()
     print(">> Unidentified names?")
+    jobs = []
     for idx, name in enumerate(person_data, start=1):
         for date in person_data[name]:
             # print (f"**{date=}")
             if not person_data[name][date]:  # if tuple is empty
                 # where do we get date from? _each_person
-                idL = query_persons(client=client, name=name, date=date)
-                person_data[name][date] = idL
-                set_change()
-                print(f"{idL}")
-            if idx % 25 == 0:
-                save_person_cache(data=person_data, conf=conf)
-            if limit == idx:
-                print(">> Limit reached")
-                break
+                jobs.append({"client": client, "name": name, "date": date})
+        if limit == idx:
+            print(">> Limit reached")
+            break
+    batch_size = 25
+    for start in range(0, len(jobs), batch_size):
+        batch = jobs[start : start + batch_size]
+        results = client.run_many(query_persons, batch)
+        for job, idL in zip(batch, results):
+            person_data[job["name"]][job["date"]] = idL
+            print(f"{idL}")
+        set_change()
+        save_person_cache(data=person_data, conf=conf)
     return person_data
 
 
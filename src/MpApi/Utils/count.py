@@ -3,6 +3,7 @@ count the files in this directory potentially recursively
 """
 
 from collections import defaultdict
+from MpApi.Utils.walker import walk
 from pathlib import Path
 from tqdm import tqdm
 
@@ -62,12 +63,11 @@ def counter(src_dir: Path = Path(), filemask: str = "*", show_size: bool = False
 
     problems = list()
     with tqdm(desc=filemask, unit=" files") as pbar:
-        for f in src_dir.glob(filemask):
-            if f.is_dir():  # don't count dirs
-                continue
+        for entry in walk(src_dir, filemask=filemask):
+            f = entry.path
             try:
                 # may fail for files with path > 255 chars
-                size = f.stat().st_size
+                size = entry.size
             except:
                 problems.append(f)  # used to be str(f)
                 print(f"problem '{f}'")
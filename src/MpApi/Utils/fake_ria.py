@@ -0,0 +1,468 @@
+"""
+fake_ria - a local stand-in for the RIA REST API, for offline tests and benchmarks
+
+It implements the subset of the API that MpApi and RIA use:
+
+    POST /ria-ws/application/module/{mtype}/search                   search
+    GET  /ria-ws/application/module/{mtype}/{id}                     get item
+    POST /ria-ws/application/module/{mtype}                          create item
+    PUT  /ria-ws/application/module/{mtype}/{id}                     update item
+    PUT  /ria-ws/application/module/{mtype}/{id}/attachment          upload attachment
+    GET  /ria-ws/application/module/{mtype}/{id}/attachment          get attachment
+    PUT  /ria-ws/application/module/{mtype}/{id}/{group}/{refId}     update rGrp item
+
+Records are kept in memory as lxml moduleItems. Searches understand the expert
+operators we use (equalsField, equalsExact, startsWithField, contains, greater,
+less, isNotBlank) combined with and, or and not, as well as limit, offset, sort and
+select. Like RIA, equalsField and startsWithField ignore case and Sonderzeichen.
+Without sort, hits come in the order the records were added. max_limit caps the
+number of records per response, as a server may do.
+
+Latency and errors can be injected to see how the tools behave with a slow or flaky
+server. For tests, requests that mention a certain string (e.g. a filename) can be
+made to fail with 500 (server.fail_on.add("drei.jpg")).
+
+    $ fake_ria --port 8080 --latency 0.2 --error-rate 0.01 --data seed.json
+
+seed.json contains records as {"Object": [{"ObjObjectNumberVrt": "VII c 123",
+"__orgUnit": "EMMusikethnologie"}, ...]}. Point the credentials file to
+baseURL = "http://localhost:8080" to run the tools against it. Authentication is
+not checked.
+
+In Python:
+
+    server = FakeRIA(port=0)  # a free port
+    server.add_item(mtype="Object", fields={"ObjObjectNumberVrt": "VII c 123"})
+    server.start()  # in a background thread
+    ... requests to server.baseURL ...
+    server.stop()
+"""
+
+import base64
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+from lxml import etree  # type: ignore
+from MpApi.Utils.IdentNr_Index import lax_form
+from pathlib import Path
+import random
+import re
+import sys
+import threading
+import time
+
+NS = "http://www.zetcom.com/ria/ws/module"
+SNS = "http://www.zetcom.com/ria/ws/module/search"
+APP = "/ria-ws/application"
+FIELDS = ("dataField", "virtualField", "systemField")
+
+
+class FakeRIA:
+    def __init__(
+        self,
+        *,
+        host: str = "localhost",
+        port: int = 8080,
+        latency: float = 0,
+        error_rate: float = 0,
+        seed: int | None = None,
+        max_limit: int | None = None,
+    ) -> None:
+        """
+        latency: seconds every request is delayed
+        error_rate: share of requests (0..1) that fail with 503
+        seed: for the random generator that decides which requests fail
+        max_limit: most records a search returns, whatever its limit
+        """
+        self.latency = latency
+        self.max_limit = max_limit
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.items: dict[str, dict[int, etree._Element]] = {}
+        self.attachments: dict[tuple[str, int], tuple[str, bytes]] = {}
+        self.next_id = 1
+        self.requests = 0
+        self.fail_on: set[str] = set()  # requests mentioning these fail with 500
+        self.server = _Server((host, port), _make_handler(self))
+        self.thread: threading.Thread | None = None
+
+    @property
+    def baseURL(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def add_item(
+        self, *, mtype: str, fields: dict | None = None, ID: int | None = None
+    ) -> int:
+        """
+        Add a record with simple fields. Field names beginning with __ become
+        systemFields, names ending with Vrt virtualFields, everything else dataFields.
+        "Group.Field" becomes a dataField in a repeatableGroup with one item. A list of
+        IDs becomes a moduleReference, e.g. {"ObjMultimediaRef": [11, 12]}.
+        Returns the new ID.
+        """
+        itemN = etree.Element(f"{{{NS}}}moduleItem", nsmap={None: NS})
+        groups: dict[str, etree._Element] = {}
+        for name, value in (fields or {}).items():
+            parentN = itemN
+            if "." in name:
+                group, name = name.split(".", 1)
+                if group not in groups:
+                    groupN = etree.SubElement(
+                        itemN, f"{{{NS}}}repeatableGroup", name=group
+                    )
+                    groups[group] = etree.SubElement(
+                        groupN, f"{{{NS}}}repeatableGroupItem"
+                    )
+                parentN = groups[group]
+            if isinstance(value, list):
+                refN = etree.SubElement(parentN, f"{{{NS}}}moduleReference", name=name)
+                for seqNo, refId in enumerate(value):
+                    etree.SubElement(
+                        refN,
+                        f"{{{NS}}}moduleReferenceItem",
+                        moduleItemId=str(refId),
+                        seqNo=str(seqNo),
+                    )
+                continue
+            if name.startswith("__"):
+                kind = "systemField"
+            elif name.endswith("Vrt"):
+                kind = "virtualField"
+            else:
+                kind = "dataField"
+            fieldN = etree.SubElement(parentN, f"{{{NS}}}{kind}", name=name)
+            etree.SubElement(fieldN, f"{{{NS}}}value").text = str(value)
+        return self._store(mtype=mtype, itemN=itemN, ID=ID)
+
+    def load(self, path: str | Path) -> None:
+        """
+        Load records from a JSON file {mtype: [{field: value}, ...]}.
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        for mtype, records in data.items():
+            for fields in records:
+                self.add_item(mtype=mtype, fields=fields)
+
+    def serve_forever(self) -> None:
+        print(f"fake RIA listening on {self.baseURL}")
+        self.server.serve_forever()
+
+    def start(self) -> "FakeRIA":
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, args=(0.05,), daemon=True
+        )
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    #
+    # request handling, called from the handler
+    #
+
+    def handle(
+        self, method: str, path: str, body: bytes, headers
+    ) -> tuple[int, str, bytes]:
+        """
+        Returns status code, content type and body for a request.
+        """
+        with self.lock:
+            self.requests += 1
+            fail = self.error_rate and self.random.random() < self.error_rate
+            fail_on = [t for t in self.fail_on if t in path or t.encode() in body]
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            return 503, "text/plain", b"injected error"
+        if fail_on:
+            return 500, "text/plain", f"failing on {fail_on[0]}".encode()
+        if not path.startswith(f"{APP}/module/"):
+            return 404, "text/plain", b"unknown path"
+        parts = path[len(f"{APP}/module/") :].strip("/").split("/")
+        mtype = parts[0]
+        try:
+            match method, parts[1:]:
+                case "POST", ["search"]:
+                    return self._search(mtype, body)
+                case "POST", []:
+                    return self._create(mtype, body)
+                case "GET", [ID]:
+                    return self._get(mtype, int(ID))
+                case "PUT", [ID]:
+                    return self._update(mtype, int(ID), body)
+                case "PUT", [ID, "attachment"]:
+                    return self._put_attachment(mtype, int(ID), body, headers)
+                case "GET", [ID, "attachment"]:
+                    return self._get_attachment(mtype, int(ID))
+                case "PUT", [ID, group, refId]:
+                    return self._update_group(mtype, int(ID), group, refId, body)
+        except KeyError:
+            return 404, "text/plain", b"not found"
+        except (etree.XMLSyntaxError, ValueError) as e:
+            return 400, "text/plain", str(e).encode()
+        return 405, "text/plain", b"not implemented"
+
+    #
+    # private
+    #
+
+    def _create(self, mtype: str, body: bytes) -> tuple[int, str, bytes]:
+        tree = etree.fromstring(body)
+        itemN = tree.find(f".//{{{NS}}}moduleItem")
+        if itemN is None:
+            raise ValueError("no moduleItem")
+        ID = self._store(mtype=mtype, itemN=itemN)
+        resp = _application(mtype, [etree.Element(f"{{{NS}}}moduleItem", id=str(ID))])
+        return 200, "application/xml", resp
+
+    def _get(self, mtype: str, ID: int) -> tuple[int, str, bytes]:
+        with self.lock:
+            itemN = self._item_copy(mtype, ID)
+        return 200, "application/xml", _application(mtype, [itemN])
+
+    def _get_attachment(self, mtype: str, ID: int) -> tuple[int, str, bytes]:
+        with self.lock:
+            name, data = self.attachments[(mtype, ID)]
+        return 200, "application/octet-stream", data
+
+    def _item_copy(self, mtype: str, ID: int) -> etree._Element:
+        """
+        A copy of the stored item with up-to-date attributes. Call with lock.
+        """
+        itemN = etree.fromstring(etree.tostring(self.items[mtype][ID]))
+        itemN.set("id", str(ID))
+        has = "true" if (mtype, ID) in self.attachments else "false"
+        itemN.set("hasAttachments", has)
+        return itemN
+
+    def _put_attachment(
+        self, mtype: str, ID: int, body: bytes, headers
+    ) -> tuple[int, str, bytes]:
+        if "xml" in headers.get("Content-Type", ""):
+            # <attachment name="x.jpg"><value>base64</value></attachment>
+            tree = etree.fromstring(body)
+            attachmentN = tree.find(f".//{{{NS}}}attachment")
+            name = attachmentN.get("name")
+            data = base64.b64decode(attachmentN.findtext(f"{{{NS}}}value") or "")
+        else:
+            name = headers.get("X-File-Name", "attachment")
+            data = body
+        with self.lock:
+            self.items[mtype][ID]  # raises KeyError if item doesn't exist
+            self.attachments[(mtype, ID)] = (name, data)
+        return 204, "text/plain", b""
+
+    def _search(self, mtype: str, body: bytes) -> tuple[int, str, bytes]:
+        tree = etree.fromstring(body)
+        searchN = tree.find(f".//{{{SNS}}}search")
+        if searchN is None:
+            raise ValueError("no search element")
+        limit = int(searchN.get("limit", -1))
+        if self.max_limit is not None and not -1 < limit <= self.max_limit:
+            limit = self.max_limit
+        offset = int(searchN.get("offset", 0))
+        expertN = searchN.find(f"{{{SNS}}}expert")
+        select = [
+            fieldN.get("fieldPath")
+            for fieldN in searchN.iterfind(f"{{{SNS}}}select/{{{SNS}}}field")
+        ]
+        with self.lock:
+            hits = []
+            items = self.items.get(mtype, {})
+            for ID, itemN in items.items():
+                if expertN is None or all(
+                    _matches(ID, itemN, critN) for critN in expertN
+                ):
+                    hits.append(ID)
+            # the last sort field first, so that the first one wins
+            for fieldN in reversed(searchN.findall(f"{{{SNS}}}sort/{{{SNS}}}field")):
+                path = fieldN.get("fieldPath")
+                hits.sort(
+                    key=lambda ID: _sort_key(ID, items[ID], path),
+                    reverse=fieldN.get("direction") == "Descending",
+                )
+            total = len(hits)
+            if limit > -1:
+                hits = hits[offset : offset + limit]
+            else:
+                hits = hits[offset:]
+            itemL = [self._item_copy(mtype, ID) for ID in hits]
+        if select:
+            for itemN in itemL:
+                for childN in list(itemN):
+                    if etree.QName(childN).localname != "systemField" and childN.get(
+                        "name"
+                    ) not in [path.split(".")[0] for path in select]:
+                        itemN.remove(childN)
+        return 200, "application/xml", _application(mtype, itemL, total=total)
+
+    def _store(
+        self, *, mtype: str, itemN: etree._Element, ID: int | None = None
+    ) -> int:
+        with self.lock:
+            if ID is None:
+                ID = self.next_id
+            self.next_id = max(self.next_id, ID + 1)
+            newN = etree.Element(f"{{{NS}}}moduleItem", nsmap={None: NS})
+            for childN in itemN:
+                newN.append(etree.fromstring(etree.tostring(childN)))
+            self.items.setdefault(mtype, {})[ID] = newN
+        return ID
+
+    def _update(self, mtype: str, ID: int, body: bytes) -> tuple[int, str, bytes]:
+        """
+        Fields in the request replace fields with the same name; other fields remain.
+        """
+        tree = etree.fromstring(body)
+        newN = tree.find(f".//{{{NS}}}moduleItem")
+        with self.lock:
+            itemN = self.items[mtype][ID]
+            for childN in newN:
+                for oldN in itemN.findall(childN.tag):
+                    if oldN.get("name") == childN.get("name"):
+                        itemN.remove(oldN)
+                itemN.append(etree.fromstring(etree.tostring(childN)))
+        return 204, "text/plain", b""
+
+    def _update_group(
+        self, mtype: str, ID: int, group: str, refId: str, body: bytes
+    ) -> tuple[int, str, bytes]:
+        """
+        Replace the fields of one repeatableGroupItem (or moduleReferenceItem) with
+        the fields in the request.
+        """
+        tree = etree.fromstring(body)
+        newN = tree.find(f".//{{{NS}}}repeatableGroupItem")
+        if newN is None:
+            # for references, the request may contain all items (see
+            # RIA.mk_asset_standardbild2); we want the one that is changed
+            newN = tree.find(f".//{{{NS}}}moduleReferenceItem[@moduleItemId='{refId}']")
+        if newN is None:
+            newN = tree.find(f".//{{{NS}}}moduleReferenceItem")
+        if newN is None:
+            raise ValueError("no repeatableGroupItem")
+        with self.lock:
+            itemN = self.items[mtype][ID]
+            for groupN in itemN:
+                if groupN.get("name") != group:
+                    continue
+                for oldN in groupN:
+                    if refId in (oldN.get("id"), oldN.get("moduleItemId")):
+                        for childN in newN:
+                            for fieldN in oldN.findall(childN.tag):
+                                if fieldN.get("name") == childN.get("name"):
+                                    oldN.remove(fieldN)
+                            oldN.append(etree.fromstring(etree.tostring(childN)))
+                        return 204, "text/plain", b""
+        raise KeyError(refId)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address) -> None:
+        # clients that hang up (e.g. keep-alive connections at exit) are no error
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def _application(mtype: str, itemL: list, *, total: int | None = None) -> bytes:
+    appN = etree.Element(f"{{{NS}}}application", nsmap={None: NS})
+    modulesN = etree.SubElement(appN, f"{{{NS}}}modules")
+    moduleN = etree.SubElement(modulesN, f"{{{NS}}}module", name=mtype)
+    moduleN.set("totalSize", str(len(itemL) if total is None else total))
+    for itemN in itemL:
+        moduleN.append(itemN)
+    return etree.tostring(appN, xml_declaration=True, encoding="UTF-8")
+
+
+def _field_values(ID: int, itemN: etree._Element, path: str) -> list[str]:
+    """
+    Values of a field in an item; path can be "__id", "FieldName" or
+    "GroupName.FieldName" for fields in repeatableGroups.
+    """
+    if path == "__id":
+        return [str(ID)]
+    if "." in path:
+        group, field = path.split(".", 1)
+        xpath = (
+            f"m:repeatableGroup[@name='{group}']/m:repeatableGroupItem/"
+            f"m:*[@name='{field}']/m:value/text()"
+        )
+    else:
+        xpath = f"m:*[@name='{path}']/m:value/text()"
+    return [str(v) for v in itemN.xpath(xpath, namespaces={"m": NS})]
+
+
+def _matches(ID: int, itemN: etree._Element, critN: etree._Element) -> bool:
+    """
+    Evaluate a search criterion (possibly nested in and/or/not) for an item.
+    """
+    op = etree.QName(critN).localname
+    if op == "and":
+        return all(_matches(ID, itemN, childN) for childN in critN)
+    if op == "or":
+        return any(_matches(ID, itemN, childN) for childN in critN)
+    if op == "not":
+        return not any(_matches(ID, itemN, childN) for childN in critN)
+    values = _field_values(ID, itemN, critN.get("fieldPath"))
+    operand = critN.get("operand", "")
+    match op:
+        case "equalsField" | "equalsTerm":
+            return any(lax_form(v) == lax_form(operand) for v in values)
+        case "equalsExact":
+            return operand in values
+        case "startsWithField" | "startsWithTerm":
+            return any(lax_form(v).startswith(lax_form(operand)) for v in values)
+        case "contains":
+            return any(operand.casefold() in v.casefold() for v in values)
+        case "greater":
+            return any(_number(v) > _number(operand) for v in values)
+        case "less":
+            return any(_number(v) < _number(operand) for v in values)
+        case "isNotBlank":
+            return any(v.strip() for v in values)
+        case "isBlank":
+            return not any(v.strip() for v in values)
+    raise ValueError(f"Unknown operator '{op}'")
+
+
+def _sort_key(ID: int, itemN: etree._Element, path: str) -> tuple:
+    values = _field_values(ID, itemN, path)
+    if not values:
+        return (0, 0, "")
+    return (1, _number(values[0]), values[0])
+
+
+def _number(text: str) -> float:
+    m = re.match(r"\s*(-?\d+(\.\d+)?)", text)
+    return float(m.group(1)) if m else 0
+
+
+def _make_handler(fake: FakeRIA):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True  # headers and body go out in two writes
+
+        def _respond(self) -> None:
+            length = int(self.headers.get("Content-Length", 0))
+            body = self.rfile.read(length) if length else b""
+            code, ctype, content = fake.handle(
+                self.command, self.path.split("?")[0], body, self.headers
+            )
+            self.send_response(code)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        do_GET = do_POST = do_PUT = _respond
+
+        def log_message(self, format, *args) -> None:
+            pass  # quiet
+
+    return Handler
@@ -0,0 +1,77 @@
+"""
+Content hashes of files, e.g. to recognize the same image under another name
+
+We use BLAKE2b from hashlib (16 bytes, 32 hex digits): it's in the standard library
+and faster than MD5 and SHA-1 on 64-bit machines. Files are read in chunks, so
+memory stays constant; alternatively the file is mapped into memory (use_mmap),
+which saves copying the data for big local files.
+
+    h = file_hash(Path("VII c 123 a.tif"))
+    for path, h in hash_files(paths):  # on a process pool
+        ...
+
+hash_files yields the results in the order of paths; if a file can't be read, its
+hash is None.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import hashlib
+import mmap
+from pathlib import Path
+from typing import Iterable, Iterator
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_hash(
+    path: str | Path, *, chunk_size: int = CHUNK_SIZE, use_mmap: bool = False
+) -> str:
+    """
+    Returns the BLAKE2b hash of the file's content as hex string.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        if use_mmap:
+            try:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    h.update(mm)
+                return h.hexdigest()
+            except ValueError:  # empty files can't be mapped
+                pass
+        while chunk := f.read(chunk_size):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def hash_files(
+    paths: Iterable[str | Path],
+    *,
+    workers: int | None = None,
+    use_mmap: bool = False,
+) -> Iterator[tuple[Path, str | None]]:
+    """
+    Hash many files on a process pool (default: one process per CPU). Yields
+    (path, hash) in the order of paths.
+    """
+    paths = [Path(p) for p in paths]
+    if not paths:
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        hashes = executor.map(
+            partial(_try_file_hash, use_mmap=use_mmap), paths, chunksize=8
+        )
+        yield from zip(paths, hashes)
+
+
+#
+# private
+#
+
+
+def _try_file_hash(path: Path, *, use_mmap: bool) -> str | None:
+    try:
+        return file_hash(path, use_mmap=use_mmap)
+    except OSError as e:
+        print(f"WARNING: can't hash {path}: {e}")
+        return None
@@ -6,16 +6,42 @@ Functions for dealing with identNrs originating from strings or paths.
 e.g.
 - extractIdentNr: extracts IdentNr from path/filename
 - is_suspicious: check if filename is suspicious or not
+- parse_many: extractIdentNr for many paths, on a process pool for big directories
 
 Reoccuring logic that doesn't interface Excel and the RIA API. Reocurring Excel stuff goes
 into BaseApp.py. Reoccuring API stuff goes into RIA.py. Perhaps I will find a better name
 for this package.
+
+The regular expressions are compiled once when the module is loaded; re's own cache
+is small and costs a lookup per call. The EM parser remembers its results for the
+filename without the -A/-KK tail, so that the variants of one object (VII c 123 -A,
+-B ...) are parsed only once.
 """
 
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+import os
 from pathlib import Path
 import re
+from typing import Iterable, Iterator
 from MpApi.Utils.Xls import ConfigError
 
+# parse_many uses a process pool from this many paths on; below, starting the
+# processes costs more than it saves
+POOL_THRESHOLD = 50_000
+
+ALLOWED = re.compile(r"([()\w\d +.,<>-]+)")
+BRACKET_IN_WORD = re.compile(r"\w+\(|\)\w+")
+DOUBLE_SPACE_TAIL = re.compile(r"([()\w\d +.,<>-]+)  ")
+KK_TAIL = re.compile(r"([\w ,.-]+)\w*-KK")
+LETTERS = re.compile(r"[a-zA-Z]+")
+NUMBER = re.compile(r"\d+")
+PART = re.compile("[a-z]+|[a-z]+-[a-z]+|[a-z],[a-z]")
+PART_CHARS = re.compile(r"[()a-zA-Z1-9,-,+]")
+SPACES = re.compile(r"\s{2,}")
+TAIL = re.compile(r"-[A-Z]+")  # -KK -A ... -ZZ
+UNDERLINE_TAIL = re.compile(r"([()\w\d +.,<>-]+) *_+")  # ___-A
+
 
 class identNrParserError(Exception): ...
 
@@ -74,7 +100,7 @@ def fortlaufende_Nummer_pos(identNr: str) -> int:
 
     alist = identNr.split(" ")
     for c, elem in enumerate(alist):
-        if re.fullmatch(r"\d+", alist[c]):
+        if NUMBER.fullmatch(alist[c]):
             return c
     raise identNrParserError("fortlaufende Nummer not found")
 
@@ -93,7 +119,7 @@ def has_parts(identNr: str) -> bool:
     parts = identNr.split(" ")
     if "<" in parts[-1] and ">" in parts[-1]:
         parts.pop()
-    if re.search("[a-z]+|[a-z]+-[a-z]+|[a-z],[a-z]", parts[-1]):
+    if PART.search(parts[-1]):
         return True
     return False
 
@@ -122,7 +148,7 @@ def is_suspicious(identNr: str | None) -> bool:
     # has to have at least one number component
     any_number = False
     for part in partsL:
-        if re.match(r"\d+", part):
+        if NUMBER.match(part):
             any_number = True
     if not any_number:
         # print(f"'{identNr}' not any number")
@@ -136,7 +162,7 @@ def is_suspicious(identNr: str | None) -> bool:
     #        return True
 
     # may not have >2 consecutive spaces
-    if re.search(r"\s{2,}", identNr):
+    if SPACES.search(identNr):
         # print(f"'{identNr}' 2+ white space")
         return True
 
@@ -147,7 +173,7 @@ def is_suspicious(identNr: str | None) -> bool:
             return True
 
     # may not have brackets with inside space ( ex )
-    if re.search(r"\w+\(|\)\w+", identNr):
+    if BRACKET_IN_WORD.search(identNr):
         return True
 
     # may not have suspicious characters
@@ -177,7 +203,7 @@ def parse_AKu(path: Path) -> str:
     # split off end with _{2+} IV-AKu-000059___1.tif
     some_stem = path.stem.split("_")[0].strip()
     # replace - with /
-    some_stem2 = re.sub("-", "/", some_stem)
+    some_stem2 = some_stem.replace("-", "/")
     print(f"parse_AKu: {some_stem} -> {some_stem2}")
     return some_stem2
 
@@ -196,6 +222,8 @@ def parse_EM(path: Path) -> str:
 
     New:
     - Used to return None on failure; now: raises error
+    - Results are cached for the filename without tail (see _parse_EM_cut), so
+      messages are only printed the first time.
 
     TODO:
     - should we raise error on failure instead of returning None?
@@ -205,99 +233,39 @@ def parse_EM(path: Path) -> str:
     std_form = standardform(path=path)
 
     # has to have a number
-    if not re.search(r"\d+", std_form):
+    if not NUMBER.search(std_form):
         # number can be sole item e.g. if objId is used as identNr
         return None
 
     # try to restrict to max length of elements 5 or 4 elements
 
     # STEP 3: cut off obvious tails
-    astr = re.split(r"-[A-Z]+", std_form)[0].strip()  # -KK -A ... -ZZ
+    astr = TAIL.split(std_form)[0].strip()
+    return _parse_EM_cut(astr)
 
-    # print(f"***hyphen {astr}")
-    m = re.search(r"([()\w\d +.,<>-]+) *_+", astr)  # ___-A
-    if m:
-        astr = m.group(1).strip()
 
-    # double space: why is this necessary? " *" should catch it already.
-    m = re.search(r"([()\w\d +.,<>-]+)  ", astr)
-    if m:
-        astr = m.group(1).strip()
-    # there are 5k+ records with brackets in IdentNr
-    # although I dont know what that means
-    # e.g. IV Ca 3159 (17)
-    # m = re.search(r"([\w\d +.,<>-]+)\(\w+\)", astr) # brackets
-    # if m:
-    #    astr = m.group(1).strip()
-
-    # print(f"***with tail cut '{astr}'")
-    alist = astr.split(" ")
-    pos = fortlaufende_Nummer_pos(astr)
-    # print(f"***{pos=} {alist}")
-    if len(alist) >= pos + 2:
-        # 2+ items after fortlaufende Nr.
-        plus_one = alist[pos + 1]
-        # print("***LONG FORM")
-        # print(f"{plus_one=} {len(plus_one)}")
-        if re.search(r"[()a-zA-Z1-9,-,+]", plus_one):  # ()
-            if plus_one == "(P":  # falsche P-Nr
-                new = " ".join(alist[0 : pos + 1])
-            elif plus_one in ("A", "B", "C"):
-                new = " ".join(alist[0 : pos + 3])
-                # print(f"******************{alist=}")
-            elif len(plus_one) <= 5:
-                # print(f"***part recognized '{plus_one}'")
-                new = " ".join(alist[0 : pos + 2])
-            else:
-                # print(f"***part NOT recognized '{plus_one}'")
-                new = " ".join(alist[0 : pos + 1])
-        else:
-            print(f"***part NOT recognized '{plus_one}'")
-            new = " ".join(alist[0 : pos + 1])
-    else:
-        # print("SHORT FORM")
-        new = " ".join(alist)
-
-    # STEP 4: special cases
-    if astr.startswith("I MV"):
-        print(f"**Special case Akten '{astr}'")
-        # adding a magic slash.
-        # It's magic because we're adding a char that doesn't exist in origin
-        # some have different length I/MV 0950 a
-        alist[0] = "I/MV"
-        alist.pop(1)
-        print(f"***{alist} len:{len(alist)}")
-        if len(alist) == 2:
-            print("astr has only two parts")
-            return " ".join(alist)
-        elif len(alist) > 2:
-            if re.search(r"[a-zA-Z]+", alist[2]):
-                print("***valid part")
-                new = " ".join(alist[0:3])
-            elif re.search(r"\d+", alist[2]):
-                print("***digit for disamb")
-                # we allow diaamb only when no part
-                alist[2] = f"<{alist[2]}>"
-                new = " ".join(alist[0:3])
-            else:
-                new = " ".join(alist[0:2])
-        else:  # if alist has 0 items
-            raise identNrParserError(f"Unusual number of items {len(alist)}")
-    elif astr.startswith("Verz BGAEU"):
-        # add a magic dot
-        new = re.sub("Verz BGAEU", "Verz. BGAEU", new)
-    elif astr.startswith("EJ ") or astr.startswith("Inv "):
-        # not catching __0001 correctly...
-        new = " ".join(alist[0:2])
-    elif astr.startswith("Adr (EJ)"):
-        new = " ".join(alist[0:3])
-    # elif astr.startswith("VIII "):
-    #    new = _parse_EM_photo(astr)
-    elif astr.startswith("I C "):
-        new = astr.split(" mit ")[0]
-    # print (f"{new=}")
+def parse_many(
+    paths: Iterable[Path], *, parser: str, workers: int | None = None
+) -> Iterator[tuple[Path, str | None]]:
+    """
+    extractIdentNr for many paths. Yields (path, identNr) in the order of paths;
+    identNr is None if the parser couldn't find one (identNrParserError).
 
-    return new
+    workers: number of processes; by default one per CPU if there are at least
+    POOL_THRESHOLD paths, otherwise the paths are parsed here. 1 to never use a
+    process pool.
+    """
+    paths = list(paths)
+    if workers is None:
+        workers = (os.cpu_count() or 1) if len(paths) >= POOL_THRESHOLD else 1
+    parse = partial(_try_extractIdentNr, parser=parser)
+    if workers == 1:
+        for path in paths:
+            yield path, parse(path)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunksize = max(1, len(paths) // (workers * 4))
+        yield from zip(paths, executor.map(parse, paths, chunksize=chunksize))
 
 
 def extract_weitereNr(path: Path) -> str | None:
@@ -328,7 +296,7 @@ def parse_old(path: Path) -> str | None:
     stem = str(path).split(".")[0]
     # stem = path.stem # assuming there is only one suffix
     # print (stem)
-    m = re.search(r"([\w ,.-]+)\w*-KK", stem)
+    m = KK_TAIL.search(stem)
     # print (m)
     if m:
         return m.group(1)
@@ -346,10 +314,10 @@ def standardform(path: Path) -> str:
     stem = path.stem  # everything before the _last_ .suffix.
 
     # STEP 1: collapse underlines into space
-    stem2 = re.sub("_", " ", stem)
+    stem2 = stem.replace("_", " ")
 
     # STEP 2: allowed characters
-    m = re.search(r"([()\w\d +.,<>-]+)", stem2)
+    m = ALLOWED.search(stem2)
 
     # What is maximum number of elements in EM?
     # VII ME 01234 a-c <1>: category, unit, number, part, disamb:
@@ -384,6 +352,99 @@ def whole_for_parts(identNr: str) -> str:
 #
 
 
+@lru_cache(maxsize=100_000)
+def _parse_EM_cut(astr: str) -> str:
+    """
+    The second half of parse_EM: gets the standardform without -A/-KK tail and
+    returns the identNr.
+    """
+    # print(f"***hyphen {astr}")
+    # the searches backtrack a lot; only try them if they can match
+    m = UNDERLINE_TAIL.search(astr) if "_" in astr else None
+    if m:
+        astr = m.group(1).strip()
+
+    # double space: why is this necessary? " *" should catch it already.
+    m = DOUBLE_SPACE_TAIL.search(astr) if "  " in astr else None
+    if m:
+        astr = m.group(1).strip()
+    # there are 5k+ records with brackets in IdentNr
+    # although I dont know what that means
+    # e.g. IV Ca 3159 (17)
+    # m = re.search(r"([\w\d +.,<>-]+)\(\w+\)", astr) # brackets
+    # if m:
+    #    astr = m.group(1).strip()
+
+    # print(f"***with tail cut '{astr}'")
+    alist = astr.split(" ")
+    pos = fortlaufende_Nummer_pos(astr)
+    # print(f"***{pos=} {alist}")
+    if len(alist) >= pos + 2:
+        # 2+ items after fortlaufende Nr.
+        plus_one = alist[pos + 1]
+        # print("***LONG FORM")
+        # print(f"{plus_one=} {len(plus_one)}")
+        if PART_CHARS.search(plus_one):  # ()
+            if plus_one == "(P":  # falsche P-Nr
+                new = " ".join(alist[0 : pos + 1])
+            elif plus_one in ("A", "B", "C"):
+                new = " ".join(alist[0 : pos + 3])
+                # print(f"******************{alist=}")
+            elif len(plus_one) <= 5:
+                # print(f"***part recognized '{plus_one}'")
+                new = " ".join(alist[0 : pos + 2])
+            else:
+                # print(f"***part NOT recognized '{plus_one}'")
+                new = " ".join(alist[0 : pos + 1])
+        else:
+            print(f"***part NOT recognized '{plus_one}'")
+            new = " ".join(alist[0 : pos + 1])
+    else:
+        # print("SHORT FORM")
+        new = " ".join(alist)
+
+    # STEP 4: special cases
+    if astr.startswith("I MV"):
+        print(f"**Special case Akten '{astr}'")
+        # adding a magic slash.
+        # It's magic because we're adding a char that doesn't exist in origin
+        # some have different length I/MV 0950 a
+        alist[0] = "I/MV"
+        alist.pop(1)
+        print(f"***{alist} len:{len(alist)}")
+        if len(alist) == 2:
+            print("astr has only two parts")
+            return " ".join(alist)
+        elif len(alist) > 2:
+            if LETTERS.search(alist[2]):
+                print("***valid part")
+                new = " ".join(alist[0:3])
+            elif NUMBER.search(alist[2]):
+                print("***digit for disamb")
+                # we allow diaamb only when no part
+                alist[2] = f"<{alist[2]}>"
+                new = " ".join(alist[0:3])
+            else:
+                new = " ".join(alist[0:2])
+        else:  # if alist has 0 items
+            raise identNrParserError(f"Unusual number of items {len(alist)}")
+    elif astr.startswith("Verz BGAEU"):
+        # add a magic dot
+        new = new.replace("Verz BGAEU", "Verz. BGAEU")
+    elif astr.startswith("EJ ") or astr.startswith("Inv "):
+        # not catching __0001 correctly...
+        new = " ".join(alist[0:2])
+    elif astr.startswith("Adr (EJ)"):
+        new = " ".join(alist[0:3])
+    # elif astr.startswith("VIII "):
+    #    new = _parse_EM_photo(astr)
+    elif astr.startswith("I C "):
+        new = astr.split(" mit ")[0]
+    # print (f"{new=}")
+
+    return new
+
+
 def _parse_EM_photo(astr: str) -> str | None:
     """
     receives a version of a filename as str and returns identNr or None. The filename
@@ -415,3 +476,10 @@ def _parse_EM_photo(astr: str) -> str | None:
             # default VIII NA 1234
             new = " ".join(alist[0:3])
     return new
+
+
+def _try_extractIdentNr(path: Path, *, parser: str) -> str | None:
+    try:
+        return extractIdentNr(path=path, parser=parser)
+    except identNrParserError:
+        return None
@@ -11,31 +11,47 @@ from datetime import datetime
 from mpapi.constants import get_credentials
 from MpApi.Utils.BaseApp import BaseApp
 from MpApi.Utils.Ria import RIA
+from MpApi.Utils.Snapshot import Snapshot
 from MpApi.Utils.Xls import Xls, ConfigError
+from MpApi.Utils.walker import FileEntry, walk
 from openpyxl.styles import Font
 from pathlib import Path
 import re
+import requests
 import shutil
 from tqdm import tqdm
 
 excel_fn = Path("mover.xlsx")
+snapshot_fn = Path(".mover.snapshot.sqlite")  # dot file, so scandir ignores it
 red = Font(color="FF0000")
 # parser = etree.XMLParser(remove_blank_text=True)
 teal = Font(color="008080")
 
 
 class Mover(BaseApp):
-    def __init__(self, *, limit: int = -1):
+    def __init__(
+        self, *, limit: int = -1, cache: bool = True, clear_cache: bool = False
+    ):
         """
         breaks the go loop after number of items
         limit counts rows in Excel file, so limit < 3 is meaningless
+        cache: use and fill the on-disk cache of RIA lookups (see IdentNr_Cache.py)
+        clear_cache: forget all cached lookups before we start
         """
         self.limit = self._init_limit(limit)
         user, pw, baseURL = get_credentials()
-        self.client = RIA(baseURL=baseURL, user=user, pw=pw)
+        self.client = RIA(
+            baseURL=baseURL,
+            user=user,
+            pw=pw,
+            cache=self._init_cache(
+                excel_fn=excel_fn, cache=cache, clear_cache=clear_cache
+            ),
+        )
 
         self.xls = Xls(path=excel_fn, description=self.desc())
         self.wb = self.xls.get_or_create_wb()
+        self.fn_exists_prefetch: dict[tuple, set] = {}
 
     def desc(self) -> dict:
         desc = {
@@ -165,25 +181,58 @@ class Mover(BaseApp):
         """
         I dont want to fill in targetpath if move != x
         Now, I do want to fill in targetpath if move != x
+
+        Re-runs only look at files that are new or have changed since the last
+        scandir (see Snapshot.py), and at unchanged files whose rows have been
+        deleted by hand. Rows of files that are gone are dropped, unless the file
+        has been moved already.
         """
         # check if excel exists, has the expected shape and is writable
         self._check_scandir()
         print(f"   filemask: {self.filemask}")
+        if self.use_fn_index:
+            # we look up filenames with and without orgUnit, so we need all of them
+            self.client.prefetch_filenames(orgUnit=None)
 
-        c = self.xls.real_max_row(sheet=self.ws) + 1  # should at least be 3
         IGNORE = False
-        with tqdm(total=self.xls.real_max_row(sheet=self.ws), unit=" files") as pbar:
-            for p in Path().glob(self.filemask):
+        pending: list[tuple[Path, int]] = []  # new files not yet written to Excel
+        entries: dict[Path, FileEntry] = {}  # for the snapshot
+        batch_size = 100
+        # only new and changed files since the last scandir
+        snapshot = Snapshot(path=snapshot_fn, filemask=self.filemask)
+        changes = snapshot.diff(
+            walk(
+                filemask=self.filemask,
+                ignore_names=(str(excel_fn),),
+                ignore_suffixes=(".lnk",),
+            )
+        )
+        print(
+            f"   {len(changes.added)} new, {len(changes.changed)} changed, "
+            f"{len(changes.removed)} gone, {len(changes.unchanged)} unchanged files"
+        )
+        self._drop_gone(changes.removed, snapshot=snapshot)
+        todo = changes.added + changes.changed
+        if changes.unchanged:
+            # rows that have been deleted in Excel to re-index the file
+            known = self._known_fullpaths()
+            todo += [
+                f for f in changes.unchanged if str(f.path.absolute()) not in known
+            ]
+
+        def scan_batch() -> None:
+            # the snapshot only gets files whose rows have been written
+            for p, c in self._scan_batch(pending):
+                snapshot.record(entries.pop(p))
+
+        c = self.xls.real_max_row(sheet=self.ws) + 1  # should at least be 3
+        with tqdm(total=len(todo), unit=" files") as pbar:
+            for f in todo:
+                p = f.path
                 # print(f"S{p}")
                 p_abs = p.absolute()
                 p_abs_str = str(p_abs)
-                if p.name.startswith(".") or p.name.startswith("~") or p == excel_fn:
-                    continue
-                elif p.suffix in (".lnk"):
-                    continue
-                elif p.is_dir():
-                    continue
-                elif p.name.lower() == "thumbs.db" or p.name.lower() == "desktop.ini":
+                if p.name.startswith("~"):
                     continue
                 if self.exclude_dirs is not None:
                     IGNORE = False
@@ -195,6 +244,7 @@ class Mover(BaseApp):
                             break
                 if not IGNORE:
                     if self.xls.path_exists(path=p_abs, cno=7, sheet=self.ws):
+                        snapshot.record(f)
                         # print(f"ff {p_abs.name}")
                         try:
                             pbar.update()
@@ -202,24 +252,34 @@ class Mover(BaseApp):
                             self.xls.request_shutdown()
                     else:
                         # print("new path")
-                        try:
-                            self._scan_per_file(path=p, count=c)
-                        except KeyboardInterrupt:
-                            self.xls.request_shutdown()
+                        # new files are processed in batches, so that we can
+                        # look them up in RIA in parallel
+                        pending.append((p, c))
+                        entries[p] = f
+                        if len(pending) >= batch_size:
+                            scan_batch()
                     if self.limit == c:
                         print("* Limit reached")
                         break
                     c += 1
                     if c % 1000 == 0:  # save every so often
+                        scan_batch()
                         self.xls.save_if_change()
+                if self.xls.shutdown_requested:
+                    scan_batch()
                 self.xls.shutdown_if_requested()
+        scan_batch()
         self.xls.backup()
+        self.client.stats.write(path=self.xls.path)
         self.xls.save()
+        snapshot.commit()  # only now that the Excel file has been saved
+        snapshot.close()
         print("Scanning done")
 
     def wipe(self):
         self._check_move()
         self.xls.wipe(sheet=self.ws)
+        snapshot_fn.unlink(missing_ok=True)  # next scandir starts from scratch
         self.xls.backup()
         # self.xls.save()
 
@@ -242,6 +302,7 @@ class Mover(BaseApp):
         # we can't have this check
         # self.xls.raise_if_content(sheet=self.ws)
         self.orgUnit = self.xls.get_conf(cell="B2")  # can be None
+        self.use_fn_index = self.xls.get_conf_true(cell="B6")
 
         conf_ws = self.wb["Conf"]
         if conf_ws["B1"].value is None:
@@ -277,9 +338,37 @@ class Mover(BaseApp):
             "C4": """Mehrere Verzeichnisse durch ; trennen. Angegebene Verzeichnisse werden ignoriert.""",
             "A5": "Erstellungsdatum",
             "B5": datetime.today().strftime("%Y-%m-%d"),
+            "A6": "Dateinamen-Index?",
+            "B6": "False",
+            "C6": """Wenn True lädt scandir einmal alle Dateinamen der Assets aus RIA, statt für jede Datei einzeln nachzufragen. Lohnt sich für sehr viele Dateien.""",
         }
         self.xls.make_conf(conf)
 
+    def _drop_gone(self, paths: list[str], *, snapshot: Snapshot) -> None:
+        """
+        For files that have disappeared since the last scandir: drop their rows
+        from the Excel, unless they have been moved already, and forget them.
+        """
+        fullpath_cno = self.xls.colmap()["fullpath"]
+        rnos = list()
+        for path in paths:
+            rno = self.xls.path_exists(
+                path=str(Path(path).absolute()), cno=fullpath_cno, sheet=self.ws
+            )
+            if rno is not None:
+                cells = self.xls._rno2dict(rno, sheet=self.ws)
+                if cells["moved"].value != "x":
+                    print(f"   gone: {path}")
+                    rnos.append(rno)
+            snapshot.forget(path)
+        self.xls.drop_rows(sheet=self.ws, rnos=rnos)
+
+    def _known_fullpaths(self) -> set[str]:
+        """
+        Returns the full paths of all files in the Excel list.
+        """
+        return {cells["fullpath"].value for cells, rno in self.xls.loop(sheet=self.ws)}
+
     def _move(self, fro: Path, to: Path, rno: int, c: dict) -> None:
         """
         Copy file at fro to the path at to, make directories at target and write success
@@ -318,6 +407,60 @@ class Mover(BaseApp):
         else:
             self._warning(f"F{rno}", "does not exist (anymore)")
 
+    def _prefetch_fn_exists(self, paths: list[Path]) -> None:
+        """
+        Look up the mulIds for the filenames of a batch of files with parallel requests
+        and keep the results in self.fn_exists_prefetch. We need two lookups per
+        file: one without and one with orgUnit.
+        """
+        if self.client.fn_index is not None:
+            return  # fn_to_mulId answers from the filename index
+        names = list(
+            dict.fromkeys(p.name for p in paths if not self.is_suspicious(p.name))
+        )
+        orgUnits = [None]
+        if self.orgUnit is not None:
+            orgUnits.append(self.orgUnit)
+        jobs = [
+            {"fn": name, "orgUnit": orgUnit} for name in names for orgUnit in orgUnits
+        ]
+        results = self.client.run_many(self.client.fn_to_mulId, jobs)
+        for job, idL in zip(jobs, results):
+            self.fn_exists_prefetch[(job["fn"], job["orgUnit"])] = idL
+
+    def _fn_to_mulId(self, fn: str, orgUnit: str | None) -> set:
+        """
+        fn_to_mulId, but use the prefetched result if there is one.
+        """
+        if (fn, orgUnit) in self.fn_exists_prefetch:
+            return self.fn_exists_prefetch.pop((fn, orgUnit))
+        return self.client.fn_to_mulId(fn=fn, orgUnit=orgUnit)
+
+    def _scan_batch(self, pending: list[tuple[Path, int]]) -> list[tuple[Path, int]]:
+        """
+        Write a batch of new files (path, row number) to Excel after looking them up in
+        RIA in parallel. Empties the pending list and returns the files that have
+        been written (all, unless interrupted).
+        """
+        written: list[tuple[Path, int]] = []
+        if not pending:
+            return written
+        try:
+            try:
+                self._prefetch_fn_exists([p for p, c in pending])
+            except requests.RequestException as e:
+                # the files look themselves up below, so we get as far as we would
+                # one file at a time
+                print(f"WARNING: prefetch failed: {e}")
+            for p, c in pending:
+                self._scan_per_file(path=p, count=c)
+                written.append((p, c))
+        except KeyboardInterrupt:
+            self.xls.request_shutdown()
+        pending.clear()
+        self.fn_exists_prefetch.clear()
+        return written
+
     def _scan_per_file(self, *, path: Path, count: int) -> None:
         """
         Writes to self.ws
@@ -361,7 +504,7 @@ class Mover(BaseApp):
                 c["fn_exists_orgUnit"].value = "None"
                 c["fn_exists_orgUnit"].font = red
                 return
-            idL = self.client.fn_to_mulId(fn=path.name, orgUnit=None)
+            idL = self._fn_to_mulId(path.name, None)
             if len(idL) == 0:
                 c["fn_exists"].value = "None"
             else:
@@ -374,7 +517,7 @@ class Mover(BaseApp):
                     c["fn_exists_orgUnit"].value = "None"
                     c["fn_exists_orgUnit"].font = red
                     return
-                idL = self.client.fn_to_mulId(fn=path.name, orgUnit=self.orgUnit)
+                idL = self._fn_to_mulId(path.name, self.orgUnit)
                 if len(idL) == 0:
                     c["fn_exists_orgUnit"].value = "None"
                 else:
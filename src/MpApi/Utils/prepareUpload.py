@@ -81,12 +81,15 @@ from lxml import etree
 from mpapi.constants import get_credentials
 from MpApi.Utils.BaseApp import BaseApp
 from MpApi.Utils.identNr import IdentNrFactory
+from MpApi.Utils.IdentNr_Index import index_fn as ident_index_fn
 from MpApi.Utils.logic import extractIdentNr, extract_weitereNr, not_suspicious
 from MpApi.Utils.Ria import RIA
 from MpApi.Utils.Xls import Xls
+from MpApi.Utils.walker import walk
 from mpapi.module import Module
 from openpyxl.styles import Alignment, Font
 from pathlib import Path
+import requests
 
 red = Font(color="FF0000")
 
@@ -96,9 +99,18 @@ class PrepareUpload(BaseApp):
         self,
         *,
         limit: int = -1,
+        cache: bool = True,
+        clear_cache: bool = False,
     ) -> None:
         user, pw, baseURL = get_credentials()
-        self.client = RIA(baseURL=baseURL, user=user, pw=pw)
+        self.client = RIA(
+            baseURL=baseURL,
+            user=user,
+            pw=pw,
+            cache=self._init_cache(
+                excel_fn="prepare.xlsx", cache=cache, clear_cache=clear_cache
+            ),
+        )
         print(f"Logged in as '{user}'")
         self.limit = self._init_limit(limit)
         print(f"Using limit {self.limit}")
@@ -111,6 +123,8 @@ class PrepareUpload(BaseApp):
         self.wb = self.xls.get_or_create_wb()
         self.ws = self.xls.get_or_create_sheet(title="Prepare")
         self.fortlaufendeNr = 0  # for weitere_nr to create new identNrs
+        self.objIds_prefetch: dict[str, str] = {}  # filled by _prefetch_objIds
+        self.mulIds_prefetch: dict[str, set] = {}  # filled by _prefetch_mulIds
 
     #
     # public
@@ -124,6 +138,10 @@ class PrepareUpload(BaseApp):
         (c) based on this information, fill in the candidate cell
         """
         self.xls.raise_if_no_content(sheet=self.ws)
+        if self.xls.get_conf_true(cell="B8"):
+            self.client.prefetch_identNrs(orgUnit=self.xls.get_conf(cell="B2"))
+        self._prefetch_objIds()
+        self._prefetch_mulIds()
         for cells, rno in self.xls.loop(sheet=self.ws, limit=self.limit):
             if cells["assetUploaded"] is not None and cells["identNr"] is not None:
                 self.mode = "ff"
@@ -140,6 +158,7 @@ class PrepareUpload(BaseApp):
                 # self._save_excel(path=self.excel_fn)
                 self.xls.save_if_change()
         self.xls.save_if_change()  # _save_excel(path=self.excel_fn)
+        self.client.stats.write(path=self.xls.path)
 
     def create_objects(self) -> None:
         """
@@ -179,6 +198,7 @@ class PrepareUpload(BaseApp):
                         # save almost immediately since likely to die
                         self.xls.save_if_change()
         self.xls.save_if_change()
+        self.client.stats.write(path=self.xls.path)
 
     def desc(self) -> dict:
         desc = {
@@ -274,8 +294,6 @@ class PrepareUpload(BaseApp):
         c = 3  # start writing in 3rd line
         print(f"FILEMASK {self.filemask}, starting scan...")
         ignore_names = (
-            "thumbs.db",
-            "desktop.ini",
             "prepare.ini",
             "prepare.log",
             "prepare.xlsx",
@@ -283,13 +301,8 @@ class PrepareUpload(BaseApp):
         file_list = list()
         src_dir = Path()  # Path(self.conf["src_dir"])
         print(f"* Scanning source dir: {src_dir}")
-        for path in src_dir.glob(self.filemask):
-            if path.is_dir():
-                continue
-            if path.name.startswith("."):
-                continue
-            if path.name.lower().strip() in ignore_names:
-                continue
+        for f in walk(src_dir, filemask=self.filemask, ignore_names=ignore_names):
+            path = f.path
             if self.xls.path_exists(path=path.absolute(), cno=8, sheet=self.ws):
                 # if absolute path is already in Excel ignore it
                 # only works again since 18.5.2025
@@ -348,7 +361,11 @@ class PrepareUpload(BaseApp):
         orgUnit = self.xls.get_conf(cell="B2")  # can return None
         if c["assetUploaded"].value == None:
             self.xls.set_change()
-            idL = self.client.fn_to_mulId(fn=c["filename"].value, orgUnit=orgUnit)
+            fn = c["filename"].value
+            if fn in self.mulIds_prefetch:
+                idL = self.mulIds_prefetch[fn]
+            else:
+                idL = self.client.fn_to_mulId(fn=fn, orgUnit=orgUnit)
             if len(idL) == 0:
                 c["assetUploaded"].value = "None"
             else:
@@ -367,6 +384,8 @@ class PrepareUpload(BaseApp):
         self.filemask = self.xls.get_conf_required(cell="B3")
         print(f"Using filemask {self.filemask}")
         self.xls.raise_if_no_content(sheet=self.ws)
+        # we're about to create new objects, so a saved identNr index gets outdated
+        ident_index_fn.unlink(missing_ok=True)
 
     def _check_scandir(self) -> None:
         self.xls.raise_if_not_initialized(sheet=self.ws)
@@ -400,6 +419,9 @@ class PrepareUpload(BaseApp):
             )
             # logging.info(f"new record created: object {new_id} with {identNr} from template")
             objIds.add(new_id)
+            # cached lookups that could find this identNr are outdated now
+            self.client.invalidate_cache(kind="objIds", key=identNr)
+            self.client.invalidate_cache(kind="startswith", key=identNr)
         objIds_str = "; ".join(str(objId) for objId in objIds)
         return objIds_str
 
@@ -440,6 +462,8 @@ class PrepareUpload(BaseApp):
         orgUnit = self.xls.get_conf(cell="B2")  # can return None
         for single in identNr.split(";"):
             ident = single.strip()
+            if strict and ident in self.objIds_prefetch:
+                return self.objIds_prefetch[ident]
             objIdL = self.client.identNr_exists(
                 nr=ident, orgUnit=orgUnit, strict=strict
             )
@@ -491,6 +515,12 @@ class PrepareUpload(BaseApp):
             "A4": "IdentNr Parser",
             "B4": "EM",
             "C4": "Welcher Logarithmus zum Parsen von Dateinamen in identNrn soll verwendet werden? (EM, AKu)",
+            "A7": "Dateinamen-Index?",
+            "B7": "False",
+            "C7": """Wenn True lädt checkria einmal alle Dateinamen der Assets der orgUnit aus RIA, statt für jede Datei einzeln nachzufragen.""",
+            "A8": "IdentNr-Index?",
+            "B8": "False",
+            "C8": """Wenn True lädt checkria einmal alle IdentNrn der Objekte der orgUnit aus RIA, statt für jede IdentNr einzeln nachzufragen.""",
         }
 
         if conf is not None:
@@ -605,6 +635,54 @@ class PrepareUpload(BaseApp):
                 c["partsObjIds"].value = "None"
             c["partsObjIds"].alignment = Alignment(wrap_text=True)
 
+    def _prefetch_mulIds(self) -> None:
+        """
+        Look up the mulIds for all filenames that _asset_exists_already will need.
+        It's still one request per filename, but the requests run in parallel (see
+        RIA.run_many). Results are saved in self.mulIds_prefetch.
+
+        If the filename index is switched on (conf B7), we load all filenames of the
+        orgUnit at once instead.
+        """
+        orgUnit = self.xls.get_conf(cell="B2")  # can return None
+        if self.xls.get_conf_true(cell="B7"):
+            self.client.prefetch_filenames(orgUnit=orgUnit)
+            return  # fn_to_mulId answers from the filename index
+        fnL = list()
+        for c, rno in self.xls.loop(sheet=self.ws, limit=self.limit):
+            fn = c["filename"].value
+            if c["assetUploaded"].value is None and fn is not None:
+                fnL.append(fn)
+        fnL = list(dict.fromkeys(fnL))  # distinct
+        if fnL:
+            print(f"* Prefetching mulIds for {len(fnL)} filenames")
+            jobs = [{"fn": fn, "orgUnit": orgUnit} for fn in fnL]
+            try:
+                results = self.client.run_many(self.client.fn_to_mulId, jobs)
+            except requests.RequestException as e:
+                # _asset_exists_already looks up the rows one at a time then
+                print(f"WARNING: prefetch failed: {e}")
+                return
+            self.mulIds_prefetch = dict(zip(fnL, results))
+
+    def _prefetch_objIds(self) -> None:
+        """
+        Look up the objIds for all identNrs that checkria will need in a few batched
+        queries instead of one query per row. Results are saved in
+        self.objIds_prefetch and used by _get_objIds.
+        """
+        orgUnit = self.xls.get_conf(cell="B2")  # can return None
+        identNrs = list()
+        for c, rno in self.xls.loop(sheet=self.ws, limit=self.limit):
+            if c["identNr"].value is not None and c["objIds"].value is None:
+                # _get_objIds only looks at the first identNr
+                identNrs.append(str(c["identNr"].value).split(";")[0].strip())
+        if identNrs:
+            print(f"* Prefetching objIds for {len(identNrs)} identNrs")
+            self.objIds_prefetch = self.client.get_objIds_many(
+                identNrs=identNrs, strict=True, orgUnit=orgUnit
+            )
+
     def _scan_per_row(
         self, *, c: int, path: Path, known_idents: set, known_weitere_nr: set
     ) -> None:
@@ -627,6 +705,7 @@ class PrepareUpload(BaseApp):
         if wNr is not None:
             self.ws[f"C{c}"] = wNr
         self.ws[f"I{c}"] = str(path.absolute())
+        self.xls.row_changed(sheet=self.ws, rno=c)
         self.xls.set_change()
 
         if identNr is not None:
@@ -7,11 +7,11 @@ The report is written in Excel (xlsx). It's basically a list of files with some
 """
 
 import datetime
-from MpApi.Utils.logic import extractIdentNr
+from MpApi.Utils.logic import extractIdentNr, identNrParserError
 from MpApi.Utils.BaseApp import BaseApp
 from MpApi.Utils.Xls import Xls
+from MpApi.Utils.walker import walk
 from openpyxl import worksheet
-from openpyxl.styles import Font
 from pathlib import Path
 
 # from Typing import Optional
@@ -19,74 +19,96 @@ fast = False
 
 
 class ReportX(BaseApp):
-    def __init__(self, limit=-1) -> None:
+    def __init__(self, limit=-1, parser: str = "EM") -> None:
         self.limit = int(limit)
+        self.parser = parser
+
+    def desc(self) -> dict:
+        desc = {
+            "filename": {
+                "label": "Dateiname",
+                "col": "A",
+                "width": 17,
+            },
+            "size": {
+                "label": "Größe (KB)",
+                "col": "B",
+                "width": 12,
+            },
+            "mtime": {
+                "label": "mtime",
+                "col": "C",
+                "width": 15,
+            },
+            "identNr": {
+                "label": "IdentNr?",
+                "col": "D",
+                "width": 10,
+            },
+            "relpath": {
+                "label": "rel. Verzeichnis",
+                "col": "E",
+                "width": 15,
+            },
+            "fullpath": {
+                "label": "Absoluter Pfad",
+                "col": "F",
+                "width": 50,
+            },
+        }
+        return desc
 
     def write_report(self, fn: str) -> None:
         """
         We assume that the report is empty at the beginning, loop thru all files and enter
         each one into Excel table.
+
+        The report is written in write_only mode, i.e. rows are streamed to disk as we
+        go and memory stays constant even for a million files. The flip side is that
+        the file is saved only once, at the end.
         """
-        self.xls = Xls(path=fn)
-        ws = self._init_report(path=xlsx_fn)
-        ws2 = self.wb.create_sheet("Conf")
+        self.xls = Xls(path=fn, description=self.desc(), write_only=True)
+        ws = self._init_report()
         rno = 2
         print("beginning recursive scandir")
         # probably not better if we sort it first since we potentially have to wait to long.
         # TODO: But then perhaps we should include identNr sort
-        for p in Path().rglob("*"):
-            if p.is_dir():
-                print(f" dir: {p}")
-                continue
-            elif p.name.lower() == "thumbs.db" or p.name.lower() == "desktop.ini":
-                continue
-            identNr = extractIdentNr(path=Path(p.name))
+        for f in walk(filemask="**/*", ignore_names=(Path(fn).name,)):
+            p = f.path
+            try:
+                identNr = extractIdentNr(path=Path(p.name), parser=self.parser)
+            except identNrParserError:
+                identNr = None
             print(f"   {rno}: {p} -> {identNr}")
-            ws[f"A{rno}"].value = p.name
+            values = {
+                "filename": p.name,
+                "identNr": identNr,
+                "relpath": str(p),
+                "fullpath": str(p.absolute()),
+            }
             if not fast:
-                ws[f"B{rno}"].value = int(p.stat().st_size / 1024)
-                ws[f"C{rno}"].value = p.stat().st_mtime
-            ws[f"D{rno}"].value = identNr
-            ws[f"E{rno}"].value = str(p)
-            ws[f"F{rno}"].value = str(p.absolute())
-            if (rno / 10000).is_integer():
-                # save periodically
-                self._save_excel(path=xlsx_fn)
+                values["size"] = int(f.size / 1024)
+                values["mtime"] = f.mtime
+            self.xls.append(sheet=ws, values=values)
             rno += 1
             if self.limit == rno:
                 break
-        ws2["A1"].value = "done"
-        self._save_excel(path=xlsx_fn)
+        ws2 = self.xls.get_or_create_sheet(title="Conf")
+        ws2.append(["done"])
+        self.xls.save()
 
     #
     # private
     #
 
-    def _init_report(self, *, path: Path) -> worksheet:
+    def _init_report(self) -> worksheet:
         """
-        Creates a new report and saves it in self.wb. Also returns the new first
-        worksheet.
+        Creates a new sheet in the (write_only) workbook, writes the header and
+        returns the sheet.
         """
         self.xls.raise_if_file()
-        self.wb = self.xls.get_or_create_wb()
         now = datetime.datetime.now().strftime("%Y-%m-%d")
-        ws = self.xls.get_or_create_sheet(now)
+        ws = self.xls.get_or_create_sheet(title=now)
         print(f"new sheet {now}")
-        ws["A1"] = "Dateiname"
-        ws["B1"] = "Größe (KB)"
-        ws["C1"] = "mtime"
-        ws["D1"] = "IdentNr?"
-        ws["E1"] = "rel. Verzeichnis"
-        ws["F1"] = "Absoluter Pfad"
-
-        for each in "A1", "B1", "C1", "D1", "E1", "F1":
-            ws[each].font = Font(bold=True)
-
-        ws.column_dimensions["A"].width = 17
-        ws.column_dimensions["B"].width = 12
-        ws.column_dimensions["C"].width = 15
-        ws.column_dimensions["D"].width = 10
-        ws.column_dimensions["E"].width = 15
-        ws.column_dimensions["F"].width = 50
-
+        self.xls.write_header(sheet=ws)
         return ws
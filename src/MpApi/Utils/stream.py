@@ -0,0 +1,159 @@
+"""
+Streaming parser for RIA responses
+
+Big search responses (limit=-1) can be hundreds of MB if we parse them into a Module
+(i.e. one lxml tree) at once. Instead we parse them incrementally with iterparse and
+throw away every moduleItem once we have extracted what we need. Memory use stays
+flat no matter how many records there are.
+
+    for ID, fields in iter_items(source, mtype="Object"):
+        print(ID, fields["ObjObjectNumberVrt"])
+
+source is a path or a file-like object, e.g. the raw stream of a requests response
+(see RIA.search_stream). If you pass a dict as info, it gets the totalSize of the
+module, i.e. the number of hits of a search (info["totalSize"]).
+
+For every moduleItem we yield a tuple (ID, fields) where ID is an int and fields a
+dictionary
+- with the attributes of the moduleItem as "@name", e.g. fields["@hasAttachments"]
+- with the value of every dataField, virtualField and systemField as str (if a field
+  occurs multiple times we keep the first value)
+- with a list of moduleItemIds (int) for every moduleReference
+Fields in repeatableGroups are ignored.
+
+The other way round, AttachmentBody streams a file as the xml that RIA expects for an
+attachment (the file base64 encoded in <value>), so that big files don't have to be
+read into memory before we upload them.
+
+    with open(path, "rb") as f:
+        body = AttachmentBody(f, ID=1234, name=path.name, size=path.stat().st_size)
+        session.put(url, data=body, headers={"Content-Type": "application/xml"})
+"""
+
+import base64
+from lxml import etree  # type: ignore
+from pathlib import Path
+from typing import IO, Iterator
+from xml.sax.saxutils import quoteattr
+
+NS = "http://www.zetcom.com/ria/ws/module"
+FIELDS = {f"{{{NS}}}dataField", f"{{{NS}}}virtualField", f"{{{NS}}}systemField"}
+
+
+def iter_items(
+    source: str | Path | IO[bytes], *, mtype: str, info: dict | None = None
+) -> Iterator[tuple[int, dict]]:
+    """
+    Parse a RIA response incrementally and yield (ID, fields) for every moduleItem of
+    module mtype.
+    """
+    if isinstance(source, Path):
+        source = str(source)
+    context = etree.iterparse(
+        source,
+        events=("start", "end"),
+        tag=(f"{{{NS}}}module", f"{{{NS}}}moduleItem"),
+        huge_tree=True,
+    )
+    for event, itemN in context:
+        if event == "start":
+            if (
+                info is not None
+                and itemN.tag == f"{{{NS}}}module"
+                and itemN.get("name") == mtype
+                and itemN.get("totalSize") is not None
+            ):
+                info["totalSize"] = int(itemN.get("totalSize"))
+            continue
+        if itemN.tag != f"{{{NS}}}moduleItem":
+            continue
+        moduleN = itemN.getparent()
+        # moduleItems only live inside modules; the module name tells us the type
+        if moduleN is not None and moduleN.get("name") == mtype:
+            yield int(itemN.get("id")), _item_fields(itemN)
+        # free memory: the item itself and everything before it
+        itemN.clear()
+        if moduleN is not None:
+            while itemN.getprevious() is not None:
+                del moduleN[0]
+    del context
+
+
+def _item_fields(itemN) -> dict:
+    fields: dict = {f"@{key}": value for key, value in itemN.attrib.items()}
+    for childN in itemN:
+        tag = childN.tag
+        if tag in FIELDS:
+            name = childN.get("name")
+            if name in fields:
+                continue
+            valueN = childN.find(f"{{{NS}}}value")
+            if valueN is not None:
+                fields[name] = valueN.text
+        elif tag == f"{{{NS}}}moduleReference":
+            fields[childN.get("name")] = [
+                int(refN.get("moduleItemId"))
+                for refN in childN.iterfind(f"{{{NS}}}moduleReferenceItem")
+            ]
+    return fields
+
+
+class AttachmentBody:
+    """
+    Read-only file-like object with the xml for an attachment upload, the same that
+    mpapi's updateAttachment sends. The file is read and encoded in chunks. Has a
+    length, so that requests sends a Content-Length and not a chunked body.
+    """
+
+    chunk_size = 3 * 2**16  # a multiple of 3, so the base64 chunks fit together
+
+    def __init__(
+        self, f: IO[bytes], *, ID: int, name: str, size: int, mtype: str = "Multimedia"
+    ) -> None:
+        """
+        f: the file, opened in binary mode
+        size: the size of the file in bytes
+        """
+        self.f = f
+        self.buffer = (
+            f'<application xmlns="{NS}"><modules><module name="{mtype}">'
+            f'<moduleItem id="{ID}"><attachment name={quoteattr(name)}><value>'
+        ).encode()
+        self.footer = (
+            b"</value></attachment></moduleItem></module></modules></application>"
+        )
+        # base64 makes 4 bytes out of every 3 (or part thereof)
+        self.size = len(self.buffer) + 4 * -(-size // 3) + len(self.footer)
+        self.offset = 0  # in buffer
+        self.pos = 0
+        self.eof = False
+
+    def __len__(self) -> int:
+        return self.size
+
+    def tell(self) -> int:
+        return self.pos
+
+    def read(self, n: int = -1) -> bytes:
+        if n is None or n < 0:
+            n = self.size - self.pos
+        while len(self.buffer) - self.offset < n and not self.eof:
+            self.buffer = self.buffer[self.offset :] + self._encode_chunk()
+            self.offset = 0
+        data = self.buffer[self.offset : self.offset + n]
+        self.offset += len(data)
+        self.pos += len(data)
+        return data
+
+    def _encode_chunk(self) -> bytes:
+        data = self.f.read(self.chunk_size)
+        # read can return less than we asked for before the end of the file
+        while data and len(data) % 3:
+            more = self.f.read(self.chunk_size - len(data))
+            if not more:
+                break
+            data += more
+        if not data:
+            self.eof = True
+            return self.footer
+        return base64.b64encode(data)
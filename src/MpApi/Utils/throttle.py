@@ -0,0 +1,157 @@
+"""
+Adaptive concurrency and bandwidth limits for uploads
+
+AIMD works like TCP's congestion control: additive increase, multiplicative
+decrease. Every upload asks for a slot; the number of slots (the limit) grows by one
+while uploads are fast and shrinks by half if an upload fails or gets markedly
+slower than the best we have seen so far.
+
+    aimd = AIMD(maximum=8)
+    with aimd.slot():
+        start = time.perf_counter()
+        r = upload()
+    aimd.record(seconds=time.perf_counter() - start, error=r.status_code >= 500)
+
+Since big files take longer anyway, callers should pass a normalized time, e.g.
+seconds per MB.
+
+TokenBucket caps the bytes per second, e.g. to leave some bandwidth to the office
+during the day. ThrottledFile wraps a file object so that reading from it (which is
+what requests does while sending) takes tokens from the bucket.
+
+    bucket = TokenBucket(rate=5e6)  # 5 MB/s
+    with open(path, "rb") as f:
+        session.put(url, data=ThrottledFile(f, bucket=bucket, size=size))
+"""
+
+from contextlib import contextmanager
+from statistics import median
+import threading
+import time
+from typing import IO, Iterator
+
+
+class AIMD:
+    def __init__(
+        self,
+        *,
+        start: int = 2,
+        minimum: int = 1,
+        maximum: int = 8,
+        window: int = 5,
+        tolerance: float = 1.5,
+    ) -> None:
+        """
+        start, minimum, maximum: number of slots at the beginning and the bounds
+        window: number of successful requests we look at before we increase
+        tolerance: decrease if the median time of a window is tolerance times the
+            best median so far
+        """
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = max(minimum, min(start, maximum))
+        self.window = window
+        self.tolerance = tolerance
+        self.active = 0
+        self.best: float | None = None  # best median seen so far
+        self.samples: list[float] = []
+        self.cond = threading.Condition()
+
+    def acquire(self) -> None:
+        with self.cond:
+            while self.active >= self.limit:
+                self.cond.wait()
+            self.active += 1
+
+    def record(self, *, seconds: float, error: bool = False) -> None:
+        """
+        Report how long a request took and if it failed.
+        """
+        with self.cond:
+            if error:
+                self.samples = []
+                self._set_limit(self.limit // 2)
+                return
+            self.samples.append(seconds)
+            if len(self.samples) < self.window:
+                return
+            current = median(self.samples)
+            self.samples = []
+            if self.best is None or current < self.best:
+                self.best = current
+            if current > self.best * self.tolerance:
+                self._set_limit(self.limit // 2)
+            else:
+                self._set_limit(self.limit + 1)
+
+    def release(self) -> None:
+        with self.cond:
+            self.active -= 1
+            self.cond.notify_all()
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    #
+    # private
+    #
+
+    def _set_limit(self, limit: int) -> None:
+        limit = max(self.minimum, min(limit, self.maximum))
+        if limit != self.limit:
+            print(f"   [aimd] concurrency {self.limit} -> {limit}")
+            self.limit = limit
+            self.cond.notify_all()
+
+
+class TokenBucket:
+    def __init__(self, *, rate: float, burst: float | None = None) -> None:
+        """
+        rate: bytes per second
+        burst: maximum number of bytes that can be sent at once; defaults to one
+            second worth of rate
+        """
+        self.rate = rate
+        self.burst = burst if burst is not None else rate
+        self.tokens = self.burst
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def consume(self, n: int) -> None:
+        """
+        Take n tokens (bytes); wait until there are enough. n may be bigger than
+        burst; then we go into debt and the next callers wait longer.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            self.tokens -= n
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+
+class ThrottledFile:
+    """
+    Read-only file wrapper that takes tokens from a TokenBucket for every chunk read.
+    Has a length, so that requests sends a Content-Length and not a chunked body.
+    """
+
+    def __init__(self, f: IO[bytes], *, bucket: TokenBucket, size: int) -> None:
+        self.f = f
+        self.bucket = bucket
+        self.size = size
+
+    def __len__(self) -> int:
+        return self.size - self.f.tell()
+
+    def read(self, n: int = -1) -> bytes:
+        data = self.f.read(n)
+        self.bucket.consume(len(data))
+        return data
@@ -4,6 +4,7 @@ but keeping the rest of the path.
 """
 
 import argparse
+from MpApi.Utils.walker import walk
 import os  # os.sep
 from pathlib import Path
 import shutil
@@ -26,7 +27,10 @@ def main(act: bool, limit: int, filemask: str = "**/*") -> None:
     print(f"{act=}")
     print(f"{limit=}")
     print(f"{filemask=}")
-    for idx, file in enumerate(src.glob(filemask)):
+    # like the glob we used before: also dot files, thumbs.db etc. and symlinked dirs
+    files = walk(src, filemask=filemask, default_ignores=False, follow_symlinks=True)
+    for idx, entry in enumerate(files):
+        file = entry.path
         if SHUTDOWN:
             print("Graceful shutdown after CTRL+C")
             sys.exit(0)
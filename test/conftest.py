@@ -0,0 +1,27 @@
+"""
+Fixtures shared by the tests that run against the local stand-in server (see
+fake_ria.py).
+"""
+
+from MpApi.Utils.fake_ria import FakeRIA
+import pytest
+
+
+@pytest.fixture
+def fake():
+    """
+    A running FakeRIA with three Multimedia records.
+    """
+    server = FakeRIA(port=0)
+    for fn, orgUnit in (
+        ("eins.jpg", "EMMusikethnologie"),  # 1
+        ("zwei.jpg", "EMAmArchaologie"),  # 2
+        ("drei.jpg", "EMMusikethnologie"),  # 3
+    ):
+        server.add_item(
+            mtype="Multimedia",
+            fields={"MulOriginalFileTxt": fn, "__orgUnit": orgUnit},
+        )
+    server.start()
+    yield server
+    server.stop()
@@ -13,7 +13,7 @@ from pathlib import Path
 
 
 def test_construction():
-    u = AssetUploader()
+    u = AssetUploader(cache=False)
     assert u
 
 
@@ -21,12 +21,12 @@ def test_init():
     p = Path("upload.xlsx")
     if p.exists():
         os.remove(p)
-    u = AssetUploader()
+    u = AssetUploader(cache=False)
     u.init()  # creates new excel which lacks config info
 
 
 def tast_scandir():
-    u = AssetUploader()
+    u = AssetUploader(cache=False)
     # requires an initilized Excel file
     u.scandir(Dir="adir")
 
@@ -44,7 +44,7 @@ def test_get_objIds_for_whole():
         "IXIX A 1934 a,b": set(),  # identNr does not exist, so no objId
     }
 
-    u = AssetUploader()
+    u = AssetUploader(cache=False)
     for identNr in cases:
         if has_parts(identNr=identNr):
             objIdL = u._get_objIds_for_whole(identNr=identNr)
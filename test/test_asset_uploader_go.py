@@ -0,0 +1,179 @@
+"""
+upload up (AssetUploader.go) against the local stand-in server (see fake_ria.py).
+
+The rows have an asset already (asset_fn_exists), so go only attaches the files.
+"""
+
+import MpApi.Utils.AssetUploader as AssetUploader_module
+from MpApi.Utils.AssetUploader import AssetUploader
+from MpApi.Utils.fake_ria import NS, FakeRIA
+from openpyxl import load_workbook
+import pytest
+
+# filename, mulId, hash; b.tif has the same content as a.tif
+rows = [
+    ("a.tif", 11, "hashA"),
+    ("b.tif", 12, "hashA"),
+    ("c.tif", 13, "hashC"),
+    ("d.tif", 14, "hashD"),
+]
+
+
+@pytest.fixture
+def fake():
+    server = FakeRIA(port=0)
+    server.add_item(mtype="Multimedia", fields={"MulOriginalFileTxt": "t.tif"}, ID=100)
+    for fn, mulId, content_hash in rows:
+        server.add_item(mtype="Multimedia", ID=mulId)
+    server.start()
+    yield server
+    server.stop()
+
+
+def uploader(
+    fake,
+    tmp_path,
+    monkeypatch,
+    *,
+    workers: int,
+    mulIds: dict = {},
+    standardbild: str | None = None,
+):
+    """
+    An AssetUploader with an Excel file with the rows from above; mulIds replaces
+    the mulId of some rows. All rows belong to object 1.
+    """
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(
+        AssetUploader_module, "get_credentials", lambda: ("u", "pw", fake.baseURL)
+    )
+    u = AssetUploader(workers=workers, cache=False)
+    u.init()
+    wb = u.xls.get_or_create_wb()
+    wb["Conf"]["B1"] = 100  # template
+    wb["Conf"]["B3"] = "EMMusikethnologie"
+    ws = wb["Assets"]
+    for rno, (fn, mulId, content_hash) in enumerate(rows, start=3):
+        (tmp_path / fn).write_bytes(f"content of {fn}".encode())
+        ws[f"A{rno}"] = fn
+        ws[f"B{rno}"] = "VII c 123"
+        ws[f"D{rno}"] = mulIds.get(fn, mulId)
+        ws[f"H{rno}"] = 1
+        ws[f"L{rno}"] = str(tmp_path / fn)
+        ws[f"N{rno}"] = standardbild
+        ws[f"O{rno}"] = content_hash
+    u.xls.save()
+    return u
+
+
+def record_journal(u: AssetUploader) -> list[tuple]:
+    """
+    Keep the journal entries (filename, col, value) in a list.
+    """
+    entries = list()
+    append = u.journal.append
+
+    def recording_append(*, fullpath: str, col: str, value) -> None:
+        entries.append((fullpath.split("/")[-1], col, value))
+        append(fullpath=fullpath, col=col, value=value)
+
+    u.journal.append = recording_append
+    return entries
+
+
+def attached(tmp_path) -> dict[str, str | None]:
+    """
+    Column attached per filename in the saved Excel file.
+    """
+    ws = load_workbook(tmp_path / AssetUploader_module.excel_fn)["Assets"]
+    return {ws[f"A{rno}"].value: ws[f"M{rno}"].value for rno in range(3, 7)}
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_go_duplicate(fake, tmp_path, monkeypatch, workers):
+    u = uploader(fake, tmp_path, monkeypatch, workers=workers)
+    journal = record_journal(u)
+    u.go()
+    assert attached(tmp_path) == {
+        "a.tif": "x",
+        "b.tif": "Duplikat",
+        "c.tif": "x",
+        "d.tif": "x",
+    }
+    # every attachment went to the asset of its row
+    assert sorted(ID for mtype, ID in fake.attachments) == [11, 13, 14]
+    for fn, mulId, content_hash in rows:
+        if mulId != 12:
+            assert (
+                fake.attachments[("Multimedia", mulId)][1]
+                == (tmp_path / fn).read_bytes()
+            )
+    assert sorted(journal) == [
+        ("a.tif", "attached", "x"),
+        ("b.tif", "attached", "Duplikat"),
+        ("c.tif", "attached", "x"),
+        ("d.tif", "attached", "x"),
+    ]
+    # b.tif is only a Duplikat once a.tif is attached
+    assert journal.index(("a.tif", "attached", "x")) < journal.index(
+        ("b.tif", "attached", "Duplikat")
+    )
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_go_first_upload_fails(fake, tmp_path, monkeypatch, workers):
+    """
+    If the upload of a.tif fails, b.tif with the same content is uploaded itself.
+    """
+    u = uploader(fake, tmp_path, monkeypatch, workers=workers, mulIds={"a.tif": 99})
+    journal = record_journal(u)
+    u.go()  # 99 doesn't exist, so RIA says 404
+    assert attached(tmp_path) == {
+        "a.tif": None,
+        "b.tif": "x",
+        "c.tif": "x",
+        "d.tif": "x",
+    }
+    assert sorted(ID for mtype, ID in fake.attachments) == [12, 13, 14]
+    assert ("a.tif", "attached", "x") not in journal
+
+
+def test_go_pipelined_worker_error(fake, tmp_path, monkeypatch):
+    """
+    An error in one row is raised, but the other rows in progress are written to
+    the Excel file first.
+    """
+    u = uploader(fake, tmp_path, monkeypatch, workers=3, mulIds={"c.tif": "abc"})
+    journal = record_journal(u)
+    with pytest.raises(ValueError):
+        u.go()
+    assert attached(tmp_path) == {
+        "a.tif": "x",
+        "b.tif": None,  # was waiting for a.tif; next run
+        "c.tif": None,
+        "d.tif": "x",
+    }
+    assert sorted(journal) == [("a.tif", "attached", "x"), ("d.tif", "attached", "x")]
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_go_standardbild_same_object(fake, tmp_path, monkeypatch, workers):
+    """
+    Rows of the same object that upload at the same time don't both become the
+    Standardbild.
+    """
+    mulIds = [mulId for fn, mulId, content_hash in rows]
+    fake.add_item(mtype="Object", fields={"ObjMultimediaRef": mulIds}, ID=1)
+    fake.latency = 0.05
+    u = uploader(fake, tmp_path, monkeypatch, workers=workers, standardbild="x")
+    u.go()
+    thumbnails = fake.items["Object"][1].xpath(
+        "//m:moduleReferenceItem[m:dataField/@name = 'ThumbnailBoo']/@moduleItemId",
+        namespaces={"m": NS},
+    )
+    assert len(thumbnails) == 1
+    ws = load_workbook(tmp_path / AssetUploader_module.excel_fn)["Assets"]
+    done = [ws[f"A{rno}"].value for rno in range(3, 7) if ws[f"N{rno}"].value == "done"]
+    assert done == [
+        fn for fn, mulId, content_hash in rows if mulId == int(thumbnails[0])
+    ]
@@ -1,3 +1,11 @@
 from MpApi.Utils.BaseApp import BaseApp
 
 # test for has_parts moved to test_logic.py
+
+
+def test_init_cache(tmp_path):
+    excel_fn = tmp_path / "project" / "upload15.xlsx"
+    excel_fn.parent.mkdir()
+    cache = BaseApp()._init_cache(excel_fn=excel_fn)
+    assert cache.path == tmp_path / "project" / ".ria_cache.db"
+    assert BaseApp()._init_cache(excel_fn=excel_fn, cache=False) is None
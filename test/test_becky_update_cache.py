@@ -1,5 +1,10 @@
-from MpApi.Utils.becky.update_caches import query_persons
+import MpApi.Utils.becky.update_caches as update_caches
+from MpApi.Utils.becky.update_caches import _lookup_pk_ids, query_persons
+from MpApi.Utils.fake_ria import FakeRIA
 from MpApi.Utils.Ria import RIA, init_ria
+import pytest
+import requests
+import tomllib
 
 
 def test_query_persons() -> None:
@@ -9,3 +14,51 @@ def test_query_persons() -> None:
     r = query_persons(name=name, date=date, client=c)
     assert r == [3347]
     # print(f"{r}") # should be a list with objIds
+
+
+def test_lookup_pk_ids(tmp_path, monkeypatch) -> None:
+    """
+    Against the local stand-in server (see fake_ria.py): the queries go out in
+    parallel batches of 25, but the results are the same as one at a time, also if a
+    query in the second batch fails.
+    """
+    fake = FakeRIA(port=0)
+    for no in range(1, 31):
+        fake.add_item(
+            mtype="Person",
+            fields={
+                "PerNennformTxt": f"Person {no}",
+                "PerDateGrp.DatingNewTxt": "1900",
+            },
+        )
+    fake.start()
+    try:
+        client = RIA(baseURL=fake.baseURL, user="user", pw="pw")
+        monkeypatch.setattr(update_caches, "init_ria", lambda: client)
+        conf = {"project_dir": tmp_path, "person_cache": "persons.toml"}
+
+        def lookup(workers: int) -> dict:
+            client.workers = workers
+            person_data = {
+                f"Person {no}": {"1900": [], "1901": []} for no in range(1, 31)
+            }
+            person_data["Person 1"]["1900"] = ["99"]  # known already
+            return _lookup_pk_ids(person_data=person_data, conf=conf, limit=-1)
+
+        person_data = lookup(workers=4)
+        assert person_data == lookup(workers=1)
+        assert person_data["Person 1"] == {"1900": ["99"], "1901": []}
+        assert person_data["Person 2"] == {"1900": ["2"], "1901": []}
+
+        fake.fail_on.add("Person 27")
+        for workers in (1, 4):
+            (tmp_path / "persons.toml").unlink()
+            with pytest.raises(requests.HTTPError):
+                lookup(workers=workers)
+            # the first batch has been saved
+            with open(tmp_path / "persons.toml", "rb") as f:
+                saved = tomllib.load(f)
+            assert saved["Person 2"] == {"1900": ["2"], "1901": []}
+            assert saved["Person 30"] == {"1900": [], "1901": []}
+    finally:
+        fake.stop()
@@ -0,0 +1,37 @@
+import pytest
+from MpApi.Utils.exif import NotSupportedError, read_artist, read_artists
+from PIL import Image
+
+
+def _image(path, artist=None, **kwargs):
+    img = Image.new("RGB", (8, 8))
+    exif = Image.Exif()
+    if artist is not None:
+        exif[315] = artist
+    img.save(path, exif=exif, **kwargs)
+
+
+def test_read_artist(tmp_path):
+    _image(tmp_path / "a.tif", artist="Claudia Obrocki")
+    _image(tmp_path / "b.jpg", artist="Martin Franken")
+    _image(tmp_path / "c.tif")
+    _image(tmp_path / "d.tif", artist="Eö", compression="tiff_lzw")
+    _image(tmp_path / "e.png")
+    assert read_artist(tmp_path / "a.tif") == "Claudia Obrocki"
+    assert read_artist(tmp_path / "b.jpg") == "Martin Franken"
+    assert read_artist(tmp_path / "c.tif") is None
+    with Image.open(tmp_path / "d.tif") as img:
+        assert read_artist(tmp_path / "d.tif") == img.getexif()[315]
+    with pytest.raises(NotSupportedError):
+        read_artist(tmp_path / "e.png")
+
+
+def test_read_artists(tmp_path):
+    _image(tmp_path / "a.tif", artist="Claudia Obrocki")
+    _image(tmp_path / "e.png")
+    paths = [tmp_path / "a.tif", tmp_path / "e.png", tmp_path / "missing.tif"]
+    assert list(read_artists(paths, workers=2)) == [
+        (paths[0], "Claudia Obrocki", True),
+        (paths[1], None, False),
+        (paths[2], None, False),
+    ]
@@ -0,0 +1,113 @@
+from MpApi.Utils.fake_ria import FakeRIA
+import pytest
+import requests
+
+search = """<application xmlns="http://www.zetcom.com/ria/ws/module/search">
+  <modules>
+    <module name="Object">
+      <search limit="{limit}" offset="0">
+        <select>
+          <field fieldPath="ObjObjectNumberVrt"/>
+        </select>
+        <expert>
+          <and>
+            <equalsField fieldPath="__orgUnit" operand="EMMusikethnologie"/>
+            <startsWithField fieldPath="ObjObjectNumberVrt" operand="{ident}"/>
+          </and>
+        </expert>
+      </search>
+    </module>
+  </modules>
+</application>"""
+
+item = b"""<application xmlns="http://www.zetcom.com/ria/ws/module">
+  <modules>
+    <module name="Multimedia">
+      <moduleItem>
+        <dataField name="MulOriginalFileTxt"><value>eins.jpg</value></dataField>
+      </moduleItem>
+    </module>
+  </modules>
+</application>"""
+
+
+@pytest.fixture
+def fake():
+    server = FakeRIA(port=0, seed=1)
+    server.add_item(
+        mtype="Object",
+        fields={"ObjObjectNumberVrt": "VII c 123 a", "__orgUnit": "EMMusikethnologie"},
+    )
+    server.add_item(
+        mtype="Object",
+        fields={"ObjObjectNumberVrt": "VII c 124", "__orgUnit": "EMMusikethnologie"},
+    )
+    server.add_item(
+        mtype="Object",
+        fields={"ObjObjectNumberVrt": "VII c 123", "__orgUnit": "EMArchiv"},
+    )
+    server.start()
+    yield server
+    server.stop()
+
+
+def test_search(fake):
+    url = f"{fake.baseURL}/ria-ws/application/module/Object/search"
+    r = requests.post(url, data=search.format(limit=-1, ident="vii C 123"))
+    assert r.status_code == 200
+    assert b'totalSize="1"' in r.content
+    assert b"VII c 123 a" in r.content
+
+    r = requests.post(url, data=search.format(limit=1, ident="VII c"))
+    assert b'totalSize="2"' in r.content
+    assert r.content.count(b"<moduleItem ") == 1
+
+
+def test_create_get_attachment(fake):
+    app = f"{fake.baseURL}/ria-ws/application/module/Multimedia"
+    r = requests.post(app, data=item)
+    assert r.status_code == 200
+    assert b'id="4"' in r.content
+
+    r = requests.put(f"{app}/4/attachment", data=b"JPEG", headers={"X-File-Name": "a"})
+    assert r.status_code == 204
+    r = requests.get(f"{app}/4")
+    assert b"eins.jpg" in r.content
+    assert b'hasAttachments="true"' in r.content
+    assert requests.get(f"{app}/4/attachment").content == b"JPEG"
+    assert requests.get(f"{app}/99").status_code == 404
+
+
+def test_error_injection():
+    server = FakeRIA(port=0, error_rate=1).start()
+    try:
+        r = requests.get(f"{server.baseURL}/ria-ws/application/module/Object/1")
+        assert r.status_code == 503
+    finally:
+        server.stop()
+
+
+def test_fail_on(fake):
+    fake.fail_on.add("VII c 124")
+    url = f"{fake.baseURL}/ria-ws/application/module/Object/search"
+    r = requests.post(url, data=search.format(limit=-1, ident="VII c 124"))
+    assert r.status_code == 500
+    r = requests.post(url, data=search.format(limit=-1, ident="VII c 123"))
+    assert r.status_code == 200
+
+
+def test_group_fields(fake):
+    ID = fake.add_item(
+        mtype="Person",
+        fields={"PerNennformTxt": "Eduard Schmidt", "PerDateGrp.DatingNewTxt": "1892"},
+    )
+    query = """<application xmlns="http://www.zetcom.com/ria/ws/module/search">
+      <modules><module name="Person"><search limit="-1" offset="0"><expert>
+        <equalsField fieldPath="PerDateGrp.DatingNewTxt" operand="{date}"/>
+      </expert></search></module></modules>
+    </application>"""
+    url = f"{fake.baseURL}/ria-ws/application/module/Person/search"
+    r = requests.post(url, data=query.format(date="1892"))
+    assert f'id="{ID}"'.encode() in r.content
+    r = requests.post(url, data=query.format(date="1893"))
+    assert b'totalSize="0"' in r.content
@@ -0,0 +1,37 @@
+from MpApi.Utils.Filename_Index import Filename_Index
+
+
+def test_lookup(tmp_path):
+    idx = Filename_Index(path=tmp_path / "index.json")
+    idx.add(fn="eins.jpg", mulId=1, orgUnit="EMMusikethnologie")
+    idx.add(fn="eins.jpg", mulId="2", orgUnit="EMArchiv")
+    assert idx.lookup(fn="eins.jpg") == {"1", "2"}
+    assert idx.lookup(fn="eins.jpg", orgUnit="EMArchiv") == {"2"}
+    # unknown filenames don't exist in RIA
+    assert idx.lookup(fn="zwei.jpg") == set()
+
+
+def test_scope(tmp_path):
+    idx = Filename_Index(path=tmp_path / "index.json", scope="EMArchiv")
+    idx.add(fn="eins.jpg", mulId=2, orgUnit="EMArchiv")
+    assert idx.lookup(fn="eins.jpg", orgUnit="EMArchiv") == {"2"}
+    # outside of scope the index can't answer
+    assert idx.lookup(fn="eins.jpg", orgUnit="EMMusikethnologie") is None
+    assert idx.lookup(fn="eins.jpg") is None
+
+
+def test_save_load(tmp_path):
+    idx = Filename_Index(path=tmp_path / "index.json", scope="EMArchiv")
+    idx.add(fn="eins.jpg", mulId=2, orgUnit="EMArchiv")
+    idx.discard("zwei.jpg")
+    idx.save()
+
+    idx = Filename_Index(path=tmp_path / "index.json")
+    assert idx.load(scope="EMArchiv") is True
+    assert idx.lookup(fn="eins.jpg", orgUnit="EMArchiv") == {"2"}
+    assert idx.lookup(fn="zwei.jpg", orgUnit="EMArchiv") is None
+    # an index for one orgUnit can't be used for another one
+    assert Filename_Index(path=tmp_path / "index.json").load(scope="EMX") is False
+    # expired
+    idx = Filename_Index(path=tmp_path / "index.json", max_age=-1)
+    assert idx.load(scope="EMArchiv") is False
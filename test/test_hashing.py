@@ -0,0 +1,27 @@
+from MpApi.Utils.hashing import file_hash, hash_files
+
+
+def test_file_hash(tmp_path):
+    eins = tmp_path / "eins.jpg"
+    zwei = tmp_path / "zwei.jpg"
+    leer = tmp_path / "leer.jpg"
+    eins.write_bytes(b"x" * 3000)
+    zwei.write_bytes(b"x" * 3000)
+    leer.write_bytes(b"")
+    assert file_hash(eins) == file_hash(zwei, chunk_size=1000)
+    assert file_hash(eins) == file_hash(eins, use_mmap=True)
+    assert file_hash(leer) == file_hash(leer, use_mmap=True)
+    assert file_hash(eins) != file_hash(leer)
+
+
+def test_hash_files(tmp_path):
+    paths = list()
+    for n in range(10):
+        p = tmp_path / f"{n}.jpg"
+        p.write_bytes(bytes([n]) * 100)
+        paths.append(p)
+    paths.append(tmp_path / "missing.jpg")
+    results = list(hash_files(paths, workers=2))
+    assert [p for p, h in results] == paths
+    assert results[3][1] == file_hash(paths[3])
+    assert results[-1][1] is None
@@ -0,0 +1,59 @@
+from MpApi.Utils.IdentNr_Index import IdentNr_Index
+
+
+def _index(tmp_path, scope=None):
+    idx = IdentNr_Index(path=tmp_path / "index.json", scope=scope)
+    idx.add(objId=1, identNr="VII c 123", orgUnit="EMMusikethnologie")
+    idx.add(objId=2, identNr="VII c 123 a", orgUnit="EMMusikethnologie")
+    idx.add(objId=3, identNr="VII c 123 b-c", orgUnit="EMMusikethnologie")
+    idx.add(objId=4, identNr="VII c 1234", orgUnit="EMMusikethnologie")
+    idx.add(objId=5, identNr="VII c 123 >", orgUnit="EMArchiv")
+    return idx
+
+
+def test_exact(tmp_path):
+    idx = _index(tmp_path)
+    assert idx.exact("VII c 123") == {1: "VII c 123"}
+    assert idx.exact("VII c 123 >") == {5: "VII c 123 >"}
+    assert idx.exact("VII c 12") == {}
+
+
+def test_lax(tmp_path):
+    idx = _index(tmp_path)
+    assert idx.lax("vii C 123") == {1: "VII c 123", 5: "VII c 123 >"}
+    assert idx.lax("VII c 123", "EMMusikethnologie") == {1: "VII c 123"}
+
+
+def test_startswith(tmp_path):
+    idx = _index(tmp_path)
+    assert set(idx.startswith("VII c 123")) == {1, 2, 3, 4, 5}
+    assert set(idx.startswith("VII c 1234")) == {4}
+
+
+def test_siblings(tmp_path):
+    idx = _index(tmp_path)
+    assert idx.siblings("VII c 123", "EMMusikethnologie") == {
+        2: "VII c 123 a",
+        3: "VII c 123 b-c",
+    }
+    assert idx.siblings("VII c 12", "EMMusikethnologie") == {}
+
+
+def test_scope_and_discard(tmp_path):
+    idx = _index(tmp_path, scope="EMMusikethnologie")
+    assert idx.exact("VII c 123") is None  # all orgUnits not covered
+    assert idx.exact("VII c 123", "EMMusikethnologie") == {1: "VII c 123"}
+    idx.discard("VII c 123 d")
+    assert idx.siblings("VII c 123", "EMMusikethnologie") is None
+    assert idx.exact("VII c 1234", "EMMusikethnologie") == {4: "VII c 1234"}
+    idx.add(objId=6, identNr="VII c 123 d", orgUnit="EMMusikethnologie")
+    assert set(idx.siblings("VII c 123", "EMMusikethnologie")) == {2, 3, 6}
+
+
+def test_save_load(tmp_path):
+    _index(tmp_path, scope="EMMusikethnologie").save()
+    idx = IdentNr_Index(path=tmp_path / "index.json")
+    assert idx.load(scope="EMMusikethnologie") is True
+    assert len(idx) == 5
+    assert idx.exact("VII c 123 a", "EMMusikethnologie") == {2: "VII c 123 a"}
+    assert IdentNr_Index(path=tmp_path / "index.json").load(scope="EMArchiv") is False
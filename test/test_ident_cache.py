@@ -0,0 +1,80 @@
+from MpApi.Utils.IdentNr_Cache import Ident_Cache
+import time
+
+
+def test_get_set(tmp_path):
+    cache = Ident_Cache(path=tmp_path / "cache.db")
+    hit, value = cache.get(kind="objIds", key="VII c 123", scope="True|None")
+    assert hit is False
+    cache.set(kind="objIds", key="VII c 123", scope="True|None", value=[1234])
+    hit, value = cache.get(kind="objIds", key="VII c 123", scope="True|None")
+    assert hit is True
+    assert value == [1234]
+    # scope is part of the key
+    hit, value = cache.get(kind="objIds", key="VII c 123", scope="False|None")
+    assert hit is False
+
+
+def test_persistent(tmp_path):
+    cache = Ident_Cache(path=tmp_path / "cache.db")
+    cache.set(kind="photographer", key="Claudia Obrocki", value=[3597])
+    cache.close()
+    cache = Ident_Cache(path=tmp_path / "cache.db")
+    assert cache.get(kind="photographer", key="Claudia Obrocki") == (True, [3597])
+
+
+def test_negative_ttl(tmp_path):
+    cache = Ident_Cache(path=tmp_path / "cache.db", ttl=60, neg_ttl=0)
+    cache.set(kind="mulIds", key="eins.jpg", value=[])
+    cache.set(kind="mulIds", key="zwei.jpg", value=["123"])
+    time.sleep(0.01)
+    # empty result has expired, but the positive one is still there
+    assert cache.get(kind="mulIds", key="eins.jpg") == (False, None)
+    assert cache.get(kind="mulIds", key="zwei.jpg") == (True, ["123"])
+
+
+def test_none_is_a_value(tmp_path):
+    cache = Ident_Cache(path=tmp_path / "cache.db")
+    cache.set(kind="photographer", key="Nobody", value=None)
+    assert cache.get(kind="photographer", key="Nobody") == (True, None)
+
+
+def test_invalidate(tmp_path):
+    cache = Ident_Cache(path=tmp_path / "cache.db")
+    cache.set(kind="objIds", key="VII c 1", scope="a", value=[1])
+    cache.set(kind="objIds", key="VII c 1", scope="b", value=[1])
+    cache.set(kind="objIds", key="VII c 2", scope="a", value=[2])
+    cache.invalidate(kind="objIds", key="VII c 1")
+    assert cache.get(kind="objIds", key="VII c 1", scope="a")[0] is False
+    assert cache.get(kind="objIds", key="VII c 1", scope="b")[0] is False
+    assert cache.get(kind="objIds", key="VII c 2", scope="a")[0] is True
+    cache.invalidate(kind="objIds")
+    assert cache.get(kind="objIds", key="VII c 2", scope="a")[0] is False
+
+
+def test_set_many(tmp_path):
+    cache = Ident_Cache(path=tmp_path / "cache.db")
+    cache.set_many(
+        kind="artist", items=[("a.tif", "10|1", "Claudia Obrocki"), ("b.tif", "", None)]
+    )
+    assert cache.get(kind="artist", key="a.tif", scope="10|1") == (
+        True,
+        "Claudia Obrocki",
+    )
+    assert cache.get(kind="artist", key="a.tif", scope="11|1") == (False, None)
+    assert cache.get(kind="artist", key="b.tif") == (True, None)
+
+
+def test_invalidate_prefixes(tmp_path):
+    cache = Ident_Cache(path=tmp_path / "cache.db")
+    for key in ("VII c 12", "vii c 123", "VII c 123 a", "VII c 1234", "VII d"):
+        cache.set(kind="startswith", key=key, scope="None", value={"1": key})
+    cache.set(kind="objIds", key="VII c 12", scope="None", value=[1])
+    # a new record VII c 123 a
+    cache.invalidate_prefixes(kind="startswith", identNr="VII c 123 a")
+    for key in ("VII c 12", "vii c 123", "VII c 123 a"):
+        assert cache.get(kind="startswith", key=key, scope="None")[0] is False
+    for key in ("VII c 1234", "VII d"):
+        assert cache.get(kind="startswith", key=key, scope="None")[0] is True
+    # other kinds are left alone
+    assert cache.get(kind="objIds", key="VII c 12", scope="None")[0] is True
@@ -0,0 +1,32 @@
+from MpApi.Utils.Journal import Journal
+
+
+def test_latest(tmp_path):
+    journal = Journal(path=tmp_path / "journal.jsonl")
+    assert journal.latest() == {}
+    journal.append(fullpath="eins.jpg", col="asset_fn_exists", value=1234)
+    journal.append(fullpath="eins.jpg", col="attached", value="x")
+    journal.append(fullpath="zwei.jpg", col="attached", value="File not found")
+    journal.append(fullpath="eins.jpg", col="attached", value="y")
+    assert journal.latest() == {
+        "eins.jpg": {"asset_fn_exists": 1234, "attached": "y"},
+        "zwei.jpg": {"attached": "File not found"},
+    }
+
+
+def test_broken_line(tmp_path):
+    journal = Journal(path=tmp_path / "journal.jsonl")
+    journal.append(fullpath="eins.jpg", col="asset_fn_exists", value=1234)
+    with open(journal.path, "a") as f:
+        f.write('{"fullpath": "zwei.jp')  # died while writing
+    assert journal.latest() == {"eins.jpg": {"asset_fn_exists": 1234}}
+
+
+def test_clear(tmp_path):
+    journal = Journal(path=tmp_path / "journal.jsonl")
+    journal.append(fullpath="eins.jpg", col="attached", value="x")
+    journal.append(fullpath="zwei.jpg", col="attached", value="x")
+    journal.clear(keep={"zwei.jpg"})
+    assert journal.latest() == {"zwei.jpg": {"attached": "x"}}
+    journal.clear()
+    assert not journal.path.exists()
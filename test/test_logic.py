@@ -1,12 +1,56 @@
 from MpApi.Utils.logic import (
+    _parse_EM_cut,
     extractIdentNr,
     fortlaufende_Nummer,
     fortlaufende_Nummer_pos,
     is_suspicious,
     has_parts,
+    identNrParserError,
+    parse_many,
     whole_for_parts,
 )
+import os
 from pathlib import Path
+import pytest
+import random
+import time
+
+# filenames as we find them in EM and AKu directories, for the benchmark
+CORPUS = (
+    "VII c {n} a -A.tif",
+    "VII c {n} a -B.tif",
+    "VII a {n} c-KK.tif",
+    "VII c {n} a-c.jpg",
+    "I C {n} a-h -KK -B.jpg",
+    "V A {n} a,b___-KK-A.tif",
+    "VIII NA {n} b___-A.tif",
+    "VIII A {n} ({m}) -A.tif",
+    "I_MV_{n:04}__{m:04}.jpg",
+    "I_MV_{n:04}_a__{m:04}.jpg",
+    "HK_Afr_{m}__{n:04}.jpg",
+    "Verz_BGAEU_{m}__{n:04}.jpg",
+    "Adr_(EJ)_{m}__{n:04}.jpg",
+    "P {n}.tif",
+    "VI {n} -KK RS.jpg",
+    "VIII NA {n} Rückseite.tif",
+    "VIII C {n} (P 10054).tif",
+    "I C {n} mit I C {m}.tif",
+    "IV-AKu-{n:06}___{m}.tif",
+)
+# paths per second, serially; a few times that on a recent laptop
+THROUGHPUT = 25_000
+# timing depends on the machine, so benchmarks only run with BENCHMARK=1
+benchmark = pytest.mark.skipif(
+    not os.environ.get("BENCHMARK"), reason="benchmark (set BENCHMARK=1)"
+)
+
+
+def corpus(size: int) -> list[Path]:
+    rnd = random.Random(1)
+    return [
+        Path(rnd.choice(CORPUS).format(n=rnd.randint(1, 30000), m=rnd.randint(1, 30)))
+        for _ in range(size)
+    ]
 
 
 def test_extractIdent_EM():
@@ -190,3 +234,30 @@ def test_fortlaufende_Nummer():
         "I C 1577 a-g <2>": "1577",
         "I C 1577 A <2>": "1577",
     }
+
+
+def test_parse_many():
+    paths = corpus(200)
+    expected = list()
+    for p in paths:
+        try:
+            expected.append((p, extractIdentNr(path=p, parser="EM")))
+        except identNrParserError:
+            expected.append((p, None))
+    assert list(parse_many(paths, parser="EM", workers=1)) == expected
+    assert list(parse_many(paths, parser="EM", workers=2)) == expected
+    # parser errors become None
+    assert list(parse_many([Path("abc -A1.tif")], parser="EM")) == [
+        (Path("abc -A1.tif"), None)
+    ]
+
+
+@benchmark
+def test_parse_many_throughput():
+    paths = corpus(20_000)
+    _parse_EM_cut.cache_clear()  # cold, as in a new run
+    start = time.perf_counter()
+    for _ in parse_many(paths, parser="EM", workers=1):
+        pass
+    rate = len(paths) / (time.perf_counter() - start)
+    assert rate > THROUGHPUT, f"{rate:.0f} paths/s"
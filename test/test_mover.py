@@ -0,0 +1,133 @@
+"""
+Mover against the local stand-in server (see fake_ria.py).
+"""
+
+import MpApi.Utils.mover as mover
+from MpApi.Utils.mover import Mover
+from MpApi.Utils.Snapshot import Snapshot
+from pathlib import Path
+import pytest
+import requests
+
+names = ["eins.jpg", "zwei.jpg", "drei.jpg", "vier.jpg"]
+
+
+@pytest.fixture
+def m(fake, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(mover, "get_credentials", lambda: ("u", "pw", fake.baseURL))
+    (tmp_path / "in").mkdir()
+    for name in names:
+        (tmp_path / "in" / name).write_bytes(name.encode())
+    m = Mover(cache=False)
+    m.init()
+    conf_ws = m.wb["Conf"]
+    conf_ws["B1"] = str(tmp_path / "target")
+    conf_ws["B2"] = "EMMusikethnologie"
+    conf_ws["B3"] = "in/*.jpg"
+    m.xls.save()
+    m._check_scandir()
+    m.client.workers = 4
+    return m
+
+
+def rows(m: Mover, first: int, last: int) -> list[list]:
+    return [
+        [cell.value for cell in row]
+        for row in m.ws.iter_rows(min_row=first, max_row=last)
+    ]
+
+
+def test_prefetch_fn_exists(m):
+    paths = [Path("in") / name for name in names]
+    m._prefetch_fn_exists(paths)
+    assert m.fn_exists_prefetch[("zwei.jpg", None)] == {"2"}
+    for name in names:
+        for orgUnit in (None, "EMMusikethnologie"):
+            expected = m.client.fn_to_mulId(fn=name, orgUnit=orgUnit)
+            assert m.fn_exists_prefetch[(name, orgUnit)] == expected
+
+
+def test_scan_batch_same_as_sequential(m):
+    paths = [Path("in") / name for name in names]
+    m._scan_batch([(p, rno) for rno, p in enumerate(paths, start=3)])
+    # the same files again, one at a time without prefetch
+    for rno, p in enumerate(paths, start=7):
+        m._scan_per_file(path=p, count=rno)
+    assert rows(m, 3, 6) == rows(m, 7, 10)
+    assert [row[1:4] for row in rows(m, 3, 6)] == [
+        ["1", "1", "x"],
+        ["2", "None", None],
+        ["3", "3", "x"],
+        ["None", "None", None],
+    ]
+
+
+def test_scan_batch_failing_job(m, fake):
+    """
+    If the lookup of one file fails, the batch gets as far as one file at a time.
+    """
+    fake.fail_on.add("drei.jpg")
+    paths = [Path("in") / name for name in names]
+    pending = [(p, rno) for rno, p in enumerate(paths, start=3)]
+    with pytest.raises(requests.HTTPError):
+        m._scan_batch(pending)
+    with pytest.raises(requests.HTTPError):
+        for rno, p in enumerate(paths, start=7):
+            m._scan_per_file(path=p, count=rno)
+    assert rows(m, 3, 6) == rows(m, 7, 10)
+    assert rows(m, 3, 4)[1][1] == "2"  # zwei.jpg
+    assert rows(m, 6, 6)[0][0] is None  # vier.jpg
+
+
+def fullpaths(m: Mover) -> list[str]:
+    return [cells["fullpath"].value for cells, rno in m.xls.loop(sheet=m.ws)]
+
+
+def test_scandir_rescan(m, tmp_path):
+    m.scandir()
+    files = {name: str(tmp_path / "in" / name) for name in names}
+    assert sorted(fullpaths(m)) == sorted(files.values())
+    # eins.jpg has been moved, drei.jpg deleted, the row of zwei.jpg deleted by hand
+    for cells, rno in m.xls.loop(sheet=m.ws):
+        if cells["filename"].value == "eins.jpg":
+            cells["moved"].value = "x"
+    (tmp_path / "in" / "eins.jpg").unlink()
+    (tmp_path / "in" / "drei.jpg").unlink()
+    m.xls.drop_rows(sheet=m.ws, rnos=[fullpaths(m).index(files["zwei.jpg"]) + 3])
+    m.xls.save()
+
+    m.scandir()
+    expected = sorted([files["eins.jpg"], files["vier.jpg"]]) + [files["zwei.jpg"]]
+    assert fullpaths(m) == expected
+    snapshot = Snapshot(path=mover.snapshot_fn, filemask=m.filemask)
+    assert len(snapshot) == 2  # zwei.jpg, vier.jpg
+    snapshot.close()
+    # nothing has changed
+    m.scandir()
+    assert fullpaths(m) == expected
+
+
+def test_scandir_interrupted(m, monkeypatch):
+    """
+    Only files whose rows have been written get into the snapshot.
+    """
+    recorded = list()
+    record = Snapshot.record
+
+    def recording_record(self, f):
+        recorded.append(f.path.name)
+        record(self, f)
+
+    monkeypatch.setattr(Snapshot, "record", recording_record)
+    scan_per_file = m._scan_per_file
+
+    def interrupted(*, path: Path, count: int) -> None:
+        if path.name == "eins.jpg":
+            raise KeyboardInterrupt
+        scan_per_file(path=path, count=count)
+
+    m._scan_per_file = interrupted
+    m.scandir()
+    assert len(recorded) == len(fullpaths(m)) < len(names)
+    assert [str(Path("in", name).absolute()) for name in recorded] == fullpaths(m)
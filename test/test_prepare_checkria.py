@@ -0,0 +1,69 @@
+"""
+prepare checkria against the local stand-in server (see fake_ria.py).
+"""
+
+import MpApi.Utils.prepareUpload as prepareUpload
+from MpApi.Utils.prepareUpload import PrepareUpload
+import pytest
+import requests
+
+names = ["eins.jpg", "zwei.jpg", "drei.jpg", "vier.jpg"]
+
+
+@pytest.fixture
+def p(fake, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(
+        prepareUpload, "get_credentials", lambda: ("u", "pw", fake.baseURL)
+    )
+    p = PrepareUpload(cache=False)
+    p.init(conf={"B2": "EMMusikethnologie"})
+    p.client.workers = 4
+    return p
+
+
+def add_rows(p: PrepareUpload, first: int) -> None:
+    for rno, name in enumerate(names, start=first):
+        p.ws[f"A{rno}"] = name
+
+
+def asset_exists(p: PrepareUpload) -> None:
+    """
+    The part of checkria that uses the prefetched mulIds.
+    """
+    for cells, rno in p.xls.loop(sheet=p.ws, limit=p.limit):
+        p._asset_exists_already(cells)
+
+
+def uploaded(p: PrepareUpload) -> list:
+    return [cells["assetUploaded"].value for cells, rno in p.xls.loop(sheet=p.ws)]
+
+
+def test_prefetch_mulIds_same_as_sequential(p):
+    add_rows(p, first=3)
+    p._prefetch_mulIds()
+    assert p.mulIds_prefetch == {
+        "eins.jpg": {"1"},
+        "zwei.jpg": set(),
+        "drei.jpg": {"3"},
+        "vier.jpg": set(),
+    }
+    asset_exists(p)
+    # the same files again, one at a time without prefetch
+    add_rows(p, first=7)
+    p.mulIds_prefetch = {}
+    asset_exists(p)
+    assert uploaded(p) == ["1", "None", "3", "None"] * 2
+
+
+def test_prefetch_mulIds_failing_job(p, fake):
+    """
+    If one lookup fails, checkria gets as far as one row at a time.
+    """
+    fake.fail_on.add("drei.jpg")
+    add_rows(p, first=3)
+    p._prefetch_mulIds()
+    assert p.mulIds_prefetch == {}
+    with pytest.raises(requests.HTTPError):
+        asset_exists(p)
+    assert uploaded(p) == ["1", "None", None, None]
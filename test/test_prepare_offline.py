@@ -31,4 +31,5 @@ def test_constructor_ria():
 def test_prepare_new():
     p = PrepareUpload(
         limit=-1,
+        cache=False,
     )
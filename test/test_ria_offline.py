@@ -0,0 +1,347 @@
+"""
+RIA against the local stand-in server (see fake_ria.py), so these tests don't need
+credentials or a network.
+"""
+
+from MpApi.Utils.fake_ria import NS, FakeRIA
+from MpApi.Utils.IdentNr_Cache import Ident_Cache
+from lxml import etree  # type: ignore
+from mpapi.search import Search
+import MpApi.Utils.Ria as Ria
+from MpApi.Utils.Ria import RIA, parser, records_exist3
+import pytest
+import requests
+import time
+
+
+@pytest.fixture
+def fake(fake):
+    """
+    The Multimedia records from conftest.py plus some objects.
+    """
+    for ID, (ident, orgUnit) in enumerate(
+        (
+            ("VII c 123", "EMMusikethnologie"),
+            ("VII c 123 a", "EMMusikethnologie"),
+            ("VII c 1234", "EMMusikethnologie"),
+            ("VII c 124 >", "EMMusikethnologie"),
+            ("VII c 123", "EMAmArchaologie"),
+            ("12345", "EMMusikethnologie"),
+        ),
+        start=1,
+    ):
+        fake.add_item(
+            mtype="Object",
+            fields={"ObjObjectNumberVrt": ident, "__orgUnit": orgUnit},
+            ID=ID,
+        )
+    return fake
+
+
+@pytest.fixture
+def c(fake):
+    return RIA(baseURL=fake.baseURL, user="user", pw="pw")
+
+
+def test_ident_matches(c):
+    assert c._ident_matches("VII c 123", "VII c 123", "exact")
+    assert not c._ident_matches("VII c 124", "VII c 124 >", "exact")
+    assert c._ident_matches(" VII c 123 ", "VII c 123", "exact")
+    assert c._ident_matches(12345, "12345", "exact")
+    # strict ignores case and Sonderzeichen, like equalsField
+    assert c._ident_matches("vii C 124", "VII c 124 >", "strict")
+    assert not c._ident_matches("VII c 12", "VII c 123", "strict")
+    assert c._ident_matches(12345, "12345", "strict")
+    assert c._ident_matches("VII c 12", "VII c 123 a", "startswith")
+    assert not c._ident_matches("VII c 1234", "VII c 123", "startswith")
+
+
+def test_identNrs_exist_many(c):
+    idents = ["VII c 123", "VII c 124", "VII c 999", "VII c 123"]
+    assert c.identNrs_exist_many(idents=idents, mode="exact") == {
+        "VII c 123": [1, 5],
+        "VII c 124": [],
+        "VII c 999": [],
+    }
+    assert c.identNrs_exist_many(idents=idents, mode="strict") == {
+        "VII c 123": [1, 5],
+        "VII c 124": [4],
+        "VII c 999": [],
+    }
+    results = c.identNrs_exist_many(
+        idents=["VII c 123", "VII c 124"],
+        mode="startswith",
+        orgUnit="EMMusikethnologie",
+    )
+    assert results == {"VII c 123": [1, 2, 3], "VII c 124": [4]}
+    with pytest.raises(ValueError):
+        c.identNrs_exist_many(idents=idents, mode="lax")
+
+
+def test_identNrs_exist_many_same_as_single(c, monkeypatch):
+    """
+    The batch gives the same answers as one query per identNr, also across chunks.
+    """
+    monkeypatch.setattr(Ria, "IDENT_CHUNK_SIZE", 2)
+    idents = ["VII c 123", "VII c 123 a", "VII c 124", "VII c 1234", "12345"]
+    many = c.identNrs_exist_many(idents=idents, mode="strict")
+    for ident in idents:
+        assert sorted(many[ident]) == sorted(c.identNr_exists(nr=ident))
+    many = c.identNrs_exist_many(idents=idents, mode="exact")
+    for ident in idents:
+        assert set(many[ident]) == c.identNr_exists3(ident=ident)
+
+
+def object_query(limit: int, offset: int) -> Search:
+    q = Search(module="Object", limit=limit, offset=offset)
+    q.addCriterion(operator="equalsField", field="__orgUnit", value="EMMusikethnologie")
+    q.addField(field="ObjObjectNumberVrt")
+    return q
+
+
+def test_paginate(c, fake):
+    # records that don't come in the order of their IDs
+    for ID in (12, 10, 11):
+        fake.add_item(
+            mtype="Object",
+            fields={"ObjObjectNumberVrt": f"I {ID}", "__orgUnit": "EMMusikethnologie"},
+            ID=ID,
+        )
+    expected = [1, 2, 3, 4, 6, 10, 11, 12]
+    for prefetch in (True, False):
+        for page_size in (1, 2, 3, 8, 1000):
+            results = c.paginate(
+                mtype="Object",
+                query=object_query,
+                page_size=page_size,
+                prefetch=prefetch,
+            )
+            assert [ID for ID, fields in results] == expected
+    # a page with all the hits is the last one
+    count = fake.requests
+    assert len(list(c.paginate(mtype="Object", query=object_query, page_size=8))) == 8
+    assert fake.requests == count + 1
+
+
+def test_paginate_server_cap(c, fake):
+    """
+    The server sends fewer records than we ask for.
+    """
+    fake.max_limit = 2
+    results = c.paginate(mtype="Object", query=object_query, page_size=1000)
+    assert [ID for ID, fields in results] == [1, 2, 3, 4, 6]
+
+
+def test_paginate_records_change(c, fake):
+    """
+    Records that are deleted or created while we are paging don't make us miss or
+    repeat records.
+    """
+    results = list()
+    for ID, fields in c.paginate(
+        mtype="Object", query=object_query, page_size=2, prefetch=False
+    ):
+        results.append(ID)
+        if ID == 1:
+            del fake.items["Object"][1]
+        if ID == 3:
+            fake.add_item(
+                mtype="Object",
+                fields={"ObjObjectNumberVrt": "I 2a", "__orgUnit": "EMMusikethnologie"},
+                ID=0,
+            )
+    assert results == [1, 2, 3, 4, 6]
+
+
+def test_run_many(c):
+    jobs = [
+        {"fn": fn, "orgUnit": orgUnit}
+        for fn in ("eins.jpg", "zwei.jpg", "drei.jpg", "vier.jpg")
+        for orgUnit in (None, "EMMusikethnologie")
+    ]
+    sequential = c.run_many(c.fn_to_mulId, jobs, workers=1)
+    assert sequential[:4] == [{"1"}, {"1"}, {"2"}, set()]
+    assert c.run_many(c.fn_to_mulId, jobs, workers=4) == sequential
+
+
+def test_run_many_failing_job(c, fake):
+    fake.fail_on.add("drei.jpg")
+    jobs = [{"fn": fn} for fn in ("eins.jpg", "zwei.jpg", "drei.jpg", "vier.jpg")]
+    for workers in (1, 4):
+        with pytest.raises(requests.HTTPError):
+            c.run_many(c.fn_to_mulId, jobs, workers=workers)
+    # the pool is still usable afterwards
+    fake.fail_on.clear()
+    assert c.run_many(c.fn_to_mulId, jobs, workers=4) == [{"1"}, {"2"}, {"3"}, set()]
+
+
+def test_upload_attachment(c, fake, tmp_path):
+    p = tmp_path / "a&b.jpg"
+    p.write_bytes(bytes(range(256)) * 1000)
+    r = c.upload_attachment(file=p, ID=1)
+    assert r.status_code == 204
+    assert fake.attachments[("Multimedia", 1)] == ("a&b.jpg", p.read_bytes())
+    # the same with a bandwidth limit
+    c.throttle_uploads(maximum=2, rate=1e9)
+    r = c.upload_attachment(file=p, ID=2)
+    assert r.status_code == 204
+    assert fake.attachments[("Multimedia", 2)] == ("a&b.jpg", p.read_bytes())
+    assert c.upload_attachment(file=p, ID=99).status_code == 404
+
+
+def flaky_put(c: RIA, failures: list) -> list[int]:
+    """
+    Replace c._put_attachment with one that fails with the items of failures (an
+    exception or a status code) before it succeeds. Returns the list of IDs it was
+    called with.
+    """
+    calls = list()
+
+    def put(*, path, ID: int, size: int) -> requests.Response:
+        calls.append(ID)
+        failure = failures.pop(0) if failures else 204
+        if isinstance(failure, Exception):
+            raise failure
+        r = requests.Response()
+        r.status_code = failure
+        return r
+
+    c._put_attachment = put
+    return calls
+
+
+def test_upload_attachment_retries(c, tmp_path, monkeypatch):
+    p = tmp_path / "eins.jpg"
+    p.write_bytes(b"eins")
+    sleeps = list()
+    monkeypatch.setattr(time, "sleep", sleeps.append)
+    for failure in (requests.ConnectionError(), requests.Timeout(), 500, 503, 429):
+        calls = flaky_put(c, [failure, failure])
+        r = c.upload_attachment(file=p, ID=7, backoff=0)
+        assert r.status_code == 204
+        assert calls == [7, 7, 7]
+    # no retry for other errors
+    calls = flaky_put(c, [404])
+    assert c.upload_attachment(file=p, ID=7, backoff=0).status_code == 404
+    assert calls == [7]
+    # give up after retries
+    calls = flaky_put(c, [503] * 3)
+    assert c.upload_attachment(file=p, ID=7, retries=2, backoff=0).status_code == 503
+    assert calls == [7, 7, 7]
+    calls = flaky_put(c, [requests.ConnectionError()] * 3)
+    with pytest.raises(requests.ConnectionError):
+        c.upload_attachment(file=p, ID=7, retries=2, backoff=0)
+    assert calls == [7, 7, 7]
+    # the wait doubles every time
+    sleeps.clear()
+    flaky_put(c, [503] * 3)
+    c.upload_attachment(file=p, ID=7, retries=3, backoff=1)
+    assert sleeps == [1, 2, 4]
+
+
+def test_records_exist3(c):
+    idents = (ident for ident in ["VII c 123", 12345])  # only one pass possible
+    conf = {"RIA": c, "org_unit": "EMMusikethnologie"}
+    # EMAmArchaologie is always included
+    assert records_exist3(idents=idents, conf=conf) == {"VII c 123": 2, 12345: 1}
+
+
+def test_invalidate_cache_prefixes(fake, tmp_path):
+    c = RIA(
+        baseURL=fake.baseURL,
+        user="user",
+        pw="pw",
+        cache=Ident_Cache(path=tmp_path / "cache.db"),
+    )
+    assert set(c.get_objIds_startswith(identNr="VII c 12")) == {1, 2, 3, 4, 5}
+    assert set(c.get_objIds_startswith(identNr="VII c 99")) == set()
+    assert c.get_objIds(identNr="vii c 125") == "None"
+    ID = fake.add_item(
+        mtype="Object",
+        fields={"ObjObjectNumberVrt": "VII c 125", "__orgUnit": "EMMusikethnologie"},
+    )
+    # a new record, like in prepareUpload's createobjects
+    c.invalidate_cache(kind="objIds", key="VII c 125")
+    c.invalidate_cache(kind="startswith", key="VII c 125")
+    count = fake.requests
+    assert ID in c.get_objIds_startswith(identNr="VII c 12")
+    assert c.get_objIds(identNr="vii c 125") == str(ID)
+    # lookups that can't find the new record are still cached
+    assert c.get_objIds_startswith(identNr="VII c 99") == {}
+    assert fake.requests == count + 2
+
+
+def standardbild_fake() -> FakeRIA:
+    server = FakeRIA(port=0)
+    server.add_item(mtype="Object", fields={"ObjMultimediaRef": [11, 12]}, ID=1)
+    server.add_item(mtype="Object", fields={"ObjMultimediaRef": [13]}, ID=2)
+    server.add_item(mtype="Object", fields={"ObjMultimediaRef": [14]}, ID=3)
+    server.add_item(mtype="Object", fields={"ObjMultimediaRef": [15]}, ID=4)
+    # object 3 has a Standardbild already
+    refN = server.items["Object"][3].find(f".//{{{NS}}}moduleReferenceItem")
+    fieldN = etree.SubElement(refN, f"{{{NS}}}dataField", name="ThumbnailBoo")
+    etree.SubElement(fieldN, f"{{{NS}}}value").text = "true"
+    return server.start()
+
+
+def record_updates(c: RIA) -> list[dict]:
+    """
+    Keep the arguments of every updateRepeatableGroup call in a list.
+    """
+    calls = list()
+    update = c.mpapi.updateRepeatableGroup
+
+    def recording_update(**kwargs):
+        calls.append(kwargs)
+        return update(**kwargs)
+
+    c.mpapi.updateRepeatableGroup = recording_update
+    return calls
+
+
+def canonical(xml: str) -> str:
+    return etree.tostring(etree.fromstring(xml, parser), method="c14n").decode()
+
+
+def test_mk_asset_standardbild_many():
+    """
+    The batch version sends the same updates as mk_asset_standardbild2 one pair at a
+    time and leaves the records in the same state.
+    """
+    pairs = [(1, 12), (2, 13), (3, 14), (1, 11)]
+    one, many = standardbild_fake(), standardbild_fake()
+    try:
+        c1 = RIA(baseURL=one.baseURL, user="user", pw="pw")
+        calls1 = record_updates(c1)
+        for objId, mulId in pairs:
+            c1.mk_asset_standardbild2(objId=objId, mulId=mulId)
+
+        c2 = RIA(baseURL=many.baseURL, user="user", pw="pw")
+        calls2 = record_updates(c2)
+        count = many.requests
+        results = c2.mk_asset_standardbild_many(pairs=pairs + [(4, 16), (5, 17)])
+        # one search for the references, one update per new Standardbild
+        assert many.requests == count + 3
+
+        assert [pair for pair, r in results.items() if r is not None] == [
+            (1, 12),
+            (2, 13),
+        ]
+        calls2.sort(key=lambda call: call["id"])
+        assert [call["id"] for call in calls1] == [1, 2]
+        assert [call["id"] for call in calls2] == [1, 2]
+        for call1, call2 in zip(calls1, calls2):
+            assert call1 | {"xml": None} == call2 | {"xml": None}
+            assert canonical(call1["xml"]) == canonical(call2["xml"])
+        for objId in (1, 2, 3, 4):
+            assert etree.tostring(one.items["Object"][objId]) == etree.tostring(
+                many.items["Object"][objId]
+            )
+        thumbnails = many.items["Object"][1].xpath(
+            "//m:moduleReferenceItem[m:dataField/@name = 'ThumbnailBoo']/@moduleItemId",
+            namespaces={"m": NS},
+        )
+        assert thumbnails == ["12"]
+    finally:
+        one.stop()
+        many.stop()
@@ -0,0 +1,29 @@
+from MpApi.Utils.Snapshot import Snapshot
+from MpApi.Utils.walker import walk
+
+
+def test_diff(tmp_path):
+    for name in ("eins.jpg", "zwei.jpg", "drei.jpg"):
+        (tmp_path / name).write_bytes(b"x")
+    snap = Snapshot(path=tmp_path / ".snapshot.sqlite", root=tmp_path)
+    changes = snap.diff(walk(tmp_path))
+    assert len(changes.added) == 3
+    for f in changes.added:
+        snap.record(f)
+    snap.commit()
+
+    (tmp_path / "vier.jpg").write_bytes(b"x")
+    (tmp_path / "zwei.jpg").write_bytes(b"xx")
+    (tmp_path / "drei.jpg").unlink()
+    changes = snap.diff(walk(tmp_path))
+    assert [f.name for f in changes.added] == ["vier.jpg"]
+    assert [f.name for f in changes.changed] == ["zwei.jpg"]
+    assert changes.removed == [str(tmp_path / "drei.jpg")]
+    assert [f.name for f in changes.unchanged] == ["eins.jpg"]
+    snap.close()
+
+    # uncommitted records are lost; a different filemask means a fresh start
+    snap = Snapshot(path=tmp_path / ".snapshot.sqlite", root=tmp_path)
+    assert len(snap) == 3
+    snap = Snapshot(path=tmp_path / ".snapshot.sqlite", root=tmp_path, filemask="*.jpg")
+    assert len(snap) == 0
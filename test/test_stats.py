@@ -0,0 +1,44 @@
+import json
+from MpApi.Utils.Stats import RequestStats
+import pytest
+
+
+class Client:
+    def search2(self, *, query):
+        return query
+
+    def getItem2(self, *, mtype, ID):
+        raise ValueError("not found")
+
+
+def test_instrument(tmp_path):
+    stats = RequestStats(report_interval=0)
+    c = Client()
+    stats.instrument(c, ["search2", "getItem2", "doesNotExist"])
+    assert c.search2(query="q") == "q"
+    assert c.search2(query="q") == "q"
+    with pytest.raises(ValueError):
+        c.getItem2(mtype="Object", ID=1)
+    summary = stats.summary()
+    assert summary["search2"]["calls"] == 2
+    assert summary["getItem2"]["errors"] == 1
+    assert "doesNotExist" not in summary
+
+    json_fn, prom_fn = stats.write(path=tmp_path / "upload.xlsx")
+    assert json_fn.name == "upload.stats.json"
+    with open(json_fn) as f:
+        data = json.load(f)
+    assert data["methods"]["search2"]["calls"] == 2
+    prom = prom_fn.read_text()
+    assert 'mpapi_requests_total{method="search2"} 2' in prom
+    assert 'mpapi_request_duration_seconds_bucket{method="search2",le="+Inf"} 2' in prom
+
+
+def test_percentiles():
+    stats = RequestStats(report_interval=0)
+    for n in range(1, 101):
+        stats.record("search2", seconds=n / 100)
+    summary = stats.summary()["search2"]
+    assert summary["p50"] == 0.5
+    assert summary["p90"] == 0.9
+    assert summary["max"] == 1.0
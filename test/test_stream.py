@@ -0,0 +1,83 @@
+import base64
+from io import BytesIO
+from lxml import etree  # type: ignore
+from MpApi.Utils.stream import NS, AttachmentBody, iter_items
+
+xml = b"""<?xml version="1.0" encoding="UTF-8"?>
+<application xmlns="http://www.zetcom.com/ria/ws/module">
+  <modules>
+    <module name="Object" totalSize="2">
+      <moduleItem id="1" hasAttachments="false">
+        <systemField dataType="Varchar" name="__orgUnit">
+          <value>EMMusikethnologie</value>
+        </systemField>
+        <virtualField name="ObjObjectNumberVrt">
+          <value>VII c 123 a</value>
+        </virtualField>
+        <moduleReference name="ObjMultimediaRef" targetModule="Multimedia">
+          <moduleReferenceItem moduleItemId="11" seqNo="0"/>
+          <moduleReferenceItem moduleItemId="12" seqNo="1"/>
+        </moduleReference>
+      </moduleItem>
+      <moduleItem id="2" hasAttachments="true">
+        <virtualField name="ObjObjectNumberVrt">
+          <value>VII c 123 b</value>
+        </virtualField>
+      </moduleItem>
+    </module>
+  </modules>
+</application>"""
+
+
+def test_iter_items():
+    items = list(iter_items(BytesIO(xml), mtype="Object"))
+    assert [ID for ID, fields in items] == [1, 2]
+    ID, fields = items[0]
+    assert fields["@hasAttachments"] == "false"
+    assert fields["__orgUnit"] == "EMMusikethnologie"
+    assert fields["ObjObjectNumberVrt"] == "VII c 123 a"
+    assert fields["ObjMultimediaRef"] == [11, 12]
+    assert "__orgUnit" not in items[1][1]
+
+
+def test_iter_items_info():
+    info = {}
+    assert len(list(iter_items(BytesIO(xml), mtype="Object", info=info))) == 2
+    assert info == {"totalSize": 2}
+    empty = xml.replace(b'totalSize="2"', b'totalSize="0"').split(b"<moduleItem ")[0]
+    empty += b"</module></modules></application>"
+    info = {}
+    assert list(iter_items(BytesIO(empty), mtype="Object", info=info)) == []
+    assert info == {"totalSize": 0}
+
+
+def test_iter_items_other_module(tmp_path):
+    p = tmp_path / "response.xml"
+    p.write_bytes(xml)
+    assert list(iter_items(p, mtype="Multimedia")) == []
+
+
+class ShortReads(BytesIO):
+    """
+    A file that returns at most 5 bytes per read, like a pipe might.
+    """
+
+    def read(self, n: int = -1) -> bytes:
+        return super().read(5 if n < 0 else min(n, 5))
+
+
+def test_attachment_body(monkeypatch):
+    monkeypatch.setattr(AttachmentBody, "chunk_size", 6)
+    for size in (0, 1, 2, 3, 4, 5, 6, 7, 100):
+        data = bytes(range(size))
+        for f in (BytesIO(data), ShortReads(data)):
+            body = AttachmentBody(f, ID=7, name='a&b <"c">.jpg', size=size)
+            expected = len(body)
+            chunks = list()
+            while chunk := body.read(7):
+                chunks.append(chunk)
+            xml = b"".join(chunks)
+            assert len(xml) == expected
+            attachmentN = etree.fromstring(xml).find(f".//{{{NS}}}attachment")
+            assert attachmentN.get("name") == 'a&b <"c">.jpg'
+            assert base64.b64decode(attachmentN.findtext(f"{{{NS}}}value")) == data
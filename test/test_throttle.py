@@ -0,0 +1,34 @@
+import io
+import time
+from MpApi.Utils.throttle import AIMD, ThrottledFile, TokenBucket
+
+
+def test_aimd():
+    aimd = AIMD(start=2, maximum=4, window=2)
+    for _ in range(4):
+        aimd.record(seconds=1)
+    assert aimd.limit == 4
+    # never more than maximum
+    aimd.record(seconds=1)
+    aimd.record(seconds=1)
+    assert aimd.limit == 4
+    # slower than before
+    aimd.record(seconds=2)
+    aimd.record(seconds=2)
+    assert aimd.limit == 2
+    aimd.record(seconds=1, error=True)
+    assert aimd.limit == 1
+    aimd.record(seconds=1, error=True)
+    assert aimd.limit == 1
+
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=10_000, burst=1000)
+    f = ThrottledFile(io.BytesIO(b"x" * 3000), bucket=bucket, size=3000)
+    assert len(f) == 3000
+    start = time.monotonic()
+    while f.read(1000):
+        pass
+    # burst is free, the other 2000 bytes take 0.2s
+    assert time.monotonic() - start >= 0.19
+    assert len(f) == 0
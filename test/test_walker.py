@@ -0,0 +1,53 @@
+from pathlib import Path
+from MpApi.Utils.walker import is_ignored, walk
+
+
+def test_is_ignored():
+    assert is_ignored(".hidden.jpg")
+    assert is_ignored("Thumbs.db")
+    assert is_ignored("upload15.xlsx", ignore_names=("upload15.xlsx",))
+    assert is_ignored("run.py", ignore_suffixes=(".py",))
+    assert not is_ignored("VII c 123 a.jpg", ignore_suffixes=(".py",))
+
+
+def test_walk(tmp_path):
+    for rel in ("a.jpg", "b.tif", "sub/c.jpg", "sub/deeper/d.jpg", "sub/Thumbs.db"):
+        p = tmp_path / rel
+        p.parent.mkdir(parents=True, exist_ok=True)
+        p.write_bytes(b"x" * 10)
+    found = {f.path.relative_to(tmp_path) for f in walk(tmp_path)}
+    assert found == {Path("a.jpg"), Path("b.tif")}
+    found = {f.path.relative_to(tmp_path) for f in walk(tmp_path, filemask="**/*.jpg")}
+    assert found == {Path("a.jpg"), Path("sub/c.jpg"), Path("sub/deeper/d.jpg")}
+    found = {f.name for f in walk(tmp_path, filemask="sub/**/*")}
+    assert found == {"c.jpg", "d.jpg"}
+    f = next(walk(tmp_path, filemask="*.tif"))
+    assert f.size == 10
+    assert f.mtime == f.path.stat().st_mtime
+
+
+def test_walk_like_glob(tmp_path):
+    """
+    With default_ignores=False and follow_symlinks=True, walk finds what
+    Path.glob finds (as cleanup needs).
+    """
+    for rel in ("a.jpg", ".hidden.jpg", "Thumbs.db", "other/e.jpg"):
+        p = tmp_path / rel
+        p.parent.mkdir(parents=True, exist_ok=True)
+        p.write_bytes(b"x")
+    (tmp_path / "root").mkdir()
+    (tmp_path / "root" / "a.jpg").write_bytes(b"x")
+    (tmp_path / "root" / "link").symlink_to(tmp_path / "other")
+    root = tmp_path / "root"
+    found = {f.path.relative_to(root) for f in walk(root, filemask="**/*")}
+    assert found == {Path("a.jpg")}
+    found = {
+        f.path.relative_to(root)
+        for f in walk(
+            root, filemask="**/*", default_ignores=False, follow_symlinks=True
+        )
+    }
+    assert found == {Path("a.jpg"), Path("link/e.jpg")}
+    found = {f.name for f in walk(tmp_path, default_ignores=False)}
+    assert found == {"a.jpg", ".hidden.jpg", "Thumbs.db"}
+    assert not is_ignored("Thumbs.db", default_ignores=False)
@@ -0,0 +1,226 @@
+from openpyxl import load_workbook
+from MpApi.Utils.Xls import ColumnIndex, Xls, red, teal
+
+desc = {
+    "filename": {"label": "Dateiname", "desc": "aus Verzeichnis", "col": "A"},
+    "fullpath": {"label": "Pfad", "desc": "absolut", "col": "B"},
+}
+
+
+def test_path_exists(tmp_path):
+    xls = Xls(path=tmp_path / "test.xlsx", description=desc)
+    ws = xls.get_or_create_sheet(title="Assets")
+    xls.write_header(sheet=ws)
+    ws.append(["eins.jpg", "/a/eins.jpg"])
+    ws.append(["zwei.jpg", "/a/zwei.jpg"])
+    assert xls.path_exists(path="/a/zwei.jpg", cno=1, sheet=ws) == 4
+    assert xls.path_exists(path="drei.jpg", sheet=ws) is None
+    # rows appended after the first lookup are found, too
+    xls._rno2dict(5, sheet=ws)["filename"].value = "drei.jpg"
+    assert xls.path_exists(path="drei.jpg", sheet=ws) == 5
+    # changed rows, even without telling
+    ws["A5"] = "vier.jpg"
+    assert xls.path_exists(path="drei.jpg", sheet=ws) is None
+    assert xls.path_exists(path="vier.jpg", sheet=ws) == 5
+    for cells, rno in xls.loop(sheet=ws):
+        if rno == 3:
+            cells["filename"].value = "fünf.jpg"
+    assert xls.path_exists(path="fünf.jpg", sheet=ws) == 3
+    assert xls.path_exists(path="eins.jpg", sheet=ws) is None
+    # written directly
+    ws["A6"] = "sechs.jpg"
+    xls.row_changed(sheet=ws, rno=6)
+    assert xls.path_exists(path="sechs.jpg", sheet=ws) == 6
+    assert ws.max_row == 6
+
+
+def test_path_exists_incremental(tmp_path, monkeypatch):
+    """
+    Like scandir: look up a path, append a row; every lookup reads only the row that
+    has been appended since the last one.
+    """
+    xls = Xls(path=tmp_path / "test.xlsx", description=desc)
+    ws = xls.get_or_create_sheet(title="Assets")
+    xls.write_header(sheet=ws)
+    for no in range(100):
+        ws.append([f"{no}.jpg", f"/a/{no}.jpg"])
+    assert xls.path_exists(path="/a/5.jpg", cno=1, sheet=ws) == 8
+    rows_read = list()
+    index_set = ColumnIndex.set
+
+    def recording_set(self, rno, value):
+        rows_read.append(rno)
+        index_set(self, rno, value)
+
+    monkeypatch.setattr(ColumnIndex, "set", recording_set)
+    for no in range(100, 110):
+        assert xls.path_exists(path=f"/a/{no}.jpg", cno=1, sheet=ws) is None
+        rno = no + 3
+        cells = xls._rno2dict(rno, sheet=ws)
+        cells["filename"].value = f"{no}.jpg"
+        cells["fullpath"].value = f"/a/{no}.jpg"
+        xls.set_change()
+    assert xls.path_exists(path="/a/109.jpg", cno=1, sheet=ws) == 112
+    assert rows_read == list(range(103, 113))
+
+
+def test_wipe(tmp_path):
+    xls = Xls(path=tmp_path / "test.xlsx", description=desc)
+    ws = xls.get_or_create_sheet(title="Assets")
+    xls.write_header(sheet=ws)
+    ws.column_dimensions["A"].width = 33
+    for no in range(1000):
+        ws.append([f"{no}.jpg", f"/a/{no}.jpg"])
+    assert xls.path_exists(path="5.jpg", sheet=ws) == 8
+    xls.wipe(sheet=ws)
+    assert ws.max_row == 2
+    assert ws["A1"].value == "Dateiname"
+    assert ws["A1"].font.bold
+    assert ws.column_dimensions["A"].width == 33
+    assert xls.path_exists(path="5.jpg", sheet=ws) is None
+    assert (tmp_path / "test.xlsx").exists()
+
+
+def test_store(tmp_path, capsys):
+    xls = Xls(path=tmp_path / "test.xlsx", description=desc)
+    ws = xls.get_or_create_sheet(title="Assets")
+    xls.write_header(sheet=ws)
+    ws.append(["eins.jpg", "/a/eins.jpg"])
+    ws.append(["zwei.jpg", "/a/zwei.jpg"])
+    xls.save()
+
+    xls = Xls(path=tmp_path / "test.xlsx", description=desc)
+    ws = xls.wb["Assets"]
+    xls.use_store(sheet=ws)
+    assert xls.path_exists(path="/a/zwei.jpg", cno=1, sheet=ws) == 4
+    for cells, rno in xls.loop(sheet=ws):
+        cells["fullpath"].value = cells["fullpath"].value.upper()
+    rno = xls.max_row(sheet=ws) + 1
+    xls._rno2dict(rno, sheet=ws)["filename"].value = "drei.jpg"
+    assert xls.path_exists(path="drei.jpg", sheet=ws) == 5
+    xls.save()
+    # Excel file is only written on export
+    assert Xls(path=tmp_path / "test.xlsx", description=desc).wb["Assets"].max_row == 4
+    xls.export()
+
+    xls = Xls(path=tmp_path / "test.xlsx", description=desc)
+    ws = xls.wb["Assets"]
+    assert [row for row in ws.iter_rows(min_row=3, values_only=True)] == [
+        ("eins.jpg", "/A/EINS.JPG"),
+        ("zwei.jpg", "/A/ZWEI.JPG"),
+        ("drei.jpg", None),
+    ]
+    # after export, the Excel file is not imported again
+    capsys.readouterr()
+    xls.use_store(sheet=ws)
+    assert "importing" not in capsys.readouterr().out
+
+
+def test_store_fonts(tmp_path):
+    """
+    Font colours survive the round trip Excel -> store -> Excel.
+    """
+    xls = Xls(path=tmp_path / "test.xlsx", description=desc)
+    ws = xls.get_or_create_sheet(title="Assets")
+    xls.write_header(sheet=ws)
+    for name in ("eins", "zwei", "drei"):
+        ws.append([f"{name}.jpg", f"/a/{name}.jpg"])
+    ws["A4"].font = red
+    xls.save()
+
+    xls = Xls(path=tmp_path / "test.xlsx", description=desc)
+    ws = xls.wb["Assets"]
+    xls.use_store(sheet=ws)
+    fonts = dict()
+    for cells, rno in xls.loop(sheet=ws):
+        fonts[rno] = cells["filename"].font
+        if rno == 5:
+            cells["fullpath"].font = teal
+    assert fonts[3] is None
+    assert fonts[4].color.rgb == red.color.rgb
+    xls.drop_rows(sheet=ws, rnos=[3])  # the rows move up
+    assert xls._rno2dict(4, sheet=ws)["fullpath"].font.color.rgb == teal.color.rgb
+    xls.save()
+    xls.export()
+
+    ws = Xls(path=tmp_path / "test.xlsx", description=desc).wb["Assets"]
+    assert [ws["A3"].value, ws["A4"].value] == ["zwei.jpg", "drei.jpg"]
+    assert ws["A3"].font.color.rgb == red.color.rgb
+    assert ws["B4"].font.color.rgb == teal.color.rgb
+    assert ws["A4"].font.color.type == "theme"  # the default
+
+
+def test_loop(tmp_path):
+    desc3 = desc | {"attached": {"label": "hochgeladen", "desc": "x", "col": "M"}}
+    xls = Xls(path=tmp_path / "test.xlsx", description=desc3)
+    ws = xls.get_or_create_sheet(title="Assets")
+    ws.append(["Dateiname"])
+    ws.append(["aus Verzeichnis"])
+    ws.append(["eins.jpg", "/a/eins.jpg"])
+    ws.append(["zwei.jpg", "/a/zwei.jpg"])
+    rows = list()
+    for cells, rno in xls.loop(sheet=ws, limit=3):
+        rows.append((rno, cells["filename"].value, cells["attached"].value))
+        cells["attached"].value = "x"
+    assert rows == [(3, "eins.jpg", None)]
+    assert ws["M3"].value == "x"
+    assert set(xls._rno2dict(4, sheet=ws)) == {"filename", "fullpath", "attached"}
+
+
+def test_write_only(tmp_path):
+    fn = tmp_path / "report.xlsx"
+    xls = Xls(path=fn, description=desc, write_only=True)
+    ws = xls.get_or_create_sheet(title="Report")
+    xls.write_header(sheet=ws)
+    for n in range(3):
+        xls.append(sheet=ws, values={"filename": f"{n}.jpg"})
+    xls.append(sheet=ws, values={"fullpath": "/a/3.jpg"})
+    xls.save()
+    assert not xls.save()  # only once
+    ws = load_workbook(fn)["Report"]
+    assert ws["A1"].font.bold
+    assert ws["A3"].value == "0.jpg"
+    assert ws["A6"].value is None
+    assert ws["B6"].value == "/a/3.jpg"
+    assert ws.max_row == 6
+
+
+def test_backup(tmp_path):
+    xls = Xls(path=tmp_path / "test.xlsx", description=desc)
+    ws = xls.get_or_create_sheet(title="Assets")
+    xls.write_header(sheet=ws)
+    xls.save()
+    assert not list(tmp_path.glob("*.tmp"))
+    assert xls.backup()
+    assert not xls.backup()  # unchanged
+    for n in range(4):
+        ws.append([f"{n}.jpg"])
+        xls.save()
+        xls.backup()
+    backups = sorted(p.name for p in tmp_path.glob("test.xlsx.bak*"))
+    assert backups == ["test.xlsx.bak", "test.xlsx.bak.1", "test.xlsx.bak.2"]
+    # the newest backup has the current content, the older ones less
+    with open(xls.backup_fn, "rb") as f:
+        assert load_workbook(f)["Assets"].max_row == 6
+    with open(tmp_path / "test.xlsx.bak.2", "rb") as f:
+        assert load_workbook(f)["Assets"].max_row == 4
+
+
+def test_save_due(tmp_path):
+    xls = Xls(path=tmp_path / "test.xlsx", description=desc)
+    assert xls.save_due()
+    xls.save()
+    xls.save_seconds = 60  # pretend saving took a minute
+    assert not xls.save_due()
+
+
+def test_drop_rows(tmp_path):
+    xls = Xls(path=tmp_path / "test.xlsx", description=desc)
+    ws = xls.get_or_create_sheet(title="Assets")
+    xls.write_header(sheet=ws)
+    for n in range(3, 9):
+        ws.append([f"{n}.jpg"])
+    assert xls.path_exists(path="8.jpg", sheet=ws) == 8
+    xls.drop_rows(sheet=ws, rnos=[4, 6, 7])
+    assert [ws[f"A{rno}"].value for rno in range(3, 6)] == ["3.jpg", "5.jpg", "8.jpg"]
+    assert xls.path_exists(path="8.jpg", sheet=ws) == 5